@@ -3,17 +3,33 @@ import json
 import os
 import sys
 import logging # Hanya satu kali import logging
+from concurrent.futures import Future, wait
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple, Union
 import yt_dlp
+from yt_dlp.utils import DownloadCancelled
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeRemainingColumn, TimeElapsedColumn
-from rich.prompt import Prompt, Confirm
+from rich.prompt import Prompt, Confirm, IntPrompt
 from rich.table import Table
 from rich.panel import Panel
 import re
 import subprocess
 import datetime # Untuk mode output 'date'
+import itertools
+import threading
+from modules.download_pool import DownloadPool, DOWNLOAD_WORKERS, HOST_CONCURRENCY, MAX_PENDING_PER_WORKER, host_key
+from modules.metadata_cache import MetadataCache, METADATA_CACHE_TTL, url_key, info_key
+from modules.ydl_pool import YDLPool, PooledYDL
+from modules.download_archive import DownloadArchive, final_path_from_hook
+from modules import download_journal as journal_states
+from modules.download_journal import DownloadJournal
+from modules.playlist_expander import PlaylistSelection, iter_flat_entries, prefetch, entry_url, entry_key
+from modules import postprocess_pool as stages
+from modules.postprocess_pool import PostprocessPool, StageTimings, POSTPROCESS_WORKERS, STAGING_DIRNAME, extract_audio
+from modules.format_planner import AudioPlan, plan_audio, AUDIO_MODES, STRICT_MP3, KEEP
+from modules.progress_tracker import ProgressTracker, ProgressRenderer, PROGRESS_REFRESH_HZ, PROGRESS_EXPORT_INTERVAL
 # import browser_cookie3 # Hapus import ini karena sudah diurus yt-dlp internal
 
 # --- HAPUS BLOK TEST browser_cookie3 DARI GLOBAL SCOPE ---
@@ -32,6 +48,7 @@ console = Console()
 YOUTUBE_URL_REGEX = re.compile(r"^(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+$")
 # Regex untuk validasi URL Bilibili/Bstation
 BILIBILI_URL_REGEX = re.compile(r"^(https?://)?(www\.)?(bilibili\.com|bilibili\.tv)/.+$")
+OUTPUT_TEMPLATE = '%(title)s.%(ext)s'
 
 # --- DEFAULT CONFIGURATION ---
 DEFAULT_CONFIG = {
@@ -43,7 +60,20 @@ DEFAULT_CONFIG = {
     "output_mode": "separate", # 'separate', 'date', 'channel'
     "auto_open": False,
     "verbose": False,
-    "bstation_cookie_browser": "firefox" # Default browser untuk cookies Bstation
+    "bstation_cookie_browser": "firefox", # Default browser untuk cookies Bstation
+    "max_workers": DOWNLOAD_WORKERS, # Unduhan paralel untuk mode batch (file:)
+    "host_concurrency": dict(HOST_CONCURRENCY), # Batas unduhan bersamaan per situs
+    "metadata_cache_ttl": METADATA_CACHE_TTL, # Detik info video disimpan (0 = tanpa cache)
+    "use_archive": True, # Lewati video yang sudah pernah diunduh (format & kualitas sama)
+    "download_retries": 2, # Percobaan ulang per URL di mode batch
+    "retry_backoff": 2.0, # Detik jeda sebelum percobaan ulang pertama (lalu berlipat dua)
+    "pipeline_postprocess": True, # Konversi MP3 di pool terpisah agar unduhan berikutnya tidak menunggu ffmpeg
+    "postprocess_workers": 0, # Konversi bersamaan (0 = jumlah core CPU)
+    "progress_refresh_hz": PROGRESS_REFRESH_HZ, # Pembaruan tampilan progres per detik
+    "progress_json": "", # Path file JSON statistik unduhan (kosong = tidak diekspor)
+    "progress_prometheus": "", # Path textfile Prometheus (kosong = tidak diekspor)
+    "progress_export_interval": PROGRESS_EXPORT_INTERVAL, # Detik antar ekspor statistik
+    "audio_mode": STRICT_MP3, # 'strict-mp3' (selalu .mp3) atau 'fastest' (m4a/opus disimpan tanpa encode ulang)
 }
 
 class YouTubeDownloader:
@@ -76,9 +106,18 @@ class YouTubeDownloader:
         self.setup_logging() 
 
         self.downloaded_files = []
-        self._current_progress_task = None
-        self._progress = None
         self._selected_platform = None 
+        # Di-set oleh batch saat Ctrl-C/abort agar unduhan yang berjalan berhenti
+        self._cancel_event = threading.Event()
+        self._ydl_pool = YDLPool()
+        self.metadata_cache = MetadataCache(ttl=self.config.get('metadata_cache_ttl', METADATA_CACHE_TTL))
+        self.archive = DownloadArchive()
+        self.journal = DownloadJournal()
+        self.stage_timings = StageTimings()
+        self.progress_tracker = ProgressTracker()
+        self.postprocess_pool = PostprocessPool(
+            workers=self.config.get('postprocess_workers') or POSTPROCESS_WORKERS, timings=self.stage_timings
+        )
 
         Path(self.config['output_folder']).mkdir(parents=True, exist_ok=True)
 
@@ -199,13 +238,22 @@ class YouTubeDownloader:
         base_path.mkdir(parents=True, exist_ok=True)
         return base_path
 
-    def get_ydl_opts(self, format_type: str, output_path: Path) -> Dict:
+    def _quality_for(self, format_type: str) -> str:
+        """Quality setting that applies to a download, as stored in the archive"""
+        if format_type == 'mp3':
+            # Mode fastest menyimpan stream asli, jadi kualitasnya bukan mp3_quality
+            return self.config.get('mp3_quality', '320k') if self._audio_mode() == STRICT_MP3 else self._audio_mode()
+        if self._selected_platform == 'bstation':
+            return '720p' # Kualitas MP4 otomatis 720p untuk Bstation
+        return self.config.get('mp4_quality', '720p')
+
+    def get_ydl_opts(self, format_type: str, output_path: Path, progress_hook=None) -> Dict:
         base_opts = {
-            'outtmpl': str(output_path / '%(title)s.%(ext)s'),
+            'outtmpl': str(output_path / OUTPUT_TEMPLATE),
             'ignoreerrors': self.config['error_behavior'] == 'skip',
             'quiet': not self.config.get('verbose', False),
             'no_warnings': not self.config.get('verbose', False),
-            'progress_hooks': [self._progress_hook],
+            'progress_hooks': [progress_hook] if progress_hook else [],
             'merge_output_format': 'mkv',
         }
 
@@ -225,18 +273,20 @@ class YouTubeDownloader:
             base_opts['convertsubs'] = None # Default off
 
         if format_type == 'mp3':
-            base_opts.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
+            base_opts['format'] = 'bestaudio/best'
+            # Mode pipeline: konversi dilakukan PostprocessPool setelah unduhan, bukan oleh yt-dlp
+            if not self._defer_postprocess(format_type):
+                strict = self._audio_mode() == STRICT_MP3
+                base_opts['postprocessors'] = [{
                     'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': self.config.get('mp3_quality', '320k'),
-                }],
-            })
+                    # 'best' menyalin stream audio tanpa encode ulang bila kontainernya memungkinkan
+                    'preferredcodec': 'mp3' if strict else 'best',
+                    # yt-dlp hanya menerima angka; "320k" akan diabaikan diam-diam
+                    'preferredquality': self.config.get('mp3_quality', '320k').rstrip('kK') if strict else None,
+                }]
         elif format_type == 'mp4':
-            quality = self.config.get('mp4_quality', '700p') # Default 720p untuk YouTube
+            quality = self._quality_for(format_type) # Sama dengan kunci arsip
             if self._selected_platform == 'bstation':
-                quality = '720p' # Kualitas MP4 otomatis 720p untuk Bstation
                 console.print("[bold yellow]Kualitas MP4 untuk Bstation diatur otomatis ke 720p.[/bold yellow]")
             
             height = quality.replace('p', '')
@@ -245,136 +295,296 @@ class YouTubeDownloader:
                 'merge_output_format': 'mp4',
             })
         
-        self._current_progress_task = None
-        self._progress = None
         return base_opts
 
-    def _progress_hook(self, d: Dict):
-        if self._progress is None or self._current_progress_task is None:
-            return
-
-        if d['status'] == 'downloading':
-            if self._progress.tasks[self._current_progress_task].total is None and d.get('total_bytes'):
-                self._progress.update(self._current_progress_task, total=d['total_bytes'])
-
-            current_file_name = d.get('filename')
-            if current_file_name:
-                display_name = current_file_name.split('/')[-1]
-            else:
-                display_name = "Unduhan"
-
-            downloaded_bytes = d.get('downloaded_bytes', 0)
-            self._progress.update(
-                self._current_progress_task,
-                completed=downloaded_bytes,
-                description=f"Downloading: [bold green]{display_name}[/bold green] [dim]{d.get('_percent_str', '')}[/dim] [dim]{d.get('_speed_str', '')}[/dim]"
-            )
-        elif d['status'] == 'finished':
-            self._progress.update(self._current_progress_task, description=f"✓ Processing: [bold green]{d['filename'].split('/')[-1]}[/bold green]")
-            if self._progress.tasks[self._current_progress_task].total is not None:
-                self._progress.update(self._current_progress_task, completed=self._progress.tasks[self._current_progress_task].total)
-            self._progress.stop_task(self._current_progress_task)
-        elif d['status'] == 'error':
-            self._progress.update(self._current_progress_task, description=f"[red]✗ Error: {d.get('filename', 'Unknown File')}[/red]")
-            self._progress.stop_task(self._current_progress_task)
+    def _audio_mode(self) -> str:
+        mode = self.config.get('audio_mode', STRICT_MP3)
+        return mode if mode in AUDIO_MODES else STRICT_MP3
+
+    def _plan_audio(self, url: str, info: Dict) -> Tuple[Dict, Optional[AudioPlan]]:
+        """Pick the audio stream from the extracted formats; returns the info narrowed to it"""
+        plan = plan_audio(info.get('formats'), self._audio_mode())
+        if plan is None:
+            return info, None
+        self.logger.info(f"Rencana audio untuk '{url}' ({self._audio_mode()}): {plan.describe()}")
+        # format_selector yt-dlp dibuat sekali per instance; cukup sisakan format yang dipilih
+        return {**info, 'formats': [fmt for fmt in info['formats'] if fmt.get('format_id') == plan.format_id]}, plan
+
+    def _defer_postprocess(self, format_type: str) -> bool:
+        """Whether the audio conversion runs in the post-processing pool instead of inline"""
+        return format_type == 'mp3' and self.config.get('pipeline_postprocess', True)
+
+    def _progress_renderer(self) -> ProgressRenderer:
+        return ProgressRenderer(
+            self.progress_tracker, console=console,
+            refresh_hz=self.config.get('progress_refresh_hz', PROGRESS_REFRESH_HZ),
+            json_path=self.config.get('progress_json') or None,
+            prometheus_path=self.config.get('progress_prometheus') or None,
+            export_interval=self.config.get('progress_export_interval', PROGRESS_EXPORT_INTERVAL),
+        )
 
+    def _progress_hook(self, download_id: int, d: Dict):
+        # Dipanggil di setiap callback yt-dlp: hanya cek pembatalan dan salin angka ke tracker.
+        # Tampilan diperbarui ProgressRenderer dengan laju tetap.
+        if self._cancel_event.is_set():
+            raise DownloadCancelled("Unduhan dibatalkan")
+        self.progress_tracker.update(download_id, d)
+
+    def download_single(self, url: str, format_type: str, progress: Optional[ProgressRenderer] = None,
+                        show_info: bool = True, on_state=None,
+                        attempt: Optional[Dict] = None) -> Union[bool, Future]:
+        # on_state(state, error=None, path=None) menerima perubahan status untuk jurnal batch.
+        # Di mode batch (progress bersama) konversi MP3 dikembalikan sebagai Future yang belum selesai.
+        # attempt (opsional) diisi retryable=False jika kegagalan tidak akan hilang dengan mencoba ulang.
+        notify = on_state or (lambda state, error=None, path=None: None)
+        attempt = attempt if attempt is not None else {}
+        attempt['retryable'] = True
 
-    def download_single(self, url: str, format_type: str) -> bool:
         # Validasi URL ketat berdasarkan platform yang dipilih
         if self._selected_platform == 'youtube' and not YOUTUBE_URL_REGEX.match(url):
             console.print(f"[red]✗ Ini bukan URL YouTube yang valid. Silakan masukkan URL YouTube.[/red]")
             self.logger.warning(f"URL YouTube tidak valid: {url}")
+            notify(journal_states.FAILED, error="URL YouTube tidak valid")
+            attempt['retryable'] = False
             return False
         elif self._selected_platform == 'bstation' and not BILIBILI_URL_REGEX.match(url):
             console.print(f"[red]✗ Ini bukan URL Bstation yang valid. Silakan masukkan URL Bstation.[/red]")
             self.logger.warning(f"URL Bstation tidak valid: {url}")
+            notify(journal_states.FAILED, error="URL Bstation tidak valid")
+            attempt['retryable'] = False
             return False
         
+        # Cek arsip sebelum request jaringan apa pun (ID video diambil dari pola URL)
+        if self.config.get('use_archive', True):
+            existing = self.archive.lookup(url_key(url), format_type, self._quality_for(format_type))
+            if existing:
+                console.print(f"[dim]↷ Sudah pernah diunduh, dilewati: {existing}[/dim]")
+                self.logger.info(f"Melewatkan '{url}': sudah ada di arsip ({existing}).")
+                self.downloaded_files.append(existing)
+                notify(journal_states.DONE, path=existing)
+                return True
+
         self.logger.info(f"Mulai unduhan '{url}' sebagai '{format_type}' dari {self._selected_platform.capitalize()}")
 
         try:
-            # Dapatkan info video pertama tanpa mengunduh
-            with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl_info:
-                info = ydl_info.extract_info(url, download=False)
-            
-            if info.get('_type') == 'playlist':
-                console.print(f"[yellow]⚠ URL ini adalah playlist. Bot hanya akan mengunduh item pertama untuk mode URL tunggal.[/yellow]")
-                if 'entries' in info and info['entries']:
-                    first_entry = info['entries'][0]
-                    url = first_entry.get('url', url)
-                    info = first_entry
-                else:
-                    console.print("[red]✗ Tidak ada entri video yang ditemukan di playlist.[/red]")
-                    return False
+            # Satu YoutubeDL (dengan opsi unduhan, termasuk cookies) untuk ekstraksi dan unduhan
+            ydl_opts = self.get_ydl_opts(format_type, Path(self.config['output_folder']))
+            with self._ydl_pool.acquire(ydl_opts) as pooled:
+                return self._download_with(pooled, url, format_type, progress, show_info, notify, attempt)
+        except Exception as e:
+            self.logger.error(f"Terjadi kesalahan saat memproses URL '{url}': {e}", exc_info=self.config.get('verbose', False))
+            console.print(f"[red]✗ Terjadi kesalahan saat memproses URL: {e}[/red]")
+            notify(journal_states.FAILED, error=str(e))
+            if isinstance(e, yt_dlp.DownloadError) and self.config['error_behavior'] == 'abort':
+                # Mode abort: error unduhan menghentikan batch, bukan dicoba ulang
+                attempt['retryable'] = False
+            return False
 
-            output_path = self.get_output_path(format_type, info)
-            self.display_video_info(info)
+    def _extract_info(self, pooled: PooledYDL, url: str, use_cache: bool = True) -> Tuple[Dict, bool]:
+        """(info, from_cache) for `url`: from the metadata cache, or extracted once and cached"""
+        key = url_key(url)
+        if use_cache:
+            info = self.metadata_cache.get(key)
+            if info is not None:
+                self.logger.debug(f"Metadata '{url}' diambil dari cache ({key[0]}:{key[1]}).")
+                return info, True
+        info = pooled.ydl.extract_info(url, download=False)
+        if not info:
+            # Dengan ignoreerrors (mode skip) yt-dlp mengembalikan None, bukan exception
+            raise yt_dlp.DownloadError(f"Gagal mengambil informasi video: {url}")
+        info = pooled.ydl.sanitize_info(info)
+        self.metadata_cache.put(info, key)
+        return info, False
+
+    def _download_info(self, pooled: PooledYDL, url: str, info: Dict, retry_stale: bool,
+                       plan: Optional[AudioPlan] = None) -> Dict:
+        """Download from an already extracted info dict (no second extract_info)
+
+        Cached stream URLs can expire before the TTL; when a cached info
+        fails, it is dropped from the cache and extracted fresh once. The
+        fresh info is planned again with the same audio plan action, since
+        the output folder and the conversion were chosen for `plan`.
+        """
+        try:
+            result = pooled.ydl.process_ie_result(info, download=True)
+            if result and all(d.get('filepath') for d in result.get('requested_downloads') or [{}]):
+                return result
+            # Dengan ignoreerrors (mode skip) kegagalan tidak dilempar sebagai exception
+            error = yt_dlp.DownloadError(f"yt-dlp gagal mengunduh {url}")
+        except DownloadCancelled:
+            raise
+        except yt_dlp.DownloadError as e:
+            error = e
+        if not retry_stale:
+            raise error
+        self.logger.info(f"Info cache untuk '{url}' basi, mengekstrak ulang.")
+        self.metadata_cache.invalidate(url_key(url), info_key(info))
+        fresh_info = self._extract_info(pooled, url, use_cache=False)[0]
+        if plan:
+            fresh_info, fresh_plan = self._plan_audio(url, fresh_info)
+            if fresh_plan is None or fresh_plan.action != plan.action:
+                # outtmpl (staging atau langsung ke output) dan codec sudah dipilih untuk rencana lama;
+                # percobaan berikutnya memakai info baru dari cache dan merencanakan ulang dari awal
+                raise yt_dlp.DownloadError(
+                    f"Format audio '{url}' berubah setelah ekstrak ulang "
+                    f"({plan.action} → {fresh_plan.action if fresh_plan else 'tidak ada'})"
+                )
+        return self._download_info(pooled, url, fresh_info, retry_stale=False, plan=plan)
+
+    def _download_with(self, pooled: PooledYDL, url: str, format_type: str,
+                       progress: Optional[ProgressRenderer], show_info: bool, notify,
+                       attempt: Dict) -> Union[bool, Future]:
+        # Dapatkan info video tanpa mengunduh (atau dari cache metadata)
+        notify(journal_states.EXTRACTING)
+        with self.stage_timings.measure(stages.EXTRACT):
+            info, from_cache = self._extract_info(pooled, url)
+        
+        if info.get('_type') == 'playlist':
+            console.print(f"[yellow]⚠ URL ini adalah playlist. Bot hanya akan mengunduh item pertama untuk mode URL tunggal "
+                          f"(gunakan 'playlist:<url>' atau --playlist untuk mengunduh semuanya).[/yellow]")
+            if 'entries' in info and info['entries']:
+                first_entry = info['entries'][0]
+                url = first_entry.get('webpage_url') or first_entry.get('url', url)
+                info = first_entry
+            else:
+                console.print("[red]✗ Tidak ada entri video yang ditemukan di playlist.[/red]")
+                notify(journal_states.FAILED, error="Playlist kosong")
+                attempt['retryable'] = False
+                return False
 
-            ydl_opts = self.get_ydl_opts(format_type, output_path)
-
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(),
-                TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-                TimeRemainingColumn(),
-                TimeElapsedColumn(),
-                console=console
-            ) as progress:
-                self._progress = progress
-                self._current_progress_task = progress.add_task(f"Initializing download...", total=None)
+        output_path = self.get_output_path(format_type, info)
+        if show_info:
+            self.display_video_info(info)
+        plan = None
+        if format_type == 'mp3':
+            info, plan = self._plan_audio(url, info)
+        # File yang masih perlu dikonversi menunggu di folder staging; tanpa ffmpeg langsung ke output
+        deferred = self._defer_postprocess(format_type) and not (plan and plan.action == KEEP)
+        pooled.set_outtmpl(str((output_path / STAGING_DIRNAME if deferred else output_path) / OUTPUT_TEMPLATE))
+
+        # Mode batch memberi tampilan bersama; unduhan tunggal membuat miliknya sendiri
+        shared_progress = progress is not None
+        progress_context = nullcontext(progress) if shared_progress else self._progress_renderer()
+        with progress_context:
+            download_id = self.progress_tracker.start(info.get('title') or url, url)
+            download_ok = False
+            pooled.progress_hook = partial(self._progress_hook, download_id)
+            # Path akhir dilaporkan yt-dlp setelah semua post-processing (tanpa glob folder)
+            final_paths = []
+
+            def on_postprocess(d: Dict):
+                if d.get('status') == 'started' and not final_paths:
+                    notify(journal_states.POSTPROCESSING)
+                final_path = final_path_from_hook(d)
+                if final_path:
+                    final_paths.append(final_path)
+
+            pooled.postprocessor_hook = on_postprocess
+            
+            try:
+                notify(journal_states.DOWNLOADING)
+                with self.stage_timings.measure(stages.DOWNLOAD):
+                    result = self._download_info(pooled, url, info, retry_stale=from_cache, plan=plan)
+                download_ok = True
                 
-                try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as download_ydl:
-                        download_ydl.download([url])
-                    
-                    self.logger.info(f"Unduhan selesai untuk '{url}'.")
-                    console.print(f"[bold green]✓ Berhasil mengunduh:[/bold green] [cyan]{info.get('title', 'N/A')}.{format_type}[/cyan]")
-                    
-                    downloaded_file = None
-                    candidate_files = list(output_path.glob(f"{info.get('title', '*')}.*"))
-                    if candidate_files:
-                        downloaded_file = max(candidate_files, key=os.path.getmtime)
+                if not final_paths:
+                    final_paths = [d['filepath'] for d in result.get('requested_downloads') or [] if d.get('filepath')]
+                downloaded_file = Path(final_paths[-1]) if final_paths else None
+
+                if deferred and downloaded_file and downloaded_file.exists():
+                    self.logger.info(f"Unduhan selesai untuk '{url}', menunggu konversi audio.")
+                    notify(journal_states.POSTPROCESSING)
+                    future = self.postprocess_pool.submit(
+                        self._finish_staged, downloaded_file, output_path, url, format_type, info, result, notify,
+                        codec=plan.postprocess_codec if plan else ('mp3' if self._audio_mode() == STRICT_MP3 else 'best'),
+                    )
+                    # Batch: slot unduhan langsung bebas untuk URL berikutnya; unduhan tunggal menunggu hasilnya
+                    return future if shared_progress else future.result()
+
+                return self._complete_download(url, format_type, info, result, downloaded_file, output_path, notify)
                     
-                    if downloaded_file and downloaded_file.exists():
-                        self.downloaded_files.append(str(downloaded_file))
-                        if self.config.get('auto_open', False):
-                            self._open_file(downloaded_file)
-                        return True
-                    else:
-                        console.print(f"[yellow]⚠ Unduhan selesai, tetapi file tidak ditemukan di lokasi yang diharapkan. Judul: {info.get('title', 'N/A')}, Path: {output_path}[/yellow]")
-                        self.logger.warning(f"File tidak ditemukan setelah unduhan: {info.get('title', 'N/A')} di {output_path}")
-                        return True
-                        
-                except yt_dlp.DownloadError as de:
-                    error_message = str(de)
-                    if self.config['error_behavior'] == 'skip':
-                        console.print(f"[yellow]⚠ Melewatkan unduhan karena error: {error_message}[/yellow]")
-                        self.logger.warning(f"Melewatkan unduhan '{url}' karena error: {error_message}")
-                        return False
-                    else:
-                        console.print(f"[red]✗ Menghentikan unduhan karena error: {error_message}[/red]")
-                        self.logger.error(f"Menghentikan unduhan '{url}' karena error: {error_message}")
-                        raise
-                except KeyboardInterrupt:
-                    console.print("\n[yellow]✗ Unduhan dibatalkan oleh pengguna.[/yellow]")
-                    self.logger.info(f"Unduhan '{url}' dibatalkan oleh pengguna.")
+            except DownloadCancelled:
+                self.logger.info(f"Unduhan '{url}' dihentikan karena batch dibatalkan.")
+                # Kembali ke antrean supaya ikut dilanjutkan saat resume
+                notify(journal_states.QUEUED)
+                attempt['retryable'] = False
+                return False
+            except yt_dlp.DownloadError as de:
+                error_message = str(de)
+                notify(journal_states.FAILED, error=error_message)
+                if self.config['error_behavior'] == 'skip':
+                    console.print(f"[yellow]⚠ Melewatkan unduhan karena error: {error_message}[/yellow]")
+                    self.logger.warning(f"Melewatkan unduhan '{url}' karena error: {error_message}")
                     return False
-                finally:
-                    self._progress = None
-                    self._current_progress_task = None
+                else:
+                    console.print(f"[red]✗ Menghentikan unduhan karena error: {error_message}[/red]")
+                    self.logger.error(f"Menghentikan unduhan '{url}' karena error: {error_message}")
+                    raise
+            except KeyboardInterrupt:
+                console.print("\n[yellow]✗ Unduhan dibatalkan oleh pengguna.[/yellow]")
+                self.logger.info(f"Unduhan '{url}' dibatalkan oleh pengguna.")
+                notify(journal_states.QUEUED)
+                attempt['retryable'] = False
+                return False
+            finally:
+                self.progress_tracker.finish(download_id, ok=download_ok)
+
+    def _finish_staged(self, staged_file: Path, output_path: Path, url: str, format_type: str,
+                       info: Dict, result: Dict, notify, codec: str = 'mp3') -> bool:
+        """Convert (or remux, for codec 'best') a staged download and move it into the output folder"""
+        requested = (result.get('requested_downloads') or [{}])[-1]
+        try:
+            converted = Path(extract_audio(
+                str(staged_file), codec, self.config.get('mp3_quality', '320k') if codec == 'mp3' else None,
+                info={key: requested.get(key) for key in ('vcodec', 'acodec', 'filetime')},
+            ))
+            final_file = output_path / converted.name
+            os.replace(converted, final_file)
         except Exception as e:
-            self.logger.error(f"Terjadi kesalahan saat memproses URL '{url}': {e}", exc_info=self.config.get('verbose', False))
-            console.print(f"[red]✗ Terjadi kesalahan saat memproses URL: {e}[/red]")
+            self.logger.error(f"Konversi audio gagal untuk '{url}': {e}", exc_info=self.config.get('verbose', False))
+            console.print(f"[red]✗ Konversi audio gagal untuk '{info.get('title', url)}': {e}[/red]")
+            notify(journal_states.FAILED, error=f"Konversi audio gagal: {e}")
+            return False
+        return self._complete_download(url, format_type, info, result, final_file, output_path, notify)
+
+    def _complete_download(self, url: str, format_type: str, info: Dict, result: Dict,
+                           downloaded_file: Optional[Path], output_path: Path, notify) -> bool:
+        """Report a finished download and record it in the archive and the journal
+
+        Returns False when the output file is missing, so the job stays
+        failed in the journal and is picked up again by retry and resume.
+        """
+        if not (downloaded_file and downloaded_file.exists()):
+            console.print(f"[yellow]⚠ Unduhan selesai, tetapi file tidak ditemukan di lokasi yang diharapkan. Judul: {info.get('title', 'N/A')}, Path: {output_path}[/yellow]")
+            self.logger.warning(f"File tidak ditemukan setelah unduhan: {info.get('title', 'N/A')} di {output_path}")
+            notify(journal_states.FAILED, error=f"File hasil unduhan tidak ditemukan di {output_path}")
             return False
 
-    def download_from_file(self, file_path: str, format_type: str) -> List[str]:
+        self.logger.info(f"Unduhan selesai untuk '{url}'.")
+        # Mode fastest bisa menghasilkan .m4a/.opus, jadi tampilkan nama file sebenarnya
+        console.print(f"[bold green]✓ Berhasil mengunduh:[/bold green] [cyan]{downloaded_file.name}[/cyan]")
+        self.archive.add([url_key(url), info_key(result)], format_type, self._quality_for(format_type),
+                         str(downloaded_file.resolve()), title=info.get('title'))
+        self.downloaded_files.append(str(downloaded_file))
+        notify(journal_states.DONE, path=str(downloaded_file.resolve()))
+        if self.config.get('auto_open', False):
+            self._open_file(downloaded_file)
+        return True
+
+    def download_from_file(self, file_path: str, format_type: str, resume: bool = False) -> List[str]:
         file_path_obj = Path(file_path)
         if not file_path_obj.exists():
             console.print(f"[red]✗ File tidak ditemukan: {file_path}[/red]")
             self.logger.error(f"File tidak ditemukan untuk unduhan batch: {file_path}")
             return []
 
+        source = str(file_path_obj.resolve())
+        if resume:
+            batch = self.journal.find_unfinished(source=source, format_type=format_type)
+            if batch:
+                return self.resume_batch(batch['id'])
+            console.print(f"[dim]Tidak ada batch terputus untuk '{file_path_obj.name}' ({format_type}), mulai dari awal.[/dim]")
+
         try:
             with open(file_path_obj, 'r') as f:
                 urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
@@ -384,29 +594,15 @@ class YouTubeDownloader:
                 self.logger.warning(f"File '{file_path}' kosong atau hanya berisi komentar.")
                 return []
             
-            console.print(f"\n[bold blue]Mulai mengunduh {len(urls)} URL dari '{file_path_obj.name}'...[/bold blue]")
-            failed_urls = []
-            for i, url in enumerate(urls, 1):
-                console.print(f"\n[bold green]--- Mengunduh ({i}/{len(urls)}): {url} ---[/bold green]")
-                # Untuk mode batch dari file, validasi platform per URL bisa menjadi rumit.
-                # Kita akan biarkan yt-dlp menangani deteksi situs, tetapi format/kualitas akan sesuai dengan format_type yang dipilih user.
-                # Penting: Jika ada URL Bstation di sini, pastikan cookiesfrombrowser diaktifkan di get_ydl_opts
-                # (yang sudah diatur jika self._selected_platform adalah 'bstation').
-                # Namun, jika file berisi campuran YT dan Bstation, _selected_platform akan konsisten untuk semua URL.
-                # Ini adalah batasan mode batch saat ini.
-                if not self.download_single(url, format_type):
-                    failed_urls.append(url)
-            
-            console.print(f"\n[bold blue]--- Unduhan Batch Selesai ---[/bold blue]")
-            if failed_urls:
-                console.print(f"[red]✗ Gagal mengunduh {len(failed_urls)} URL:[/red]")
-                for url in failed_urls:
-                    console.print(f"  - [dim]{url}[/dim]")
-                self.logger.error(f"Gagal mengunduh {len(failed_urls)} URL: {', '.join(failed_urls)}")
-            else:
-                console.print("[bold green]✓ Semua URL berhasil diunduh![/bold green]")
-                self.logger.info("Semua URL di file batch berhasil diunduh.")
-            return failed_urls
+            console.print(f"\n[bold blue]Mulai mengunduh {len(urls)} URL dari '{file_path_obj.name}' "
+                          f"({self.config.get('max_workers', DOWNLOAD_WORKERS)} unduhan paralel)...[/bold blue]")
+            # Untuk mode batch dari file, validasi platform per URL bisa menjadi rumit.
+            # Kita akan biarkan yt-dlp menangani deteksi situs, tetapi format/kualitas akan sesuai dengan format_type yang dipilih user.
+            # Penting: Jika ada URL Bstation di sini, pastikan cookiesfrombrowser diaktifkan di get_ydl_opts
+            # (yang sudah diatur jika self._selected_platform adalah 'bstation').
+            # Namun, jika file berisi campuran YT dan Bstation, _selected_platform akan konsisten untuk semua URL.
+            # Ini adalah batasan mode batch saat ini.
+            return self.download_batch(urls, format_type, source=source)
             
         except FileNotFoundError:
             console.print(f"[red]✗ File tidak ditemukan: {file_path}[/red]")
@@ -417,6 +613,272 @@ class YouTubeDownloader:
             console.print(f"[red]✗ Terjadi kesalahan saat mengunduh dari file: {e}[/red]")
             return []
 
+    def download_batch(self, urls: List[str], format_type: str, source: str = "(daftar URL)") -> List[str]:
+        """Journal `urls` as a new batch and download it; returns the failed URLs in input order"""
+        batch_id = self.journal.create_batch(source, format_type, self._selected_platform, urls)
+        return self.run_batch(batch_id)
+
+    def resume_batch(self, batch_id: Optional[int] = None) -> List[str]:
+        """Continue an interrupted batch (the most recent one by default)"""
+        batch = self.journal.batch(batch_id) if batch_id else self.journal.find_unfinished()
+        if not batch:
+            console.print("[yellow]⚠ Tidak ada batch unduhan yang terputus.[/yellow]")
+            return []
+        counts = self.journal.counts(batch['id'])
+        remaining = sum(counts.values()) - counts[journal_states.DONE]
+        console.print(
+            f"\n[bold blue]Melanjutkan batch #{batch['id']} dari '{batch['source']}' ({batch['format']}): "
+            f"{counts[journal_states.DONE]} selesai, {remaining} tersisa[/bold blue]"
+        )
+        self.logger.info(f"Melanjutkan batch #{batch['id']}: {counts}")
+        return self.run_batch(batch['id'])
+
+    def run_batch(self, batch_id: int) -> List[str]:
+        """Download every pending job of a journaled batch concurrently; returns the failed URLs"""
+        batch = self.journal.batch(batch_id)
+        format_type = batch['format']
+        if batch['platform']:
+            self._selected_platform = batch['platform']
+        jobs = self.journal.pending_jobs(batch_id)
+        # Semua job yang diserahkan ke pool, termasuk yang ditemukan selama ekspansi playlist
+        started_jobs: List[Tuple[int, str]] = []
+        expansion = {"discovered": 0, "skipped": 0}
+
+        pool = DownloadPool(
+            workers=self.config.get('max_workers', DOWNLOAD_WORKERS),
+            host_limits=self.config.get('host_concurrency'),
+            key=lambda job: host_key(job[1]),
+        )
+        abort_on_error = self.config['error_behavior'] == 'abort'
+        outcomes: Dict[int, bool] = {}
+        interrupted = False
+        self._cancel_event = pool.cancel_event
+        # Konversi MP3 yang masih berjalan setelah unduhannya selesai
+        postprocessing: List[Future] = []
+        self.stage_timings.reset()
+
+        with self._progress_renderer() as renderer:
+            progress = renderer.progress
+            streaming = batch['kind'] == journal_states.PLAYLIST_BATCH and not batch['expanded']
+            overall = renderer.add_counter("[bold blue]Total batch[/bold blue]",
+                                           total=None if streaming and not jobs else len(jobs), aggregate=True)
+
+            def on_discovered():
+                expansion["discovered"] += 1
+                progress.update(overall, total=len(jobs) + expansion["discovered"])
+
+            # Job tertunda dulu, lalu entri playlist yang belum pernah masuk journal
+            stream = self._stream_playlist(batch, expansion, on_discovered) if streaming else iter(())
+
+            def job_source():
+                for job in itertools.chain(jobs, stream):
+                    started_jobs.append(job)
+                    yield job
+
+            def run_job(job: Tuple[int, str]) -> Union[bool, Future]:
+                job_id, url = job
+                return self._download_with_retries(url, format_type, renderer,
+                                                   on_state=partial(self.journal.set_state, job_id))
+
+            postprocess_task = None
+
+            def on_done(index: int, job: Tuple[int, str], ok, error):
+                nonlocal postprocess_task
+                if isinstance(ok, Future):
+                    # Unduhan selesai; job baru dihitung setelah konversinya selesai
+                    if postprocess_task is None:
+                        postprocess_task = renderer.add_counter("[magenta]Konversi audio[/magenta]", total=0)
+                    postprocessing.append(ok)
+                    progress.update(postprocess_task, total=len(postprocessing))
+                    ok.add_done_callback(partial(on_postprocessed, index, job))
+                    return
+                finish(index, job, ok, error)
+
+            def on_postprocessed(index: int, job: Tuple[int, str], future: Future):
+                # Dipanggil dari thread post-processing
+                if future.cancelled():
+                    return
+                progress.advance(postprocess_task)
+                error = future.exception()
+                finish(index, job, None if error else future.result(), error)
+
+            def finish(index: int, job: Tuple[int, str], ok, error):
+                job_id, url = job
+                if error:
+                    self.logger.error(f"Unduhan '{url}' gagal: {error}")
+                    self.journal.set_state(job_id, journal_states.FAILED, error=str(error))
+                outcomes[index] = bool(ok) and error is None
+                progress.advance(overall)
+                if not outcomes[index] and abort_on_error and not pool.stopped:
+                    # Mode abort: yang sedang berjalan diselesaikan, yang belum mulai tidak dijalankan
+                    console.print(f"[red]✗ Batch dihentikan karena error pada: {url}[/red]")
+                    pool.stop()
+
+            try:
+                pool.run(job_source(), run_job, on_done=on_done)
+                wait(postprocessing)
+            except KeyboardInterrupt:
+                interrupted = True
+                # Konversi yang belum mulai dibatalkan; file staging dipakai lagi saat resume
+                for future in postprocessing:
+                    future.cancel()
+                console.print("\n[yellow]✗ Unduhan batch dibatalkan oleh pengguna.[/yellow]")
+                self.logger.info("Unduhan batch dibatalkan oleh pengguna.")
+            finally:
+                # Hentikan thread ekspansi playlist bila batch berhenti lebih awal
+                if streaming:
+                    stream.close()
+                self._cancel_event = threading.Event()
+
+        # Batch yang dihentikan (Ctrl-C/abort) tetap terbuka supaya bisa di-resume
+        if not interrupted and not pool.stopped:
+            self.journal.finish_batch(batch_id)
+        if expansion["skipped"]:
+            console.print(f"[dim]{expansion['skipped']} entri playlist dilewati karena sudah ada di arsip unduhan.[/dim]")
+        self._show_batch_summary(batch_id, not_started=len(started_jobs) - len(outcomes))
+        self._show_stage_timings()
+        # Urut sesuai file; URL yang tidak sempat dimulai juga dihitung gagal
+        return [url for index, (job_id, url) in enumerate(started_jobs) if not outcomes.get(index, False)]
+
+    def download_playlist(self, url: str, format_type: str, items: Optional[str] = None,
+                          match: Optional[str] = None, max_items: Optional[int] = None,
+                          resume: bool = False) -> List[str]:
+        """Download a playlist/channel, streaming its entries into the batch pool as they are listed"""
+        if resume:
+            batch = self.journal.find_unfinished(source=url, format_type=format_type)
+            if batch:
+                return self.resume_batch(batch['id'])
+            console.print(f"[dim]Tidak ada batch terputus untuk playlist ini ({format_type}), mulai dari awal.[/dim]")
+        try:
+            PlaylistSelection(items, match, max_items) # Validasi sebelum masuk journal
+        except (ValueError, re.error) as e:
+            console.print(f"[red]✗ Pilihan playlist tidak valid: {e}[/red]")
+            return []
+        options = json.dumps({"items": items, "match": match, "max_items": max_items})
+        batch_id = self.journal.create_batch(url, format_type, self._selected_platform, [],
+                                             kind=journal_states.PLAYLIST_BATCH, options=options, expanded=False)
+        console.print(f"\n[bold blue]Membaca playlist '{url}' dan langsung mengunduh entrinya "
+                      f"({self.config.get('max_workers', DOWNLOAD_WORKERS)} unduhan paralel)...[/bold blue]")
+        return self.run_batch(batch_id)
+
+    def _stream_playlist(self, batch: Dict, expansion: Dict, on_discovered) -> Iterator[Tuple[int, str]]:
+        """Journal and yield (job id, url) for each selected playlist entry as it is listed
+
+        Entries already journaled (an earlier, interrupted run), repeated in
+        the playlist or present in the download archive are not queued. The
+        batch is marked expanded only once the listing ran to the end.
+        """
+        format_type = batch['format']
+        quality = self._quality_for(format_type)
+        selection = PlaylistSelection(**json.loads(batch['options'] or '{}'))
+        known_urls = self.journal.known_urls(batch['id'])
+        seen_keys = set()
+        use_archive = self.config.get('use_archive', True)
+        # Instance tersendiri: dipakai thread ekspansi selama batch berjalan, jadi tidak dipinjam dari pool
+        ydl = yt_dlp.YoutubeDL({
+            'quiet': not self.config.get('verbose', False),
+            'no_warnings': not self.config.get('verbose', False),
+            'extract_flat': 'in_playlist',
+            **({'cookiesfrombrowser': (self.config.get('bstation_cookie_browser', 'firefox'),)}
+               if self._selected_platform == 'bstation' else {}),
+        })
+        entries = prefetch(selection.select(iter_flat_entries(ydl, batch['source'])),
+                           maxsize=self.config.get('max_workers', DOWNLOAD_WORKERS) * MAX_PENDING_PER_WORKER)
+        try:
+            for index, entry in entries:
+                url = entry_url(entry)
+                key = entry_key(entry) or (url_key(url) if url else None)
+                if not url or key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                if url in known_urls:
+                    continue
+                if use_archive and self.archive.lookup(key, format_type, quality):
+                    expansion["skipped"] += 1
+                    continue
+                job_id = self.journal.add_job(batch['id'], index, url)
+                on_discovered()
+                yield job_id, url
+            self.journal.mark_expanded(batch['id'])
+        except yt_dlp.utils.YoutubeDLError as e:
+            # Job yang sudah ditemukan tetap diunduh; sisa playlist bisa dibaca ulang saat resume
+            console.print(f"[red]✗ Gagal membaca playlist: {e}[/red]")
+            self.logger.error(f"Gagal membaca playlist '{batch['source']}': {e}")
+        finally:
+            entries.close()
+            ydl.close()
+
+    def _download_with_retries(self, url: str, format_type: str, progress: ProgressRenderer,
+                               on_state) -> Union[bool, Future]:
+        """download_single with exponential backoff between attempts
+
+        Failures that another attempt cannot fix (invalid URL, the abort
+        policy, cancellation) are returned right away.
+        """
+        retries = max(0, int(self.config.get('download_retries', 2)))
+        delay = float(self.config.get('retry_backoff', 2.0))
+        for attempt in range(retries + 1):
+            outcome: Dict = {}
+            result = self.download_single(url, format_type, progress=progress, show_info=False,
+                                          on_state=on_state, attempt=outcome)
+            if result:
+                return result
+            if attempt == retries or not outcome['retryable']:
+                break
+            wait = delay * 2 ** attempt
+            self.logger.info(f"Mencoba ulang '{url}' dalam {wait:.0f} detik (percobaan {attempt + 2}/{retries + 1}).")
+            # Event dipakai sebagai sleep yang bisa diputus oleh Ctrl-C/abort
+            if self._cancel_event.wait(wait):
+                break
+        return False
+
+    def _show_batch_summary(self, batch_id: int, not_started: int = 0):
+        counts = self.journal.counts(batch_id)
+        failed_jobs = self.journal.failed_jobs(batch_id)
+        console.print(f"\n[bold blue]--- Unduhan Batch Selesai ---[/bold blue]")
+        if failed_jobs:
+            table = Table(title=f"Gagal mengunduh {len(failed_jobs)} URL", show_header=True, header_style="bold red")
+            table.add_column("URL", style="dim")
+            table.add_column("Percobaan", justify="right")
+            table.add_column("Error terakhir", style="red")
+            for job in failed_jobs:
+                table.add_row(job['url'], str(job['attempts']), (job['error'] or '-')[:120])
+            console.print(table)
+            self.logger.error(f"Gagal mengunduh {len(failed_jobs)} URL: {', '.join(job['url'] for job in failed_jobs)}")
+        pending = sum(counts.values()) - counts[journal_states.DONE] - counts[journal_states.FAILED]
+        if not_started or pending:
+            console.print(f"[yellow]⚠ {pending} URL belum selesai. Ketik 'resume' (atau jalankan dengan --resume) untuk melanjutkan.[/yellow]")
+        elif not failed_jobs:
+            console.print("[bold green]✓ Semua URL berhasil diunduh![/bold green]")
+            self.logger.info("Semua URL di file batch berhasil diunduh.")
+
+    def _show_stage_timings(self):
+        """Per-stage durations of the last batch; the busiest stage is the bottleneck"""
+        download_workers = self.config.get('max_workers', DOWNLOAD_WORKERS)
+        summary = self.stage_timings.summary(workers={
+            stages.EXTRACT: download_workers,
+            stages.DOWNLOAD: download_workers,
+            stages.POSTPROCESS: self.postprocess_pool.workers,
+        })
+        if not summary:
+            return
+        table = Table(title="Waktu per Tahap", show_header=True, header_style="bold magenta")
+        table.add_column("Tahap", style="cyan", no_wrap=True)
+        table.add_column("Jumlah", justify="right")
+        table.add_column("Total (s)", justify="right")
+        table.add_column("Rata-rata (s)", justify="right")
+        table.add_column("Maks (s)", justify="right")
+        table.add_column("Beban", justify="right")
+        for stage, stats in summary.items():
+            table.add_row(stage, str(stats['count']), f"{stats['total']:.1f}", f"{stats['mean']:.2f}",
+                          f"{stats['max']:.2f}", f"{stats['busy']:.0%}" if stats['busy'] is not None else "-")
+        console.print(table)
+        busiest = max((stage for stage in summary if summary[stage]['busy'] is not None),
+                      key=lambda stage: summary[stage]['busy'], default=None)
+        if busiest:
+            console.print(f"[dim]Tahap tersibuk: {busiest} ({summary[busiest]['busy']:.0%} dari kapasitasnya).[/dim]")
+        self.logger.info(f"Waktu per tahap: {summary}")
+
     def display_video_info(self, info: Dict):
         table = Table(title="Informasi Video", show_header=True, header_style="bold magenta")
         table.add_column("Properti", style="cyan", no_wrap=True)
@@ -460,6 +922,29 @@ class YouTubeDownloader:
             console.print(f"[red]✗ Terjadi kesalahan saat membuka file: {e}[/red]")
             self.logger.error(f"Kesalahan tak terduga saat membuka file '{file_path}': {e}")
 
+    def verify_archive(self) -> Dict:
+        """Drop archive entries whose file no longer exists and show the result"""
+        result = self.archive.verify()
+        table = Table(title="Verifikasi Arsip Unduhan", show_header=True, header_style="bold magenta")
+        table.add_column("Properti", style="cyan", no_wrap=True)
+        table.add_column("Nilai", style="white")
+        table.add_row("Entri diperiksa", str(result['checked']))
+        table.add_row("File hilang (dihapus dari arsip)", str(result['missing']))
+        table.add_row("Entri tersisa", str(result['kept']))
+        table.add_row("File unik", str(result['files']))
+        console.print(table)
+        self.logger.info(f"Verifikasi arsip: {result}")
+        return result
+
+    def close(self):
+        """Close pooled YoutubeDL instances (saves cookies), the caches and the job journal"""
+        # Konversi yang masih berjalan menulis ke arsip dan journal, jadi tunggu dulu
+        self.postprocess_pool.shutdown()
+        self._ydl_pool.close()
+        self.metadata_cache.close()
+        self.archive.close()
+        self.journal.close()
+
     def select_platform(self) -> str:
         """Meminta pengguna untuk memilih platform unduhan."""
         console.print(Panel.fit(
@@ -508,12 +993,24 @@ class YouTubeDownloader:
             default=self.config['mp4_quality']
         )
 
+        self.config['audio_mode'] = Prompt.ask(
+            f"[bold cyan]Mode audio (strict-mp3 = selalu .mp3, fastest = simpan m4a/opus tanpa encode ulang)[/bold cyan] [dim](Default: {self._audio_mode()})[/dim]",
+            choices=list(AUDIO_MODES),
+            default=self._audio_mode()
+        )
+
         self.config['error_behavior'] = Prompt.ask(
             f"[bold cyan]Perilaku saat error (skip/abort)[/bold cyan] [dim](Default: {self.config['error_behavior']})[/dim]",
             choices=['skip', 'abort'],
             default=self.config['error_behavior']
         )
 
+        self.config['max_workers'] = IntPrompt.ask(
+            f"[bold cyan]Jumlah unduhan paralel untuk mode batch[/bold cyan] [dim](Default: {self.config.get('max_workers', DOWNLOAD_WORKERS)})[/dim]",
+            choices=[str(n) for n in range(1, 9)],
+            default=self.config.get('max_workers', DOWNLOAD_WORKERS)
+        )
+
         self.config['output_mode'] = Prompt.ask(
             f"[bold cyan]Mode folder output (separate/date/channel)[/bold cyan] [dim](Default: {self.config['output_mode']})[/dim]",
             choices=['separate', 'date', 'channel'],
@@ -546,7 +1043,8 @@ class YouTubeDownloader:
         console.print(Panel.fit(
             "[bold blue]Selamat Datang di Advanced Video Downloader Bot![/bold blue]\n"
             "Anda dapat mengunduh video/audio dari YouTube atau Bstation.\n"
-            "Ketik 'config' untuk mengubah pengaturan, atau 'quit' untuk keluar.",
+            "Ketik 'config' untuk mengubah pengaturan, 'verify' untuk memeriksa arsip unduhan,\n"
+            "'resume' untuk melanjutkan batch yang terputus, atau 'quit' untuk keluar.",
             title="Selamat Datang", border_style="green"
         ))
         
@@ -563,11 +1061,11 @@ class YouTubeDownloader:
             try:
                 if chosen_mode == 'youtube':
                     console.print("\n[bold green]Anda memilih YouTube Downloader.[/bold green]")
-                    url_input = Prompt.ask(f"[bold green]Masukkan URL YouTube (atau 'config', 'quit', 'file:<path>')[/bold green]")
+                    url_input = Prompt.ask(f"[bold green]Masukkan URL YouTube (atau 'config', 'verify', 'resume', 'quit', 'file:<path>', 'playlist:<url>')[/bold green]")
                 elif chosen_mode == 'bstation':
                     console.print("\n[bold green]Anda memilih Bstation Downloader.[/bold green]")
                     console.print("[bold yellow]Bot akan otomatis menggunakan cookies Firefox, mengunduh MP4 720p, dan menyematkan subtitle Bahasa Indonesia.[/bold yellow]")
-                    url_input = Prompt.ask(f"[bold green]Masukkan URL Bstation (atau 'config', 'quit', 'file:<path>')[/bold green]")
+                    url_input = Prompt.ask(f"[bold green]Masukkan URL Bstation (atau 'config', 'verify', 'resume', 'quit', 'file:<path>', 'playlist:<url>')[/bold green]")
                 else: # Ini seharusnya tidak terjadi, tapi sebagai fallback
                     continue
                 
@@ -577,6 +1075,25 @@ class YouTubeDownloader:
                 elif url_input.lower() == 'config':
                     self.configure_settings()
                     continue # Kembali ke pilihan platform setelah konfigurasi
+                elif url_input.lower() == 'verify':
+                    self.verify_archive()
+                    continue
+                elif url_input.lower() == 'resume':
+                    self.resume_batch()
+                elif url_input.startswith('playlist:'):
+                    playlist_url = url_input[9:].strip()
+                    if chosen_mode == 'youtube':
+                        format_type = Prompt.ask(
+                            "[bold cyan]Pilih format unduhan (mp3/mp4)[/bold cyan]",
+                            choices=['mp3', 'mp4'],
+                            default=self.config['default_format']
+                        )
+                    else: # chosen_mode == 'bstation'
+                        format_type = 'mp4' # Otomatis MP4 untuk Bstation
+                        console.print("[bold cyan]Format unduhan untuk Bstation otomatis: MP4[/bold cyan]")
+                    items = Prompt.ask("[bold cyan]Item yang diunduh (mis. 1-10,15,20-; kosong = semua)[/bold cyan]", default="")
+                    match = Prompt.ask("[bold cyan]Filter judul (regex; kosong = tanpa filter)[/bold cyan]", default="")
+                    self.download_playlist(playlist_url, format_type, items=items or None, match=match or None)
                 elif url_input.startswith('file:'):
                     file_path = url_input[5:].strip()
                     if not Path(file_path).exists():
@@ -634,8 +1151,14 @@ Penggunaan Contoh CLI:
   Unduh MP3 dari Bstation (menggunakan cookies Firefox):
     python youtube_downloader.py -u "https://www.bilibili.tv/en/play/VIDEO_ID" -f mp3 --platform bstation --bstation-cookie-browser firefox
 
-  Unduh daftar URL dari file:
-    python youtube_downloader.py -F urls.txt -f mp4
+  Unduh daftar URL dari file (4 unduhan paralel):
+    python youtube_downloader.py -F urls.txt -f mp4 -w 4
+
+  Unduh 50 video pertama sebuah channel/playlist yang judulnya memuat "live":
+    python youtube_downloader.py -u "https://www.youtube.com/@CHANNEL/videos" --playlist --items 1-50 --match live
+
+  Lanjutkan batch yang terputus (Ctrl-C, crash):
+    python youtube_downloader.py -F urls.txt -f mp4 --resume
 
   Jalankan mode interaktif:
     python youtube_downloader.py
@@ -648,7 +1171,10 @@ Penggunaan Contoh CLI:
     parser.add_argument('--format', '-f', choices=['mp3', 'mp4'], help='Format unduhan (mp3 atau mp4)')
     parser.add_argument('--quality', '-q', help='Kualitas video/audio (mis. 320k untuk MP3, 720p untuk MP4)')
     parser.add_argument('--output', '-o', help='Folder output kustom')
+    parser.add_argument('--audio-mode', choices=list(AUDIO_MODES),
+                        help="Untuk -f mp3: 'strict-mp3' selalu encode ke MP3, 'fastest' menyimpan m4a/opus tanpa encode ulang")
     parser.add_argument('--error-behavior', choices=['skip', 'abort'], help='Perilaku saat error (skip unduhan atau hentikan semua)')
+    parser.add_argument('--workers', '-w', type=int, help='Jumlah unduhan paralel untuk --file (default dari konfigurasi)')
     parser.add_argument('--output-mode', choices=['separate', 'date', 'channel'], help='Mode pengorganisasian folder output')
     parser.add_argument('--auto-open', action='store_true', help='Buka file setelah unduhan selesai')
     parser.add_argument('--no-auto-open', dest='auto_open', action='store_false', help='Jangan buka file setelah unduhan selesai')
@@ -660,6 +1186,15 @@ Penggunaan Contoh CLI:
 
     parser.add_argument('--config', '-c', default="config.json", help='Path ke file konfigurasi (default: config.json)')
     parser.add_argument('--save-config', action='store_true', help='Simpan konfigurasi default saat ini ke file dan keluar')
+    parser.add_argument('--progress-json', help='Tulis statistik unduhan (kecepatan, ETA, per unduhan) ke file JSON ini')
+    parser.add_argument('--progress-prom', help='Tulis statistik unduhan sebagai textfile Prometheus ke path ini')
+    parser.add_argument('--verify-archive', action='store_true', help='Cocokkan arsip unduhan dengan file di disk lalu keluar')
+    parser.add_argument('--force', action='store_true', help='Unduh ulang walaupun sudah ada di arsip unduhan')
+    parser.add_argument('--resume', action='store_true', help='Lanjutkan batch yang terputus (dengan --file/--playlist: batch untuk sumber itu)')
+    parser.add_argument('--playlist', action='store_true', help='Perlakukan --url sebagai playlist/channel dan unduh semua entrinya')
+    parser.add_argument('--items', help='Entri playlist yang diunduh, mis. "1-10,15,20-" (default: semua)')
+    parser.add_argument('--match', help='Hanya entri playlist yang judulnya cocok dengan regex ini')
+    parser.add_argument('--max-items', type=int, help='Jumlah maksimum entri playlist yang dipilih')
 
     parser.add_argument('--platform', '-p', choices=['youtube', 'bstation'], 
                         help='Secara eksplisit tentukan platform unduhan (default: deteksi otomatis atau YouTube)')
@@ -682,15 +1217,30 @@ Penggunaan Contoh CLI:
             downloader.config['mp3_quality'] = args.quality
         elif args.format == 'mp4':
             downloader.config['mp4_quality'] = args.quality
+    if args.progress_json:
+        downloader.config['progress_json'] = args.progress_json
+    if args.progress_prom:
+        downloader.config['progress_prometheus'] = args.progress_prom
+    if args.audio_mode:
+        downloader.config['audio_mode'] = args.audio_mode
     if args.error_behavior:
         downloader.config['error_behavior'] = args.error_behavior
     if args.output_mode:
         downloader.config['output_mode'] = args.output_mode
+    if args.workers:
+        downloader.config['max_workers'] = max(1, args.workers)
     if args.auto_open is not None:
         downloader.config['auto_open'] = args.auto_open
 
     if args.bstation_cookie_browser:
         downloader.config['bstation_cookie_browser'] = args.bstation_cookie_browser
+    if args.force:
+        downloader.config['use_archive'] = False
+
+    if args.verify_archive:
+        downloader.verify_archive()
+        downloader.close()
+        sys.exit(0)
 
     if args.save_config:
         downloader.save_config()
@@ -725,7 +1275,11 @@ Penggunaan Contoh CLI:
                 args.format = downloader.config['default_format']
                 console.print(f"[dim]Menggunakan format default: {args.format}[/dim]")
             
-            downloader.download_single(target_url, args.format)
+            if args.playlist:
+                downloader.download_playlist(target_url, args.format, items=args.items, match=args.match,
+                                             max_items=args.max_items, resume=args.resume)
+            else:
+                downloader.download_single(target_url, args.format)
         elif args.file:
             target_file = args.file
             # Tentukan format untuk CLI jika tidak dispesifikasikan dan platformnya Bstation
@@ -736,10 +1290,13 @@ Penggunaan Contoh CLI:
                 args.format = downloader.config['default_format']
                 console.print(f"[dim]Menggunakan format default: {args.format}[/dim]")
 
-            downloader.download_from_file(target_file, args.format)
+            downloader.download_from_file(target_file, args.format, resume=args.resume)
+    elif args.resume:
+        downloader.resume_batch()
     else:
         # Mode interaktif
         downloader.interactive_mode()
+    downloader.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,295 @@
+# benchmarks/chat_bench.py
+"""Offline latency/throughput benchmarks for the chat engine
+
+Runs against the deterministic mock backend, so no API key or network is
+needed. Results are written as JSON; pass --compare with an earlier result
+file to see the change per metric between commits.
+
+    python -m benchmarks.chat_bench --output bench_results.json
+    python -m benchmarks.chat_bench --quick --compare old.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from modules.backends import MockBackend, MOCK_VOCABULARY
+from modules.context_builder import ContextBuilder, TokenCounter
+from modules.history_sqlite import SQLiteHistoryStore
+from modules.history_store import HistoryStore
+from modules.model_router import percentile
+from modules.retrieval import RetrievalIndex, np as numpy_module
+
+DEFAULT_OUTPUT = Path("bench_results.json")
+CHAT_PROMPTS = [
+    "apa itu phishing",
+    "bagaimana cara mengamankan akun email",
+    "jelaskan autentikasi dua faktor",
+    "apa beda firewall dan vpn",
+    "kenapa ransomware berbahaya",
+]
+
+
+def _synthetic_turns(count: int, seed: int = 0) -> List[Dict]:
+    """Deterministic history entries, oldest first, all within the last day"""
+    rng = random.Random(seed)
+    start = datetime.datetime.now() - datetime.timedelta(hours=23)
+    step = datetime.timedelta(hours=22) / max(count, 1)
+    turns = []
+    for index in range(count):
+        user = " ".join(rng.choice(MOCK_VOCABULARY) for _ in range(rng.randint(4, 15)))
+        mio = " ".join(rng.choice(MOCK_VOCABULARY) for _ in range(rng.randint(20, 80)))
+        turns.append({
+            "timestamp": (start + step * index).isoformat(),
+            "user": user,
+            "mio": mio,
+            "tokens": (len(user) + len(mio)) // 4,
+        })
+    return turns
+
+
+def _timed(func: Callable, repeat: int) -> Dict:
+    """Run `func` `repeat` times and summarize the wall time in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": percentile(samples, 95),
+        "repeat": repeat,
+    }
+
+
+def bench_chat(turns: int, first_token_latency: float, tokens_per_second: float,
+               error_rate: float, prefill_ms_per_kchar: float = 0.0) -> Dict:
+    """Time-to-first-token and turns/sec through the real ChatEngine turn path"""
+    # Diimpor di sini karena chat_engine membuat console dan mengatur logging
+    import logging
+    from modules import chat_engine
+
+    logging.getLogger().setLevel(logging.WARNING)
+    backend = MockBackend(first_token_latency=first_token_latency, tokens_per_second=tokens_per_second,
+                          error_rate=error_rate, seed=1,
+                          prefill_seconds_per_kchar=prefill_ms_per_kchar / 1000)
+    with tempfile.TemporaryDirectory() as data_dir:
+        engine = chat_engine.ChatEngine(backend=backend, data_dir=Path(data_dir))
+        engine.response_cache.enabled = False
+        ttfts, totals, payloads = [], [], []
+        fallbacks = 0
+        # Request saat startup (probe) tidak dihitung
+        base_requests, base_chars = backend.requests, backend.request_chars
+
+        started = time.perf_counter()
+        for index in range(turns):
+            prompt = f"{CHAT_PROMPTS[index % len(CHAT_PROMPTS)]} ({index})"
+            reply = "".join(engine.generate_response_stream(prompt)).strip()
+            engine.save_to_history(prompt, reply)
+            metrics = engine.last_turn_metrics
+            if reply == chat_engine.FALLBACK_RESPONSE:
+                fallbacks += 1
+            elif metrics.get("ttft") is not None:
+                ttfts.append(metrics["ttft"] * 1000)
+            totals.append(metrics["total"] * 1000)
+            payloads.append(metrics.get("payload_chars", 0))
+        elapsed = time.perf_counter() - started
+        engine.close()
+
+    return {
+        "turns": turns,
+        "backend": {
+            "first_token_latency_s": first_token_latency,
+            "tokens_per_second": tokens_per_second,
+            "error_rate": error_rate,
+            "prefill_ms_per_kchar": prefill_ms_per_kchar,
+        },
+        "system_instruction": engine._persona_in_model(),
+        "turns_per_sec": turns / elapsed,
+        "ttft_p50_ms": percentile(ttfts, 50),
+        "ttft_p95_ms": percentile(ttfts, 95),
+        # TTFT dikurangi latensi buatan = overhead engine sendiri
+        "ttft_overhead_p50_ms": percentile(ttfts, 50) - first_token_latency * 1000 if ttfts else None,
+        "turn_p50_ms": percentile(totals, 50),
+        "turn_p95_ms": percentile(totals, 95),
+        "payload_chars_max": max(payloads) if payloads else 0,
+        "request_chars_per_turn": (backend.request_chars - base_chars) / max(1, backend.requests - base_requests),
+        "fallbacks": fallbacks,
+        "backend_requests": backend.requests,
+    }
+
+
+def bench_history(sizes: List[int], appends: int, repeat: int) -> Dict:
+    """Save (append) and load (tail / full scan) cost for both stores vs. history size"""
+    results = {}
+    for backend in ("jsonl", "sqlite"):
+        rows = []
+        for size in sizes:
+            turns = _synthetic_turns(size + appends, seed=size)
+            with tempfile.TemporaryDirectory() as tmp:
+                if backend == "sqlite":
+                    store = SQLiteHistoryStore(Path(tmp) / "history.db")
+                    store.import_entries(turns[:size])
+                else:
+                    store = HistoryStore(Path(tmp) / "history", fsync_policy="never")
+                    for entry in turns[:size]:
+                        store.append(entry)
+                    store.fsync_policy = "interval"
+
+                extra = iter(turns[size:])
+                save = _timed(lambda: store.append(next(extra)), appends)
+                tail = _timed(lambda: store.tail(20), repeat)
+                scan = _timed(lambda: sum(1 for _ in store.iter_entries()), max(1, repeat // 5))
+                store.close()
+
+            rows.append({
+                "size": size,
+                "save_median_ms": save["median_ms"],
+                "save_p95_ms": save["p95_ms"],
+                "load_tail20_median_ms": tail["median_ms"],
+                "load_full_scan_median_ms": scan["median_ms"],
+            })
+        results[backend] = rows
+    return results
+
+
+def bench_context(sizes: List[int], budget: int, repeat: int) -> Dict:
+    """ContextBuilder.build cost vs. number of candidate turns"""
+    builder = ContextBuilder(TokenCounter(), budget=budget)
+    rows = []
+    for size in sizes:
+        turns = _synthetic_turns(size, seed=size)
+        # Tanpa 'tokens' tersimpan: tiap giliran dihitung oleh TokenCounter
+        legacy = [{key: value for key, value in entry.items() if key != "tokens"} for entry in turns]
+        stored = _timed(lambda: builder.build(turns, query="phishing akun email"), repeat)
+        counted = _timed(lambda: builder.build(legacy, query="phishing akun email"), repeat)
+        rows.append({
+            "candidate_turns": size,
+            "stored_tokens_median_ms": stored["median_ms"],
+            "counted_tokens_median_ms": counted["median_ms"],
+        })
+    return {"budget": budget, "rows": rows}
+
+
+def bench_retrieval(sizes: List[int], repeat: int) -> Dict:
+    """Retrieval index build time and top-k query latency vs. number of turns"""
+    rows = []
+    for size in sizes:
+        index = RetrievalIndex()
+        turns = _synthetic_turns(size, seed=size)
+        started = time.perf_counter()
+        index.build(turns)
+        build_s = time.perf_counter() - started
+        query = _timed(lambda: index.search("phishing akun email enkripsi", k=4), repeat)
+        add = _timed(lambda: index.add({**turns[-1], "timestamp": time.time()}), repeat)
+        rows.append({
+            "size": size,
+            "build_s": build_s,
+            "query_median_ms": query["median_ms"],
+            "query_p95_ms": query["p95_ms"],
+            "add_median_ms": add["median_ms"],
+        })
+    return {"numpy": numpy_module is not None, "rows": rows}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _flatten(value, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves keyed by path, e.g. 'history.sqlite.size=1000.save_median_ms'"""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}{key}."))
+    elif isinstance(value, list):
+        for item in value:
+            label = next((f"{k}={item[k]}" for k in ("size", "candidate_turns") if k in item), None)
+            if label:
+                flat.update(_flatten({k: v for k, v in item.items() if f"{k}={v}" != label},
+                                     f"{prefix}{label}."))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix.rstrip(".")] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print each metric next to the baseline with the relative change"""
+    old = _flatten(baseline.get("results", {}))
+    new = _flatten(current["results"])
+    print(f"Perbandingan dengan {baseline.get('meta', {}).get('commit', '?')}:")
+    for key in sorted(new):
+        if key not in old:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        print(f"  {key:<60} {old[key]:>12.3f} → {new[key]:>12.3f}  ({change:+.1f}%)")
+
+
+def run(args) -> Dict:
+    if args.quick:
+        history_sizes, context_sizes, turns = [100, 1000], [20, 50, 200], 10
+        retrieval_sizes = [1000, 10000]
+    else:
+        history_sizes, context_sizes, turns = [100, 1000, 10000, 50000], [20, 50, 200, 1000], 40
+        retrieval_sizes = [10000, 100000]
+
+    results = {}
+    print("• Chat (mock backend)...")
+    results["chat"] = bench_chat(turns, args.latency, args.token_rate, args.error_rate,
+                                 args.prefill_ms_per_kchar)
+    print("• Riwayat (simpan/muat)...")
+    results["history"] = bench_history(history_sizes, appends=50, repeat=args.repeat)
+    print("• Penyusunan konteks...")
+    results["context"] = bench_context(context_sizes, budget=2000, repeat=args.repeat)
+    print("• Indeks retrieval...")
+    results["retrieval"] = bench_retrieval(retrieval_sizes, repeat=args.repeat)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chat engine secara offline")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", type=Path, help="file hasil sebelumnya untuk dibandingkan")
+    parser.add_argument("--quick", action="store_true", help="ukuran kecil untuk cek cepat")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="latensi first token mock (detik)")
+    parser.add_argument("--token-rate", type=float, default=400.0, help="token per detik mock")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="peluang error per request mock")
+    parser.add_argument("--prefill-ms-per-kchar", type=float, default=2.0,
+                        help="biaya mock memproses prompt per 1000 karakter")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    args.output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"Hasil ditulis ke {args.output}")
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text(encoding='utf-8')))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
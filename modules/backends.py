@@ -0,0 +1,228 @@
+# modules/backends.py
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+GEMINI_REQUESTS_PER_MINUTE = 15  # Kuota free tier; sesuaikan dengan paket API
+GEMINI_TOKENS_PER_MINUTE = 1_000_000
+
+MOCK_VOCABULARY = (
+    "keamanan siber phishing malware enkripsi firewall jaringan akun kata sandi "
+    "autentikasi dua faktor privasi data server serangan pertahanan etika hacker "
+    "sistem operasi pembaruan cadangan verifikasi tautan email lampiran"
+).split()
+
+
+class ChatBackend:
+    """Interface between ChatEngine and a model provider
+
+    `build_model` returns an object with `generate_content(contents,
+    stream=False, request_options=None)`, the subset of
+    `genai.GenerativeModel` that the engine uses.
+    """
+
+    name = "base"
+    # Kuota per menit untuk QuotaLimiter; None = tidak dibatasi
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    # True jika build_model bisa memasang persona sebagai system instruction.
+    # Instruksi itu tetap ikut terkirim di setiap request; yang hilang hanya
+    # giliran preamble persona di isi percakapan.
+    supports_system_instruction = False
+
+    def configure(self):
+        pass
+
+    def build_model(self, model_name: str, generation_config: Dict, safety_settings: List[Dict],
+                    system_instruction: Optional[str] = None):
+        raise NotImplementedError
+
+    def list_models(self) -> List[str]:
+        return []
+
+
+class GeminiBackend(ChatBackend):
+    """Google Gemini through google-generativeai"""
+
+    name = "gemini"
+    supports_system_instruction = True
+
+    def __init__(self, api_key: Optional[str],
+                 requests_per_minute: Optional[float] = GEMINI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: Optional[float] = GEMINI_TOKENS_PER_MINUTE):
+        self.api_key = api_key
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._genai = None
+
+    def configure(self):
+        # Import di sini supaya backend lain bisa dipakai tanpa paket Google
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        self._genai = genai
+
+    def build_model(self, model_name: str, generation_config: Dict, safety_settings: List[Dict],
+                    system_instruction: Optional[str] = None):
+        if self._genai is None:
+            self.configure()
+        kwargs = {}
+        if system_instruction:
+            kwargs["system_instruction"] = system_instruction
+        return self._genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            **kwargs
+        )
+
+    def list_models(self) -> List[str]:
+        if self._genai is None:
+            self.configure()
+        return [model.name for model in self._genai.list_models() if hasattr(model, 'name')]
+
+
+class MockBackendError(Exception):
+    """Injected failure from the mock backend"""
+
+
+class MockResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class MockModel:
+    """Deterministic offline stand-in for a GenerativeModel
+
+    Like Gemini, the system instruction is sent and prefilled with every
+    request; there is no server-side caching of it.
+    """
+
+    def __init__(self, backend: "MockBackend", model_name: str, max_output_tokens: int,
+                 system_instruction: Optional[str] = None):
+        self.backend = backend
+        self.model_name = model_name
+        self.max_output_tokens = max_output_tokens
+        self.system_instruction = system_instruction
+
+    def _prefill_chars(self, contents) -> int:
+        chars = len(contents) if isinstance(contents, str) else sum(
+            len(str(part)) for item in contents for part in item.get("parts", [])
+        )
+        return chars + len(self.system_instruction or "")
+
+    @staticmethod
+    def _last_user_text(contents) -> str:
+        if isinstance(contents, str):
+            return contents
+        last = contents[-1]
+        parts = last.get("parts", []) if isinstance(last, dict) else [str(last)]
+        return " ".join(str(part) for part in parts)
+
+    def _reply_tokens(self, prompt: str) -> List[str]:
+        # Jawaban sama untuk prompt yang sama, apa pun urutan request-nya
+        digest = hashlib.sha256(f"{self.backend.seed}:{prompt}".encode('utf-8')).digest()
+        rng = random.Random(digest)
+        length = min(self.max_output_tokens, rng.randint(*self.backend.reply_tokens))
+        return [rng.choice(MOCK_VOCABULARY) for _ in range(length)]
+
+    def generate_content(self, contents, stream: bool = False, request_options: Optional[Dict] = None):
+        self.backend.record_request(contents, self.system_instruction)
+        prompt = self._last_user_text(contents)
+        tokens = self._reply_tokens(prompt)
+        prefill = self._prefill_chars(contents)
+
+        if stream:
+            return self._stream(tokens, prefill)
+
+        self.backend.wait_first_token(self.model_name, prefill)
+        self.backend.sleep(len(tokens) / self.backend.tokens_per_second)
+        return MockResponse(" ".join(tokens).capitalize() + ".")
+
+    def _stream(self, tokens: List[str], prefill: int) -> Iterator[MockResponse]:
+        self.backend.wait_first_token(self.model_name, prefill)
+        chunk_size = self.backend.chunk_tokens
+        for start in range(0, len(tokens), chunk_size):
+            chunk = tokens[start:start + chunk_size]
+            if start:
+                self.backend.sleep(len(chunk) / self.backend.tokens_per_second)
+            text = " ".join(chunk)
+            if start == 0:
+                text = text.capitalize()
+            yield MockResponse(text + (" " if start + chunk_size < len(tokens) else "."))
+
+
+class MockBackend(ChatBackend):
+    """Local stand-in with configurable latency, token rate and error injection"""
+
+    name = "mock"
+    supports_system_instruction = True
+
+    def __init__(self, first_token_latency: float = 0.05, latency_jitter: float = 0.0,
+                 tokens_per_second: float = 200.0, chunk_tokens: int = 8,
+                 reply_tokens=(20, 80), error_rate: float = 0.0,
+                 failing_models=(), slow_models: Optional[Dict[str, float]] = None,
+                 seed: int = 0, realtime: bool = True,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 prefill_seconds_per_kchar: float = 0.0):
+        self.first_token_latency = first_token_latency
+        self.latency_jitter = latency_jitter
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.failing_models = set(failing_models)
+        self.slow_models = dict(slow_models or {})
+        self.seed = seed
+        self.realtime = realtime
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Biaya memproses prompt (termasuk system instruction), per 1000 karakter
+        self.prefill_seconds_per_kchar = prefill_seconds_per_kchar
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.request_chars = 0
+        self.system_instruction_chars = 0
+
+    def build_model(self, model_name: str, generation_config: Dict, safety_settings: List[Dict],
+                    system_instruction: Optional[str] = None):
+        with self._lock:
+            self.system_instruction_chars += len(system_instruction or "")
+        return MockModel(self, model_name, generation_config.get("max_output_tokens", 1024),
+                         system_instruction)
+
+    def list_models(self) -> List[str]:
+        return ["mock-model"]
+
+    def sleep(self, seconds: float):
+        if self.realtime and seconds > 0:
+            time.sleep(seconds)
+
+    def record_request(self, contents, system_instruction: Optional[str] = None):
+        with self._lock:
+            self.requests += 1
+            self.request_chars += len(str(contents)) + len(system_instruction or "")
+
+    def wait_first_token(self, model_name: str, prefill_chars: int = 0):
+        with self._lock:
+            failed = model_name in self.failing_models or self._rng.random() < self.error_rate
+            jitter = self._rng.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+        if failed:
+            raise MockBackendError(f"Injected failure for {model_name}")
+        prefill = prefill_chars / 1000 * self.prefill_seconds_per_kchar
+        self.sleep(self.slow_models.get(model_name, self.first_token_latency) + jitter + prefill)
+
+
+def create_backend(name: str, api_key: Optional[str] = None) -> ChatBackend:
+    """Build a backend by name ('gemini' or 'mock')"""
+    if name == "mock":
+        return MockBackend()
+    if name == "gemini":
+        return GeminiBackend(api_key)
+    raise ValueError(f"Unknown chat backend: {name}")
@@ -0,0 +1,222 @@
+# modules/batch_chat.py
+"""Run a JSONL file of prompts through Mio without the interactive loop
+
+    python -m modules.batch_chat prompts.jsonl -o replies.jsonl --workers 4 --rate 2
+
+Each input line is a JSON object; the prompt is read from the first of
+--field, "prompt", "message", "text" or "body" that is present ("title"
+is prepended when the line also has one, as in requests.jsonl). Output
+lines keep the input order.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from rich.console import Console
+from rich.table import Table
+
+from modules.model_router import percentile
+from modules.rate_limiter import QuotaLimiter
+
+BATCH_WORKERS = 4
+BATCH_RATE_PER_SECOND = 2.0  # Request per detik ke model, dibagi semua proses batch (0 = tanpa batas)
+BATCH_QUOTA_NAME = "batch"
+BATCH_MAX_PENDING_PER_WORKER = 4  # Prompt yang boleh menunggu per worker
+PROMPT_FIELDS = ("prompt", "message", "text", "body")
+
+logger = logging.getLogger(__name__)
+
+console = Console()
+
+
+def read_prompts(path: Path, field: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """Yield (index, record) per non-blank line without loading the whole file"""
+    fields = ((field,) if field else ()) + PROMPT_FIELDS
+    with open(path, 'r', encoding='utf-8') as f:
+        index = 0
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    item = {"prompt": item}
+            except json.JSONDecodeError as e:
+                yield index, {"line": line_number, "error": f"JSON tidak valid: {e}"}
+                index += 1
+                continue
+
+            prompt = next((str(item[name]) for name in fields if item.get(name)), None)
+            record = {
+                "line": line_number,
+                "id": item.get("id") or item.get("request_id"),
+                "prompt": prompt,
+            }
+            if prompt is None:
+                record["error"] = "prompt kosong"
+            elif item.get("title") and "title" not in fields:
+                record["prompt"] = f"{item['title']}\n\n{prompt}"
+            yield index, record
+            index += 1
+
+
+class BatchRunner:
+    """Bounded-concurrency pipeline from a prompt file to an ordered JSONL output"""
+
+    def __init__(self, engine, workers: int = BATCH_WORKERS, rate: float = BATCH_RATE_PER_SECOND,
+                 use_cache: bool = True, save_history: bool = True):
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.rate = rate
+        # Bucket sendiri di database kuota engine: semua batch yang berjalan bersama ikut dibatasi
+        self.limiter = QuotaLimiter(
+            engine.quota.path, name=BATCH_QUOTA_NAME,
+            requests_per_minute=rate * 60 if rate > 0 else None
+        )
+        self.use_cache = use_cache
+        self.save_history = save_history
+        self.max_pending = self.workers * BATCH_MAX_PENDING_PER_WORKER
+
+    def close(self):
+        self.limiter.close()
+
+    def _process(self, index: int, record: Dict) -> Dict:
+        result = {"index": index, "id": record.get("id"), "prompt": record.get("prompt")}
+        if record.get("error"):
+            result.update(reply=None, error=record["error"], latency_ms=0.0)
+            return result
+
+        started = time.perf_counter()
+        try:
+            # Jawaban dari cache tidak memakai kuota, jadi limiter hanya untuk request ke model
+            reply, metrics = self.engine.complete(
+                record["prompt"], use_cache=self.use_cache, before_request=self.limiter.acquire
+            )
+            failed = metrics["model"] is None and metrics["cache"] != "hit"
+            if not failed and metrics["cache"] != "hit" and self.save_history:
+                self.engine.save_to_history(record["prompt"], reply)
+        except Exception as e:
+            # Satu prompt yang gagal (kuota, SQLite, ...) tidak menghentikan seluruh batch
+            logger.error(f"Prompt {index} failed: {e}")
+            result.update(reply=None, error=str(e), latency_ms=(time.perf_counter() - started) * 1000)
+            return result
+        result.update(
+            reply=None if failed else reply,
+            model=metrics["model"],
+            cache=metrics["cache"],
+            attempts=metrics["attempts"],
+            latency_ms=metrics["latency"] * 1000,
+            queued_ms=metrics["queued"] * 1000,
+            error=metrics["error"] if failed else None,
+        )
+        return result
+
+    def run(self, prompts: Iterator[Tuple[int, Dict]], output) -> Dict:
+        """Process `prompts` and write one JSON line per prompt, in input order"""
+        latencies: List[float] = []
+        counts = {"prompts": 0, "ok": 0, "errors": 0, "cache_hits": 0}
+        pending: Deque[Future] = deque()
+        started = time.perf_counter()
+
+        def drain_one():
+            result = pending.popleft().result()
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            counts["prompts"] += 1
+            if result.get("error"):
+                counts["errors"] += 1
+            else:
+                counts["ok"] += 1
+                if result.get("cache") == "hit":
+                    counts["cache_hits"] += 1
+                else:
+                    latencies.append(result["latency_ms"])
+            if counts["prompts"] % 10 == 0:
+                console.print(f"[dim]… {counts['prompts']} prompt selesai[/dim]")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mio-batch") as pool:
+            for index, record in prompts:
+                # Antrian dibatasi: file besar tidak dimuat seluruhnya ke memori
+                if len(pending) >= self.max_pending:
+                    drain_one()
+                pending.append(pool.submit(self._process, index, record))
+            while pending:
+                drain_one()
+        output.flush()
+
+        elapsed = time.perf_counter() - started
+        return {
+            **counts,
+            "elapsed_s": elapsed,
+            "throughput_per_s": counts["prompts"] / elapsed if elapsed else 0.0,
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p90_ms": percentile(latencies, 90),
+            "latency_p95_ms": percentile(latencies, 95),
+            "latency_p99_ms": percentile(latencies, 99),
+            "workers": self.workers,
+            "rate_per_s": self.rate,
+        }
+
+
+def show_report(report: Dict):
+    """Print the aggregate throughput and latency table"""
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:.0f} ms" if value is not None else "-"
+
+    table = Table(title="Hasil Batch", show_header=False)
+    table.add_column("Properti", style="cyan")
+    table.add_column("Nilai", style="white")
+    table.add_row("Prompt", f"{report['prompts']} ({report['ok']} ok, {report['errors']} error)")
+    table.add_row("Dari cache", str(report["cache_hits"]))
+    table.add_row("Waktu total", f"{report['elapsed_s']:.1f} s")
+    table.add_row("Throughput", f"{report['throughput_per_s']:.2f} prompt/s")
+    for pct in (50, 90, 95, 99):
+        table.add_row(f"Latensi p{pct}", fmt(report[f"latency_p{pct}_ms"]))
+    console.print(table)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Jalankan file prompt JSONL lewat Mio")
+    parser.add_argument("input", type=Path, help="file JSONL berisi prompt")
+    parser.add_argument("-o", "--output", type=Path, help="file JSONL hasil (default: <input>.out.jsonl)")
+    parser.add_argument("--field", help="nama field prompt di tiap baris")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_PER_SECOND,
+                        help="request per detik ke model (semua proses batch bersama), 0 = tanpa batas")
+    parser.add_argument("--no-cache", action="store_true", help="selalu minta jawaban baru")
+    parser.add_argument("--no-history", action="store_true", help="jangan simpan ke riwayat")
+    parser.add_argument("--report", type=Path, help="tulis statistik agregat sebagai JSON")
+    args = parser.parse_args(argv)
+
+    output_path = args.output or args.input.with_suffix(".out.jsonl")
+
+    # Diimpor di sini supaya '--help' tidak perlu menginisialisasi model
+    from modules.chat_engine import ChatEngine
+    engine = ChatEngine()
+    try:
+        runner = BatchRunner(
+            engine, workers=args.workers, rate=args.rate,
+            use_cache=not args.no_cache, save_history=not args.no_history
+        )
+        try:
+            with open(output_path, 'w', encoding='utf-8') as output:
+                report = runner.run(read_prompts(args.input, args.field), output)
+        finally:
+            runner.close()
+    finally:
+        engine.close()
+
+    show_report(report)
+    console.print(f"[green]✓ Hasil ditulis ke {output_path}[/green]")
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,88 @@
 # modules/chat_engine.py
-import google.generativeai as genai
 from rich.console import Console
 from rich.prompt import Prompt
 from rich.panel import Panel
 from rich.text import Text
+from rich.live import Live
+from rich.table import Table
 import datetime
-import json
+import hashlib
 import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Iterator, Tuple
 import logging
 
+from modules.backends import ChatBackend, create_backend
+from modules.model_cache import ModelCache, MODEL_CACHE_FILE
+from modules.history_store import HistoryStore, MATCH_START, MATCH_END
+from modules.history_sqlite import SQLiteHistoryStore
+from modules.context_builder import ContextBuilder, TokenCounter, CHARS_PER_TOKEN
+from modules.chat_session import SlidingWindowSession
+from modules.summarizer import HistoryCompactor
+from modules.response_cache import ResponseCache, make_cache_key, RESPONSE_CACHE_DB
+from modules.model_router import ModelRouter
+from modules.hedging import Hedger
+from modules.rate_limiter import QuotaLimiter, QUOTA_DB, is_quota_error
+from modules.retrieval import RetrievalIndex
+from modules.engine_registry import EngineRegistry, ENGINE_IDLE_EXPIRY
+
 # Configuration
-API_KEY = os.getenv("YOUR_API_KEY)
-HISTORY_FILE = Path("data/conversations.json")
+API_KEY = os.getenv("YOUR_API_KEY")
+CHAT_BACKEND = os.getenv("MIO_CHAT_BACKEND", "gemini")  # 'gemini' atau 'mock' (offline, tanpa API key)
+DATA_DIR = Path("data")
+HISTORY_FILE = DATA_DIR / "conversations.json"  # Format lama, dimigrasi otomatis
+HISTORY_DIR = DATA_DIR / "history"
+HISTORY_FSYNC_POLICY = "interval"  # 'always', 'interval', atau 'never'
+HISTORY_BACKEND = "jsonl"  # 'jsonl' atau 'sqlite' (dengan pencarian FTS5)
+HISTORY_DB = DATA_DIR / "history.db"
+SEARCH_RESULT_LIMIT = 5
 MAX_HISTORY_DAYS = 7
 MAX_CONTEXT_MESSAGES = 20  # Batasi konteks untuk menghindari token limit
+CONTEXT_TOKEN_BUDGET = 2000  # Budget token untuk konteks riwayat di awal sesi
+CONTEXT_CANDIDATE_TURNS = 50  # Jumlah giliran terbaru yang dipertimbangkan
+SESSION_WINDOW_TURNS = 6  # Giliran live yang dikirim utuh; sisanya diringkas
+SUMMARY_WORKER_ENABLED = True  # Ringkas riwayat lama di background saat user idle
+SUMMARY_MAX_CALLS_PER_HOUR = 10
+CONTEXT_SUMMARY_LIMIT = 10  # Ringkasan terbaru yang dipertimbangkan untuk konteks
+RETRIEVAL_ENABLED = True  # Cari giliran lama yang relevan di seluruh riwayat (lokal)
+RETRIEVAL_TOP_K = 4
+RESPONSE_CACHE_ENABLED = True  # Jawab pertanyaan berulang (FAQ) dari cache lokal
+HEDGING_ENABLED = False  # Kirim request cadangan ke model kedua jika model utama lambat
+HEDGE_PERCENTILE = 95
+SYSTEM_INSTRUCTION_ENABLED = True  # Persona sebagai system instruction; tetap ikut terkirim di setiap request
+QUOTA_EXPECTED_OUTPUT_TOKENS = 300  # Perkiraan awal token jawaban, dikoreksi setelah selesai
+ENGINE_REUSE_ENABLED = True  # Simpan engine & sesi aktif antar pembukaan chat dari menu
+STREAM_RESPONSES = True  # Tampilkan jawaban Mio secara bertahap (per chunk)
+STREAM_REFRESH_PER_SECOND = 15
+FALLBACK_RESPONSE = "M-maaf... aku sedang bingung... bisa ulangi pertanyaannya?"
+
+# Konfigurasi model dengan parameter yang lebih baik
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "top_k": 40,
+    "max_output_tokens": 1024,
+}
+
+# Safety settings untuk menghindari konten berbahaya
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
+# Coba beberapa model names yang berbeda (urutan = prioritas)
+MODEL_NAMES = [
+    "gemini-1.5-flash",
+    "gemini-1.5-pro",
+    "gemini-pro",
+    "models/gemini-1.5-flash",
+    "models/gemini-1.5-pro",
+    "models/gemini-pro"
+]
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -24,122 +91,267 @@ logger = logging.getLogger(__name__)
 console = Console()
 
 class ChatEngine:
-    def __init__(self):
+    def __init__(self, backend: Optional[ChatBackend] = None, data_dir: Optional[Path] = None,
+                 shared: Optional["ChatEngine"] = None):
+        # Semua file (riwayat, cache) berada di bawah data_dir, default 'data/'
+        self.data_dir = Path(data_dir) if data_dir else DATA_DIR
         self.model = None
         self.conversation = None
-        self.initialize_model()
+        self.model_name: Optional[str] = None
+        self._model_validated = False
+        # complete() dipanggil dari banyak thread; pergantian model utama harus atomik
+        self._model_lock = threading.RLock()
+        self.last_turn_metrics: Dict = {}
+        self.last_context_report: Dict = {}
+        self._persona_hash = self._hash_persona()
+        self._summary_model = None
+        self._summary_model_name: Optional[str] = None
+        # Sesi server memakai model, router dan cache milik engine `shared`;
+        # yang terpisah hanya riwayat dan percakapan live
+        self._owns_shared = shared is None
+        if shared:
+            self.backend = shared.backend
+            self.model_cache = shared.model_cache
+            self.router = shared.router
+            self.hedger = shared.hedger
+            self.quota = shared.quota
+            self.hedging_enabled = shared.hedging_enabled
+            self.token_counter = shared.token_counter
+            self.response_cache = shared.response_cache
+        else:
+            self.backend = backend or create_backend(CHAT_BACKEND, api_key=API_KEY)
+            self.model_cache = ModelCache(self._data_path(MODEL_CACHE_FILE))
+            self.router = ModelRouter(MODEL_NAMES, self._build_model)
+            # Kuota dibagi dengan proses lain (batch, server) lewat file SQLite
+            self.quota = QuotaLimiter(
+                self._data_path(QUOTA_DB), name=self.backend.name,
+                requests_per_minute=self.backend.requests_per_minute,
+                tokens_per_minute=self.backend.tokens_per_minute
+            )
+            self.hedger = Hedger(self.router, percentile_value=HEDGE_PERCENTILE, quota=self.quota)
+            self.hedging_enabled = HEDGING_ENABLED
+            self.token_counter = TokenCounter()
+            self.response_cache = ResponseCache(self._data_path(RESPONSE_CACHE_DB))
+            self.response_cache.enabled = RESPONSE_CACHE_ENABLED
+        self.context_builder = ContextBuilder(self.token_counter, budget=CONTEXT_TOKEN_BUDGET)
+        self.history = self._open_history()
+        self.retrieval = RetrievalIndex()
+        if RETRIEVAL_ENABLED:
+            # Indeks riwayat lama dibangun di background; pesan baru ditambahkan langsung
+            self.retrieval.build_async(lambda: self.history.iter_entries(since=self._history_cutoff()))
+        if shared:
+            self.model_name = shared.model_name
+            self.model = shared.model
+            self._model_validated = shared._model_validated
+        else:
+            self.initialize_model()
+        self.compactor = HistoryCompactor(
+            self.history, self._model_for_summaries,
+            max_calls_per_hour=SUMMARY_MAX_CALLS_PER_HOUR, quota=self.quota
+        )
+    
+    def _data_path(self, path: Path) -> Path:
+        """Map a default 'data/...' path into this engine's data directory"""
+        return self.data_dir / Path(path).relative_to(DATA_DIR)
     
     def initialize_model(self):
-        """Initialize Gemini model with error handling"""
+        """Initialize the model, reusing the cached model name when possible"""
         try:
-            genai.configure(api_key=API_KEY)
-            
-            # Konfigurasi model dengan parameter yang lebih baik
-            generation_config = {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "top_k": 40,
-                "max_output_tokens": 1024,
-            }
-            
-            # Safety settings untuk menghindari konten berbahaya
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            ]
+            self.backend.configure()
             
-            # Coba beberapa model names yang berbeda
-            model_names = [
-                "gemini-1.5-flash",
-                "gemini-1.5-pro",
-                "gemini-pro",
-                "models/gemini-1.5-flash",
-                "models/gemini-1.5-pro",
-                "models/gemini-pro"
-            ]
+            # Pakai model yang terakhir berhasil tanpa test message;
+            # validasi dilakukan saat pesan user pertama dikirim
+            cached_model = self.model_cache.load()
+            if cached_model:
+                self.router.prefer(cached_model)
+                self._use_model(cached_model)
+                self._model_validated = False
+                console.print(f"[green]✓ Model {cached_model} dimuat dari cache[/green]")
+                return
             
-            model_initialized = False
-            for model_name in model_names:
-                try:
-                    self.model = genai.GenerativeModel(
-                        model_name=model_name,
-                        generation_config=generation_config,
-                        safety_settings=safety_settings
-                    )
-                    
-                    # Test the model with a simple message
-                    test_chat = self.model.start_chat()
-                    test_response = test_chat.send_message("Hello")
-                    
-                    console.print(f"[green]✓ Model {model_name} berhasil diinisialisasi[/green]")
-                    model_initialized = True
-                    break
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to initialize model {model_name}: {e}")
-                    continue
-            
-            if not model_initialized:
-                # Jika semua model gagal, coba list available models
-                try:
-                    available_models = genai.list_models()
-                    console.print("[yellow]Model yang tersedia:[/yellow]")
-                    for model in available_models:
-                        if hasattr(model, 'name'):
-                            console.print(f"  - {model.name}")
-                except Exception as e:
-                    logger.error(f"Failed to list models: {e}")
-                
-                raise Exception("Semua model gagal diinisialisasi")
+            self._probe_models()
             
         except Exception as e:
             console.print(f"[red]✗ Gagal menginisialisasi model: {e}[/red]")
             logger.error(f"Model initialization failed: {e}")
             raise
     
-    def load_history(self) -> List[Dict]:
-        """Load conversation history with improved error handling"""
-        try:
-            if not HISTORY_FILE.exists():
-                return []
-            
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+    def _persona_in_model(self) -> bool:
+        return SYSTEM_INSTRUCTION_ENABLED and self.backend.supports_system_instruction
+    
+    def _hash_persona(self) -> str:
+        return hashlib.sha256(self.get_system_prompt().encode('utf-8')).hexdigest()
+    
+    def _build_model(self, model_name: str):
+        """Create a backend model with the shared settings and the persona as system instruction"""
+        system_instruction = self.get_system_prompt() if self._persona_in_model() else None
+        return self.backend.build_model(
+            model_name, GENERATION_CONFIG, SAFETY_SETTINGS, system_instruction=system_instruction
+        )
+    
+    def _refresh_persona(self):
+        """Rebuild models when the persona text changed, so their system instruction stays current"""
+        digest = self._hash_persona()
+        if digest == self._persona_hash:
+            return
+        self._persona_hash = digest
+        if self._persona_in_model():
+            logger.info("System prompt changed, rebuilding models with the new system instruction")
+            self.router.reset_models()
+            if self.model_name:
+                self._use_model(self.model_name)
+    
+    def _model_for_summaries(self):
+        """Primary model without the persona, for background history summaries"""
+        with self._model_lock:
+            if not self._persona_in_model() or not self.model_name:
+                return self.model
+            if self._summary_model_name != self.model_name:
+                self._summary_model = self.backend.build_model(self.model_name, GENERATION_CONFIG, SAFETY_SETTINGS)
+                self._summary_model_name = self.model_name
+            return self._summary_model
+    
+    def _probe_models(self):
+        """Try each model name with a test message until one answers"""
+        model_initialized = False
+        for model_name in MODEL_NAMES:
+            try:
+                self.model = self._build_model(model_name)
+                
+                # Test the model with a simple message
+                self.quota.acquire(QUOTA_EXPECTED_OUTPUT_TOKENS)
+                self.model.generate_content("Hello")
                 
+                console.print(f"[green]✓ Model {model_name} berhasil diinisialisasi[/green]")
+                self.router.prefer(model_name)
+                self.router.set_model(model_name, self.model)
+                self._use_model(model_name)
+                self._model_validated = True
+                self.model_cache.store(model_name, validated=True)
+                model_initialized = True
+                break
+                
+            except Exception as e:
+                logger.warning(f"Failed to initialize model {model_name}: {e}")
+                continue
+        
+        if not model_initialized:
+            # Jika semua model gagal, coba list available models
+            try:
+                available_models = self.backend.list_models()
+                console.print("[yellow]Model yang tersedia:[/yellow]")
+                for name in available_models:
+                    console.print(f"  - {name}")
+            except Exception as e:
+                logger.error(f"Failed to list models: {e}")
+            
+            raise Exception("Semua model gagal diinisialisasi")
+    
+    def _use_model(self, model_name: str):
+        """Make `model_name` the engine's primary model"""
+        with self._model_lock:
+            self.model = self.router.model(model_name)
+            self.model_name = model_name
+    
+    def _mark_model_ok(self, model_name: str, latency: float):
+        """Record that a model answered a real request"""
+        self.router.record_success(model_name, latency)
+        with self._model_lock:
+            if model_name != self.model_name:
+                # Router pindah ke model lain yang lebih sehat; jadikan model utama
+                logger.info(f"Switching primary model from {self.model_name} to {model_name}")
+                self._use_model(model_name)
+                self._model_validated = False
+            newly_validated = not self._model_validated
+            self._model_validated = True
+        if newly_validated:
+            self.model_cache.mark_ok(model_name)
+    
+    def _mark_model_failed(self, model_name: str, error: Exception):
+        """Record a failed request for the router and the model cache"""
+        logger.error(f"Model {model_name} failed: {error}")
+        if is_quota_error(error):
+            # Semua proses ikut menunggu, bukan hanya model ini
+            self.quota.penalize()
+        self.router.record_failure(model_name, error)
+        if model_name == self.model_name:
+            self.model_cache.record_failure(model_name)
+    
+    def show_model_stats(self):
+        """Print the router's per-model latency and health table"""
+        table = Table(title="Status Model", header_style="bold magenta")
+        table.add_column("Model", style="cyan")
+        table.add_column("p50", justify="right")
+        table.add_column("p95", justify="right")
+        table.add_column("Error", justify="right")
+        table.add_column("Request", justify="right")
+        table.add_column("Circuit")
+        
+        def fmt(value: Optional[float]) -> str:
+            return f"{value * 1000:.0f} ms" if value is not None else "-"
+        
+        for row in self.router.snapshot():
+            state = row["state"]
+            if row["retry_in"] > 0:
+                state += f" ({row['retry_in']:.0f}s)"
+            marker = " ★" if row["model"] == self.model_name else ""
+            table.add_row(
+                row["model"] + marker, fmt(row["p50"]), fmt(row["p95"]),
+                f"{row['error_rate']:.0%}", str(row["requests"]), state
+            )
+        console.print(table)
+    
+    def _open_history(self):
+        """Open the configured history backend, migrating and pruning old data"""
+        history_dir = self._data_path(HISTORY_DIR)
+        if HISTORY_BACKEND == "sqlite":
+            store = SQLiteHistoryStore(self._data_path(HISTORY_DB))
+        else:
+            store = HistoryStore(history_dir, fsync_policy=HISTORY_FSYNC_POLICY)
+        
+        try:
+            migrated = store.migrate_from_json(self._data_path(HISTORY_FILE))
+            # Pindah dari segmen JSONL ke SQLite cukup sekali, saat database masih kosong
+            if HISTORY_BACKEND == "sqlite" and store.count() == 0:
+                migrated += store.import_entries(HistoryStore(history_dir).iter_entries())
+            if migrated:
+                console.print(f"[green]✓ {migrated} riwayat percakapan dipindahkan ke format baru[/green]")
+            store.prune(MAX_HISTORY_DAYS)
+        except Exception as e:
+            logger.error(f"Failed to prepare history store: {e}")
+        return store
+    
+    @staticmethod
+    def _history_cutoff() -> str:
+        return (datetime.datetime.now() - datetime.timedelta(days=MAX_HISTORY_DAYS)).isoformat()
+    
+    def load_history(self, limit: int = MAX_CONTEXT_MESSAGES) -> List[Dict]:
+        """Load recent conversation history from the tail of the segment files"""
+        try:
             # Filter berdasarkan tanggal dan batasi jumlah pesan
-            cutoff = (datetime.datetime.now() - datetime.timedelta(days=MAX_HISTORY_DAYS)).isoformat()
-            filtered_history = [h for h in data if h.get('timestamp', '') > cutoff]
+            cutoff = self._history_cutoff()
             
             # Batasi jumlah pesan untuk menghindari token limit
-            return filtered_history[-MAX_CONTEXT_MESSAGES:]
+            return self.history.tail(limit, since=cutoff)
             
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            logger.warning(f"Failed to load history: {e}")
-            return []
         except Exception as e:
             logger.error(f"Unexpected error loading history: {e}")
             return []
     
     def save_to_history(self, user_msg: str, ai_msg: str) -> bool:
-        """Save conversation to history with better error handling"""
+        """Append one conversation turn to the history store"""
         try:
-            HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-            
-            history = self.load_history()
             new_entry = {
                 "timestamp": datetime.datetime.now().isoformat(),
                 "user": user_msg,
-                "mio": ai_msg
+                "mio": ai_msg,
+                # Simpan jumlah token supaya konteks tidak perlu menghitung ulang
+                "tokens": self.token_counter.count(f"{user_msg}\n{ai_msg}")
             }
             
-            history.append(new_entry)
-            
-            # Simpan dengan encoding UTF-8 untuk mendukung karakter Indonesia
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False)
-            
+            self.history.append(new_entry)
+            if RETRIEVAL_ENABLED:
+                self.retrieval.add(new_entry)
             return True
             
         except Exception as e:
@@ -156,44 +368,372 @@ class ChatEngine:
             "Tujuan Anda adalah untuk menjadi sumber informasi dan panduan terpercaya mengenai keamanan siber dan etika hacking. Anda harus bisa menjawab pertanyaan tentang topik seperti:Ancaman Siber: Phishing, malware, ransomware, DDoS, dll.Pertahanan Diri: Cara mengamankan akun, data, perangkat, dan privasi online.Konsep Keamanan: Enkripsi, firewall, VPN, autentikasi dua faktor, dll.Etika Hacking: Perbedaan antara white hat, grey hat, dan black hat.Berita Keamanan Siber Terkini: Memberikan analisis atau pendapat tentang insiden keamanan terbaru (tanpa menyebutkan detail spesifik yang bisa jadi panduan untuk kejahatan)."
         )
     
-    def load_context_from_history(self) -> str:
-        """Load recent conversation context"""
-        history = self.load_history()
-        if not history:
+    def load_context_from_history(self, query: Optional[str] = None) -> str:
+        """Pack the most relevant recent turns into the context token budget"""
+        history = self.load_history(limit=CONTEXT_CANDIDATE_TURNS)
+        summaries = self.history.load_summaries(limit=CONTEXT_SUMMARY_LIMIT)
+        retrieved = []
+        if query and RETRIEVAL_ENABLED:
+            # Giliran lama yang relevan, di luar giliran terbaru yang sudah jadi kandidat
+            recent = {entry.get("timestamp") for entry in history}
+            retrieved = self.retrieval.search(query, k=RETRIEVAL_TOP_K, exclude=recent)
+        if summaries:
+            # Giliran yang sudah diringkas cukup diwakili ringkasannya
+            covered_until = summaries[-1].get("end", "")
+            history = [entry for entry in history if entry.get("timestamp", "") > covered_until]
+        if not history and not summaries and not retrieved:
+            self.last_context_report = {}
             return ""
         
-        context_parts = []
-        for entry in history[-5:]:  # Ambil 5 percakapan terakhir sebagai konteks
-            context_parts.append(f"User: {entry.get('user', '')}")
-            context_parts.append(f"Mio: {entry.get('mio', '')}")
+        context, report = self.context_builder.build(
+            history, query=query, summaries=summaries, retrieved=retrieved
+        )
+        self.last_context_report = report
+        logger.info(
+            "Context budget: %d/%d tokens, %d/%d turns, %d summaries, %d retrieved, %.1f ms",
+            report["used"], report["budget"], report["turns_included"],
+            report["turns_considered"], report["summaries_included"],
+            report["retrieved_included"], report["build_ms"]
+        )
+        return context
+    
+    def _ensure_conversation(self, user_input: Optional[str] = None) -> bool:
+        """Start the chat session with the system prompt; True if it was started now"""
+        if self.conversation:
+            return False
+        self.conversation = self._new_session(user_input)
+        return True
+    
+    def _new_session(self, user_input: Optional[str] = None) -> SlidingWindowSession:
+        """Build a session from the persona plus history context relevant to `user_input`"""
+        self._refresh_persona()
+        # Konteks sejarah yang relevan dengan pesan pertama
+        context = self.load_context_from_history(query=user_input)
+        context_prompt = f"Konteks percakapan sebelumnya:\n{context}" if context else ""
+        if self._persona_in_model():
+            # Persona sudah menjadi system instruction model; cukup kirim konteksnya
+            initial_prompt = context_prompt
+        else:
+            initial_prompt = self.get_system_prompt()
+            if context_prompt:
+                initial_prompt += f"\n\n{context_prompt}"
         
-        return "\n".join(context_parts)
+        # Sesi hanya menyimpan beberapa giliran terakhir, sisanya diringkas
+        return SlidingWindowSession(self.model, initial_prompt, window_turns=SESSION_WINDOW_TURNS)
     
-    def generate_response(self, user_input: str) -> Optional[str]:
-        """Generate response with improved error handling"""
-        try:
-            # Jika percakapan belum dimulai, mulai dengan system prompt
-            if not self.conversation:
-                self.conversation = self.model.start_chat()
+    def _reserve_quota(self, session: SlidingWindowSession, user_input: str,
+                       metrics: Optional[Dict] = None) -> int:
+        """Wait for request/token budget before a model call; returns the tokens reserved"""
+        reserved = session.estimate_payload_chars(user_input) // CHARS_PER_TOKEN + QUOTA_EXPECTED_OUTPUT_TOKENS
+        waited = self.quota.acquire(reserved)
+        if metrics is not None and waited:
+            metrics["quota_wait"] = metrics.get("quota_wait", 0.0) + waited
+        return reserved
+    
+    def _settle_quota(self, session: SlidingWindowSession, reserved: int, reply: str):
+        """Replace the reservation with the real request + reply size"""
+        self.quota.settle(reserved, (session.last_payload_chars + len(reply)) // CHARS_PER_TOKEN)
+    
+    def _cache_key(self, user_input: str) -> str:
+        return make_cache_key(user_input, self.get_system_prompt(), self.model_name or "", GENERATION_CONFIG)
+    
+    def _cached_reply(self, user_input: str) -> Optional[str]:
+        """Return a cached answer and keep the live session in sync with it"""
+        if not self.response_cache.enabled:
+            return None
+        reply = self.response_cache.get(self._cache_key(user_input))
+        if reply is not None and self.conversation:
+            self.conversation.record(user_input, reply)
+        return reply
+    
+    def _store_reply(self, user_input: str, reply: str):
+        if self.response_cache.enabled and reply and reply != FALLBACK_RESPONSE:
+            self.response_cache.put(self._cache_key(user_input), reply)
+    
+    def generate_response(self, user_input: str, use_cache: bool = True) -> Optional[str]:
+        """Generate response, routing to the healthiest model and failing over"""
+        if self.hedging_enabled:
+            # Hedging butuh streaming untuk tahu kapan first token datang
+            return "".join(self.generate_response_stream(user_input, use_cache=use_cache)).strip()
+        
+        if use_cache:
+            cached = self._cached_reply(user_input)
+            if cached is not None:
+                return cached
+        
+        for model_name in self.router.candidates():
+            try:
+                # Jika percakapan belum dimulai, mulai dengan system prompt
+                self._ensure_conversation(user_input)
                 
-                # Kirim system prompt dengan konteks sejarah
-                context = self.load_context_from_history()
-                initial_prompt = self.get_system_prompt()
-                if context:
-                    initial_prompt += f"\n\nKonteks percakapan sebelumnya:\n{context}"
+                # Tunggu kuota dulu, lalu kirim pesan user dan dapatkan respons
+                reserved = self._reserve_quota(self.conversation, user_input)
+                sent_at = time.perf_counter()
+                reply = self.conversation.send(user_input, model=self.router.model(model_name))
+                self._mark_model_ok(model_name, time.perf_counter() - sent_at)
+                self._settle_quota(self.conversation, reserved, reply)
+                self._store_reply(user_input, reply)
+                return reply
                 
-                self.conversation.send_message(initial_prompt)
+            except Exception as e:
+                # Coba model berikutnya sebelum menyerah
+                self._mark_model_failed(model_name, e)
+        
+        console.print("[red]✗ Gagal mendapatkan respons: semua model sedang bermasalah[/red]")
+        
+        # Fallback response jika API gagal
+        return FALLBACK_RESPONSE
+    
+    def complete(self, user_input: str, use_cache: bool = True,
+                 before_request: Optional[Callable[[], float]] = None) -> Tuple[str, Dict]:
+        """Answer one standalone prompt in its own session; safe to call from threads
+        
+        Used by batch jobs: the live chat session is not touched, but the
+        persona, history context, response cache and model router are shared.
+        `before_request` runs only when the model is actually called (e.g. a
+        rate limiter) and returns the seconds it waited. Returns the reply
+        and per-prompt metrics.
+        """
+        started = time.perf_counter()
+        metrics = {"model": None, "cache": "miss", "attempts": 0, "queued": 0.0, "error": None}
+        
+        key = self._cache_key(user_input)
+        if use_cache and self.response_cache.enabled:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                metrics.update(cache="hit", latency=time.perf_counter() - started)
+                return cached, metrics
+        
+        if before_request:
+            metrics["queued"] = before_request()
+        session = self._new_session(user_input)
+        for model_name in self.router.candidates():
+            metrics["attempts"] += 1
+            try:
+                reserved = self._reserve_quota(session, user_input, metrics)
+                sent_at = time.perf_counter()
+                reply = session.send(user_input, model=self.router.model(model_name))
+                self._mark_model_ok(model_name, time.perf_counter() - sent_at)
+                self._settle_quota(session, reserved, reply)
+                if self.response_cache.enabled and reply:
+                    self.response_cache.put(key, reply)
+                metrics.update(model=model_name, latency=time.perf_counter() - started)
+                return reply, metrics
+            except Exception as e:
+                self._mark_model_failed(model_name, e)
+                metrics["error"] = str(e)
+        
+        metrics["latency"] = time.perf_counter() - started
+        return FALLBACK_RESPONSE, metrics
+    
+    def generate_response_stream(self, user_input: str, use_cache: bool = True) -> Iterator[str]:
+        """Yield response chunks as they arrive and record time-to-first-token"""
+        started = time.perf_counter()
+        metrics = {"ttft": None, "total": None, "chunks": 0, "chars": 0, "cache": "miss"}
+        self.last_turn_metrics = metrics
+        
+        try:
+            cached = self._cached_reply(user_input) if use_cache else None
+            if cached is not None:
+                metrics.update(ttft=time.perf_counter() - started, chunks=1, chars=len(cached), cache="hit")
+                yield cached
+                return
             
-            # Kirim pesan user dan dapatkan respons
-            response = self.conversation.send_message(user_input)
-            return response.text.strip()
+            candidates = self.router.candidates()
+            if self.hedging_enabled and len(candidates) >= 2:
+                hedge_result: Dict = {}
+                if (yield from self._stream_hedged(user_input, candidates[0], candidates[1], metrics,
+                                                   hedge_result)):
+                    return
+                if metrics["chunks"]:
+                    return
+                # Model yang tidak sempat dipanggil (hedge tanpa kuota, gagal sebelum request) tetap dicoba
+                attempted = hedge_result.get("attempted", [])
+                candidates = [name for name in candidates if name not in attempted]
             
-        except Exception as e:
-            logger.error(f"Failed to generate response: {e}")
-            console.print(f"[red]✗ Gagal mendapatkan respons: {e}[/red]")
+            for model_name in candidates:
+                try:
+                    if self._ensure_conversation(user_input):
+                        metrics["context"] = self.last_context_report
+                    reserved = self._reserve_quota(self.conversation, user_input, metrics)
+                    # Waktu kirim system prompt dan tunggu kuota tidak dihitung sebagai TTFT jawaban
+                    sent_at = time.perf_counter()
+                    metrics["setup"] = sent_at - started
+                    metrics["model"] = model_name
+                    
+                    parts = []
+                    for text in self.conversation.stream(user_input, model=self.router.model(model_name)):
+                        if metrics["ttft"] is None:
+                            metrics["ttft"] = time.perf_counter() - sent_at
+                        metrics["chunks"] += 1
+                        metrics["chars"] += len(text)
+                        parts.append(text)
+                        yield text
+                    
+                    self._mark_model_ok(model_name, metrics["ttft"] or time.perf_counter() - sent_at)
+                    reply = "".join(parts).strip()
+                    self._settle_quota(self.conversation, reserved, reply)
+                    self._store_reply(user_input, reply)
+                    return
+                    
+                except Exception as e:
+                    # Giliran yang gagal tidak dicatat di sesi, jadi sesi tetap bisa dipakai
+                    self._mark_model_failed(model_name, e)
+                    if metrics["chunks"]:
+                        # Sebagian jawaban sudah tampil, jangan diulang dari model lain
+                        console.print(f"[red]✗ Jawaban terputus: {e}[/red]")
+                        return
             
-            # Fallback response jika API gagal
-            return "M-maaf... aku sedang bingung... bisa ulangi pertanyaannya?"
+            console.print("[red]✗ Gagal mendapatkan respons: semua model sedang bermasalah[/red]")
+            yield FALLBACK_RESPONSE
+        finally:
+            metrics["total"] = time.perf_counter() - started
+            if self.conversation:
+                metrics["payload_chars"] = self.conversation.last_payload_chars
+            logger.info(
+                "Turn metrics: model=%s ttft=%s total=%.3fs chunks=%d chars=%d payload=%s chars cache=%s",
+                metrics.get("model", "-"),
+                f"{metrics['ttft']:.6f}s" if metrics["ttft"] is not None else "n/a",
+                metrics["total"], metrics["chunks"], metrics["chars"],
+                metrics.get("payload_chars", "n/a"), metrics["cache"]
+            )
+    
+    def _stream_hedged(self, user_input: str, primary: str, secondary: str, metrics: Dict,
+                       result: Dict):
+        """Stream from the primary model, hedging to the secondary; True on success
+
+        `result` receives the Hedger's per-call result, including the
+        models it actually called.
+        """
+        parts = []
+        streaming = False
+        try:
+            if self._ensure_conversation(user_input):
+                metrics["context"] = self.last_context_report
+            reserved = self._reserve_quota(self.conversation, user_input, metrics)
+            sent_at = time.perf_counter()
+            
+            contents = self.conversation.build_contents(user_input)
+            streaming = True
+            for text in self.hedger.stream(contents, primary, secondary, quota_tokens=reserved,
+                                           result=result):
+                if metrics["ttft"] is None:
+                    metrics["ttft"] = time.perf_counter() - sent_at
+                metrics["chunks"] += 1
+                metrics["chars"] += len(text)
+                parts.append(text)
+                yield text
+        except Exception as e:
+            if metrics["chunks"]:
+                console.print(f"[red]✗ Jawaban terputus: {e}[/red]")
+            return False
+        finally:
+            # Gagal sebelum request terkirim (konteks, kuota): tidak ada model yang perlu dicatat
+            if streaming:
+                for model_name, error in result.get("errors", {}).items():
+                    self._mark_model_failed(model_name, error)
+                metrics["hedged"] = result.get("hedged", False)
+        
+        winner = result["winner"]
+        metrics["model"] = winner
+        self._mark_model_ok(winner, result["ttft"] or time.perf_counter() - sent_at)
+        
+        # Hanya jawaban pemenang yang masuk ke sesi dan cache
+        reply = "".join(parts).strip()
+        self._settle_quota(self.conversation, reserved, reply)
+        self.conversation.record(user_input, reply)
+        self._store_reply(user_input, reply)
+        return True
+    
+    def show_hedge_stats(self):
+        """Print how often hedging fired and its effect on p99 first-token latency"""
+        stats = self.hedger.summary()
+        
+        def fmt(value: Optional[float]) -> str:
+            return f"{value * 1000:.0f} ms" if value is not None else "-"
+        
+        table = Table(title="Hedged Requests", show_header=False)
+        table.add_column("Properti", style="cyan")
+        table.add_column("Nilai", style="white")
+        table.add_row("Status", "aktif" if self.hedging_enabled else "mati")
+        table.add_row("Request", str(stats["requests"]))
+        table.add_row("Hedge dikirim", f"{stats['fired']} ({stats['fire_rate']:.0%})")
+        table.add_row("Batal karena kuota", str(stats["skipped"]))
+        table.add_row("Dimenangkan model cadangan", str(stats["hedge_wins"]))
+        table.add_row("p99 first token (dengan hedging)", fmt(stats["p99_observed"]))
+        table.add_row("p99 first token (model utama saja)", fmt(stats["p99_primary_only"]))
+        table.add_row("Perbaikan p99", fmt(stats["p99_improvement"]))
+        console.print(table)
+    
+    def _mio_text(self, reply: str) -> Text:
+        """Build the formatted Mio reply line"""
+        mio_text = Text()
+        mio_text.append("🎸 ", style="bold magenta")
+        mio_text.append("Mio", style="bold magenta")
+        mio_text.append(": ", style="bold magenta")
+        mio_text.append(reply, style="white")
+        return mio_text
+    
+    def stream_reply(self, user_input: str, use_cache: bool = True) -> str:
+        """Render the reply live in the terminal and return the complete text"""
+        parts = []
+        mio_text = self._mio_text("")
+        
+        with Live(mio_text, console=console, refresh_per_second=STREAM_REFRESH_PER_SECOND) as live:
+            for chunk in self.generate_response_stream(user_input, use_cache=use_cache):
+                parts.append(chunk)
+                mio_text.append(chunk, style="white")
+                live.update(mio_text)
+        
+        metrics = self.last_turn_metrics
+        if metrics.get("ttft") is not None:
+            summary = f"⏱ first token {metrics['ttft'] * 1000:.0f} ms · total {metrics['total']:.2f} s"
+            if metrics.get("cache") == "hit":
+                summary = f"⚡ dari cache · {metrics['ttft'] * 1_000_000:.0f} µs"
+            context = metrics.get("context")
+            if context:
+                summary += f" · konteks {context['used']}/{context['budget']} token"
+            console.print(f"[dim]{summary}[/dim]")
+        
+        return "".join(parts).strip()
+    
+    def _highlight(self, snippet: str) -> Text:
+        """Convert match markers in a search snippet into highlighted text"""
+        text = Text()
+        highlighted = False
+        for part in snippet.replace(MATCH_END, MATCH_START).split(MATCH_START):
+            if part:
+                text.append(part, style="bold yellow" if highlighted else "white")
+            highlighted = not highlighted
+        return text
+    
+    def show_search_results(self, terms: str):
+        """Search past conversations and print ranked snippets"""
+        started = time.perf_counter()
+        try:
+            results = self.history.search(terms, limit=SEARCH_RESULT_LIMIT)
+        except Exception as e:
+            logger.error(f"History search failed: {e}")
+            console.print(f"[red]✗ Pencarian gagal: {e}[/red]")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        if not results:
+            console.print(f"[yellow]⚠ Tidak ada percakapan yang cocok dengan '{terms}'[/yellow]")
+            return
+        
+        result_text = Text()
+        for result in results:
+            result_text.append(f"{result['timestamp'][:16].replace('T', ' ')}\n", style="dim")
+            result_text.append("💬 Kamu: ", style="bold cyan")
+            result_text.append_text(self._highlight(result["user_snippet"]))
+            result_text.append("\n🎸 Mio: ", style="bold magenta")
+            result_text.append_text(self._highlight(result["mio_snippet"]))
+            result_text.append("\n\n")
+        result_text.append(f"{len(results)} hasil dalam {elapsed_ms:.1f} ms", style="dim")
+        
+        panel = Panel(result_text, title=f"[bold cyan]🔎 {terms}[/bold cyan]", border_style="cyan")
+        console.print(panel)
     
     def display_welcome_message(self):
         """Display welcome message with better formatting"""
@@ -206,6 +746,11 @@ class ChatEngine:
         welcome_text.append(" atau ", style="white")
         welcome_text.append("'quit'", style="bold yellow")
         welcome_text.append(" untuk keluar dari chat", style="white")
+        if self.conversation and self.conversation.turn_count:
+            welcome_text.append(
+                f"\n↩ Melanjutkan percakapan tadi ({self.conversation.turn_count} giliran)",
+                style="italic cyan"
+            )
         
         panel = Panel(
             welcome_text,
@@ -218,6 +763,8 @@ class ChatEngine:
     def start_chat_loop(self):
         """Main chat loop with improved UX"""
         self.display_welcome_message()
+        if SUMMARY_WORKER_ENABLED:
+            self.compactor.start()
         
         while True:
             try:
@@ -226,6 +773,7 @@ class ChatEngine:
                     "[bold cyan]💬 Kamu[/bold cyan]",
                     console=console
                 ).strip()
+                self.compactor.touch()
                 
                 if not user_input:
                     console.print("[yellow]⚠ Pesan kosong, coba ketik sesuatu...[/yellow]")
@@ -244,25 +792,47 @@ class ChatEngine:
                     self.show_help()
                     continue
                 
-                # Generate and display response
-                console.print("[dim]💭 Mio sedang berpikir...[/dim]")
+                if user_input.lower().startswith("/search"):
+                    terms = user_input[len("/search"):].strip()
+                    if terms:
+                        self.show_search_results(terms)
+                    else:
+                        console.print("[yellow]⚠ Contoh: /search phishing 2FA[/yellow]")
+                    continue
                 
-                reply = self.generate_response(user_input)
+                if user_input.lower().startswith("/hedge"):
+                    action = user_input[len("/hedge"):].strip().lower()
+                    if action in ("on", "off"):
+                        self.hedging_enabled = action == "on"
+                        console.print(f"[green]✓ Hedging {'diaktifkan' if self.hedging_enabled else 'dimatikan'}[/green]")
+                    else:
+                        self.show_hedge_stats()
+                    continue
                 
-                if reply:
-                    # Save to history
-                    self.save_to_history(user_input, reply)
-                    
-                    # Display response with nice formatting
-                    mio_text = Text()
-                    mio_text.append("🎸 ", style="bold magenta")
-                    mio_text.append("Mio", style="bold magenta")
-                    mio_text.append(": ", style="bold magenta")
-                    mio_text.append(reply, style="white")
-                    
-                    console.print(mio_text)
-                else:
-                    console.print("[red]✗ Gagal mendapatkan respons dari Mio[/red]")
+                if user_input.lower() == "/models":
+                    self.show_model_stats()
+                    continue
+                
+                if user_input.lower() == "/quota":
+                    self.show_quota()
+                    continue
+                
+                if user_input.lower().startswith("/cache"):
+                    self.handle_cache_command(user_input[len("/cache"):].strip().lower())
+                    continue
+                
+                # '/nocache <pesan>' selalu minta jawaban baru dari model
+                use_cache = True
+                if user_input.lower().startswith("/nocache"):
+                    user_input = user_input[len("/nocache"):].strip()
+                    use_cache = False
+                    if not user_input:
+                        console.print("[yellow]⚠ Contoh: /nocache apa itu phishing[/yellow]")
+                        continue
+                
+                # Generate and display response; worker ringkasan menunggu sampai selesai
+                with self.compactor.busy():
+                    self.respond(user_input, use_cache=use_cache)
                 
             except KeyboardInterrupt:
                 console.print(
@@ -279,6 +849,89 @@ class ChatEngine:
                 logger.error(f"Unexpected error in chat loop: {e}")
                 console.print(f"[red]✗ Terjadi error: {e}[/red]")
                 console.print("[yellow]Mencoba melanjutkan percakapan...[/yellow]")
+        
+        self.compactor.stop()
+    
+    def respond(self, user_input: str, use_cache: bool = True):
+        """Generate, display and save Mio's reply to one message"""
+        if STREAM_RESPONSES:
+            # Jawaban dirender langsung per chunk
+            reply = self.stream_reply(user_input, use_cache=use_cache)
+            if reply:
+                self.save_to_history(user_input, reply)
+            else:
+                console.print("[red]✗ Gagal mendapatkan respons dari Mio[/red]")
+            return
+        
+        console.print("[dim]💭 Mio sedang berpikir...[/dim]")
+        
+        reply = self.generate_response(user_input, use_cache=use_cache)
+        
+        if reply:
+            # Save to history
+            self.save_to_history(user_input, reply)
+            
+            # Display response with nice formatting
+            console.print(self._mio_text(reply))
+        else:
+            console.print("[red]✗ Gagal mendapatkan respons dari Mio[/red]")
+    
+    def handle_cache_command(self, action: str):
+        """Handle '/cache', '/cache on', '/cache off' and '/cache clear'"""
+        if action == "on":
+            self.response_cache.enabled = True
+            console.print("[green]✓ Cache jawaban diaktifkan[/green]")
+        elif action == "off":
+            self.response_cache.enabled = False
+            console.print("[yellow]⚠ Cache jawaban dimatikan[/yellow]")
+        elif action == "clear":
+            self.response_cache.clear()
+            console.print("[green]✓ Cache jawaban dikosongkan[/green]")
+        elif action:
+            console.print("[yellow]⚠ Gunakan: /cache, /cache on, /cache off, atau /cache clear[/yellow]")
+        else:
+            stats = self.response_cache.summary()
+            table = Table(title="Cache Jawaban", show_header=False)
+            table.add_column("Properti", style="cyan")
+            table.add_column("Nilai", style="white")
+            table.add_row("Status", "aktif" if stats["enabled"] else "mati")
+            table.add_row("Hit (memori / disk)", f"{stats['memory_hits']} / {stats['disk_hits']}")
+            table.add_row("Miss", str(stats["misses"]))
+            table.add_row("Hit rate", f"{stats['hit_rate']:.0%}")
+            table.add_row("Entri (memori / disk)", f"{stats['memory_entries']} / {stats['disk_entries']}")
+            table.add_row("Ukuran disk", f"{stats['disk_bytes'] / 1024:.1f} KB")
+            console.print(table)
+    
+    def show_quota(self):
+        """Print the shared per-minute quota usage and this process' waits"""
+        usage = self.quota.usage()
+        if not usage["enabled"]:
+            console.print(f"[yellow]⚠ Backend {self.backend.name} tidak memakai batas kuota[/yellow]")
+            return
+        
+        def fmt(used: Optional[float], limit: Optional[float]) -> str:
+            if limit is None:
+                return "tanpa batas"
+            return f"{max(0.0, used):,.0f} / {limit:,.0f} ({max(0.0, used) / limit:.0%})"
+        
+        table = Table(title="Kuota API (semua proses)", show_header=False)
+        table.add_column("Properti", style="cyan")
+        table.add_column("Nilai", style="white")
+        table.add_row("Request / menit", fmt(usage["requests_used"], usage["requests_per_minute"]))
+        table.add_row("Token / menit", fmt(usage["tokens_used"], usage["tokens_per_minute"]))
+        if usage["blocked_for"] > 0:
+            table.add_row("Jeda setelah 429", f"{usage['blocked_for']:.0f} s")
+        table.add_row("Request sesi ini", str(usage["requests"]))
+        table.add_row("Menunggu kuota", f"{usage['waits']}× · total {usage['wait_seconds']:.1f} s")
+        console.print(table)
+    
+    def close(self):
+        """Stop the background worker and close the history and cache stores"""
+        self.compactor.stop()
+        self.history.close()
+        if self._owns_shared:
+            self.response_cache.close()
+            self.quota.close()
     
     def show_help(self):
         """Show help information"""
@@ -287,17 +940,35 @@ class ChatEngine:
         help_text.append("• Ketik pesan apapun untuk mengobrol dengan Mio\n", style="white")
         help_text.append("• Gunakan 'exit', 'quit', atau 'keluar' untuk keluar\n", style="white")
         help_text.append("• Gunakan 'help' atau 'bantuan' untuk melihat bantuan ini\n", style="white")
+        help_text.append("• Gunakan '/search <kata kunci>' untuk mencari percakapan lama\n", style="white")
+        help_text.append("• Gunakan '/cache' untuk statistik cache, '/cache on|off|clear' untuk mengaturnya\n", style="white")
+        help_text.append("• Gunakan '/nocache <pesan>' untuk minta jawaban baru tanpa cache\n", style="white")
+        help_text.append("• Gunakan '/models' untuk melihat latensi dan status tiap model\n", style="white")
+        help_text.append("• Gunakan '/quota' untuk melihat pemakaian kuota API per menit\n", style="white")
+        help_text.append("• Gunakan '/hedge' untuk statistik hedging, '/hedge on|off' untuk mengaturnya\n", style="white")
         help_text.append("• Mio akan mengingat percakapan selama 7 hari\n", style="white")
         help_text.append("\n🎵 Selamat mengobrol dengan Mio! 🎸", style="bold magenta")
         
         panel = Panel(help_text, title="[bold yellow]Bantuan[/bold yellow]", border_style="yellow")
         console.print(panel)
 
+# Engine yang sudah siap dipakai ulang selama proses hidup; ditutup jika idle terlalu lama
+engine_registry = EngineRegistry(ChatEngine, idle_expiry=ENGINE_IDLE_EXPIRY)
+
+
 def main():
     """Main function to start the chat engine"""
     try:
-        chat_engine = ChatEngine()
-        chat_engine.start_chat_loop()
+        if not ENGINE_REUSE_ENABLED:
+            chat_engine = ChatEngine()
+            chat_engine.start_chat_loop()
+            chat_engine.close()
+            return
+        chat_engine = engine_registry.acquire()
+        try:
+            chat_engine.start_chat_loop()
+        finally:
+            engine_registry.release()
     except Exception as e:
         console.print(f"[red]✗ Gagal memulai chat engine: {e}[/red]")
         logger.error(f"Failed to start chat engine: {e}")
@@ -0,0 +1,459 @@
+# modules/chat_server.py
+"""Serve many isolated Mio chat sessions from one process over local HTTP
+
+    python -m modules.chat_server --port 8765          # Gemini
+    python -m modules.chat_server --port 8765 --mock   # backend lokal, tanpa API key
+
+Endpoints (JSON in, JSON out):
+    POST   /sessions                      {"session_id": opsional}
+    POST   /sessions/<id>/messages        {"message": "...", "stream": false, "use_cache": true}
+    GET    /sessions/<id>/history?limit=20
+    DELETE /sessions/<id>
+    GET    /stats
+    GET    /health
+
+With "stream": true the reply is sent as chunked NDJSON: one {"chunk": ...}
+line per piece and a final {"done": true, "reply": ..., "metrics": ...}.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from modules.chat_engine import ChatEngine, FALLBACK_RESPONSE, DATA_DIR
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SESSIONS_DIR = DATA_DIR / "sessions"  # Riwayat tiap sesi di sessions/<id>/
+SESSION_QUEUE_SIZE = 8  # Pesan yang boleh antre per sesi sebelum 429
+MAX_PENDING_MESSAGES = 64  # Total pesan antre di seluruh server sebelum 503
+MAX_SESSIONS = 200
+UPSTREAM_POOL_SIZE = 8  # Request ke model yang berjalan bersamaan (pool bersama)
+SESSION_IDLE_TIMEOUT = 30 * 60  # detik
+REAP_INTERVAL = 60
+MAX_BODY_BYTES = 64 * 1024
+STREAM_QUEUE_CHUNKS = 16  # Chunk yang boleh menunggu klien NDJSON sebelum model ikut ditahan
+HEADER_TIMEOUT = 10.0
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_REGEX = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+def run_turn(engine: ChatEngine, message: str, use_cache: bool,
+             on_chunk: Optional[Callable[[str], None]] = None) -> Tuple[str, Dict]:
+    """Blocking: answer one message in the session's conversation and save it"""
+    parts = []
+    for chunk in engine.generate_response_stream(message, use_cache=use_cache):
+        parts.append(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+    reply = "".join(parts).strip()
+    if reply and reply != FALLBACK_RESPONSE:
+        engine.save_to_history(message, reply)
+    return reply, dict(engine.last_turn_metrics)
+
+
+class ChatSession:
+    """One user's engine plus the queue that serializes their messages"""
+
+    def __init__(self, session_id: str, engine: ChatEngine, queue_size: int):
+        self.id = session_id
+        self.engine = engine
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=queue_size)
+        self.worker: Optional[asyncio.Task] = None
+        self.busy = False
+        self.closed = False
+        self.turns = 0
+        self.created = time.time()
+        self.last_active = time.monotonic()
+
+
+class ChatServer:
+    """Asyncio HTTP front end over per-session ChatEngines sharing one model"""
+
+    def __init__(self, base_engine: ChatEngine, sessions_dir: Path = SESSIONS_DIR,
+                 queue_size: int = SESSION_QUEUE_SIZE, max_pending: int = MAX_PENDING_MESSAGES,
+                 max_sessions: int = MAX_SESSIONS, pool_size: int = UPSTREAM_POOL_SIZE,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.base = base_engine
+        self.sessions_dir = Path(sessions_dir)
+        self.queue_size = queue_size
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        # Semua panggilan model lewat pool ini, jadi jumlah koneksi ke API terbatas
+        self.pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="mio-upstream")
+        self.sessions: Dict[str, ChatSession] = {}
+        self.pending = 0
+        self.stats = {"messages": 0, "rejected_busy": 0, "rejected_full": 0, "errors": 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self._creating: Dict[str, asyncio.Future] = {}
+        self._closing: Dict[str, asyncio.Task] = {}
+
+    # --- Lifecycle ------------------------------------------------------
+
+    async def start(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._reaper = asyncio.create_task(self._reap_idle())
+        return self._server
+
+    async def close(self):
+        if self._reaper:
+            self._reaper.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for session_id in list(self.sessions):
+            await self._drop_session(session_id)
+        self.pool.shutdown(wait=False)
+
+    # --- Sessions -------------------------------------------------------
+
+    async def _get_session(self, session_id: str, create: bool = False) -> ChatSession:
+        if not SESSION_ID_REGEX.match(session_id):
+            raise HTTPError(400, "session_id hanya boleh huruf, angka, '-' dan '_' (maks. 64)")
+        session = self.sessions.get(session_id)
+        if session:
+            return session
+        if not create:
+            raise HTTPError(404, f"Sesi {session_id} tidak ditemukan")
+        if session_id in self._creating:
+            return await self._creating[session_id]
+        if session_id in self._closing:
+            # Engine lama masih menyelesaikan giliran di folder yang sama; tunggu sampai tertutup
+            await asyncio.shield(self._closing[session_id])
+            return await self._get_session(session_id, create=True)
+        if len(self.sessions) >= self.max_sessions:
+            raise HTTPError(503, "Terlalu banyak sesi aktif", retry_after=REAP_INTERVAL)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._creating[session_id] = future
+        try:
+            # Membuka riwayat sesi adalah I/O disk, jangan di event loop
+            engine = await loop.run_in_executor(
+                None, lambda: ChatEngine(shared=self.base, data_dir=self.sessions_dir / session_id)
+            )
+            session = ChatSession(session_id, engine, self.queue_size)
+            session.worker = asyncio.create_task(self._session_worker(session))
+            self.sessions[session_id] = session
+            future.set_result(session)
+            return session
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._creating[session_id]
+
+    async def _drop_session(self, session_id: str) -> bool:
+        session = self.sessions.pop(session_id, None)
+        if not session:
+            return False
+        session.closed = True
+        closing = asyncio.create_task(self._close_session(session))
+        self._closing[session_id] = closing
+        closing.add_done_callback(lambda _: self._closing.pop(session_id, None))
+        await asyncio.shield(closing)
+        return True
+
+    async def _close_session(self, session: ChatSession):
+        """Fail the queued messages, let the running turn finish, then close the engine"""
+        while not session.queue.empty():
+            message, use_cache, chunks, result = session.queue.get_nowait()
+            self.pending -= 1
+            if not result.done():
+                result.set_exception(HTTPError(404, f"Sesi {session.id} ditutup sebelum pesan diproses"))
+            if chunks is not None:
+                chunks.put_nowait(None)
+        if session.worker:
+            # None menghentikan worker setelah giliran yang sedang berjalan di pool selesai;
+            # engine tidak boleh ditutup selama run_turn masih memakainya
+            session.queue.put_nowait(None)
+            await session.worker
+        await asyncio.get_running_loop().run_in_executor(None, session.engine.close)
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if not session.busy and session.queue.empty() and now - session.last_active > self.idle_timeout:
+                    logger.info(f"Closing idle session {session.id}")
+                    await self._drop_session(session.id)
+
+    async def _session_worker(self, session: ChatSession):
+        """Answer a session's messages one at a time, in arrival order"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await session.queue.get()
+            if item is None:
+                return
+            message, use_cache, chunks, result = item
+            self.pending -= 1
+            session.busy = True
+            if chunks is not None:
+                # Dipanggil dari thread pool: tunggu sampai ada ruang di antrean (backpressure)
+                on_chunk = partial(self._put_chunk, loop, chunks)
+            else:
+                on_chunk = None
+            try:
+                reply, metrics = await loop.run_in_executor(
+                    self.pool, run_turn, session.engine, message, use_cache, on_chunk
+                )
+                session.turns += 1
+                self.stats["messages"] += 1
+                if not result.done():
+                    result.set_result((reply, metrics))
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Session {session.id} failed: {e}")
+                if not result.done():
+                    result.set_exception(e)
+            finally:
+                if chunks is not None:
+                    await chunks.put(None)
+                session.busy = False
+                session.last_active = time.monotonic()
+
+    @staticmethod
+    def _put_chunk(loop: asyncio.AbstractEventLoop, chunks: "asyncio.Queue", text: str):
+        asyncio.run_coroutine_threadsafe(chunks.put(text), loop).result()
+
+    def _enqueue(self, session: ChatSession, message: str, use_cache: bool,
+                 stream: bool) -> Tuple[Optional["asyncio.Queue"], asyncio.Future]:
+        """Queue a message or reject it right away when the server is saturated"""
+        if session.closed:
+            raise HTTPError(404, f"Sesi {session.id} tidak ditemukan")
+        if self.pending >= self.max_pending:
+            self.stats["rejected_busy"] += 1
+            raise HTTPError(503, "Server sedang sibuk", retry_after=1)
+        if session.queue.full():
+            self.stats["rejected_full"] += 1
+            raise HTTPError(429, "Terlalu banyak pesan antre di sesi ini", retry_after=1)
+        chunks: Optional["asyncio.Queue"] = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS) if stream else None
+        result = asyncio.get_running_loop().create_future()
+        session.queue.put_nowait((message, use_cache, chunks, result))
+        session.last_active = time.monotonic()
+        self.pending += 1
+        return chunks, result
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "sessions": len(self.sessions),
+            "pending": self.pending,
+            "busy_sessions": sum(1 for session in self.sessions.values() if session.busy),
+            "model": self.base.model_name,
+            "models": self.base.router.snapshot(),
+            "quota": self.base.quota.usage(),
+        }
+
+    # --- HTTP -----------------------------------------------------------
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict, bytes]:
+        request_line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        try:
+            method, target, _ = request_line.decode('latin-1').split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Request line tidak valid")
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length tidak valid")
+        if length < 0:
+            raise HTTPError(400, "Content-Length tidak valid")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body maksimal {MAX_BODY_BYTES} byte")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _head(status: int, content_type: str, extra: Optional[Dict] = None) -> bytes:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 f"Content-Type: {content_type}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        return ("\r\n".join(lines) + "\r\n").encode('latin-1')
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict,
+                         retry_after: Optional[float] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        extra = {"Content-Length": len(body)}
+        if retry_after is not None:
+            extra["Retry-After"] = f"{retry_after:.0f}"
+        writer.write(self._head(status, "application/json; charset=utf-8", extra) + b"\r\n" + body)
+        await writer.drain()
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, chunks: "asyncio.Queue",
+                           result: asyncio.Future):
+        writer.write(self._head(200, "application/x-ndjson; charset=utf-8",
+                                {"Transfer-Encoding": "chunked"}) + b"\r\n")
+
+        async def send(payload: Dict):
+            data = (json.dumps(payload, ensure_ascii=False) + "\n").encode('utf-8')
+            writer.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            # drain() menahan sesi ini saja jika klien lambat membaca
+            await writer.drain()
+
+        finished = False
+        try:
+            while True:
+                text = await chunks.get()
+                if text is None:
+                    finished = True
+                    break
+                await send({"chunk": text})
+        finally:
+            if not finished:
+                # Klien putus di tengah jawaban: buang sisa chunk supaya thread model tidak tertahan
+                asyncio.ensure_future(self._discard_chunks(chunks))
+        try:
+            reply, metrics = await result
+            await send({"done": True, "reply": reply, "metrics": metrics})
+        except Exception as e:
+            await send({"done": True, "error": str(e)})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _discard_chunks(chunks: "asyncio.Queue"):
+        while await chunks.get() is not None:
+            pass
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target, headers, body = await self._read_request(reader)
+                await self._route(writer, method, target, body)
+            except HTTPError as e:
+                await self._send_json(writer, e.status, {"error": e.message}, retry_after=e.retry_after)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass
+            except Exception as e:
+                logger.error(f"Request failed: {e}")
+                await self._send_json(writer, 500, {"error": str(e)})
+        except (ConnectionError, RuntimeError):
+            # Klien sudah menutup koneksi
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, writer: asyncio.StreamWriter, method: str, target: str, body: bytes):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            raise HTTPError(400, "Body harus JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body harus objek JSON")
+
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, 200, {"status": "ok"})
+        if parts == ["stats"] and method == "GET":
+            return await self._send_json(writer, 200, self.snapshot())
+
+        if parts == ["sessions"] and method == "POST":
+            session_id = str(payload.get("session_id") or uuid.uuid4().hex[:12])
+            session = await self._get_session(session_id, create=True)
+            return await self._send_json(writer, 201, {"session_id": session.id})
+
+        if len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+            if not await self._drop_session(parts[1]):
+                raise HTTPError(404, f"Sesi {parts[1]} tidak ditemukan")
+            return await self._send_json(writer, 200, {"closed": parts[1]})
+
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages" and method == "POST":
+            message = str(payload.get("message") or "").strip()
+            if not message:
+                raise HTTPError(400, "Field 'message' wajib diisi")
+            session = await self._get_session(parts[1], create=True)
+            stream = bool(payload.get("stream", False))
+            chunks, result = self._enqueue(session, message, bool(payload.get("use_cache", True)), stream)
+            if stream:
+                return await self._send_stream(writer, chunks, result)
+            reply, metrics = await result
+            return await self._send_json(writer, 200, {"session_id": session.id, "reply": reply,
+                                                       "metrics": metrics})
+
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "history" and method == "GET":
+            # Hanya baca: jangan membuat engine (dan folder sesi) untuk id yang tidak dikenal
+            session = await self._get_session(parts[1])
+            try:
+                limit = int(parse_qs(url.query).get("limit", ["20"])[0])
+            except ValueError:
+                raise HTTPError(400, "limit harus angka")
+            entries = await asyncio.get_running_loop().run_in_executor(
+                None, session.engine.load_history, limit
+            )
+            return await self._send_json(writer, 200, {"session_id": session.id, "history": entries})
+
+        raise HTTPError(404 if method in ("GET", "POST", "DELETE") else 405, f"{method} {url.path} tidak dikenal")
+
+
+async def serve(host: str, port: int, base_engine: ChatEngine, **options):
+    server = ChatServer(base_engine, **options)
+    await server.start(host, port)
+    print(f"Mio chat server berjalan di http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server chat Mio multi-sesi")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--mock", action="store_true", help="pakai backend lokal tanpa API key")
+    parser.add_argument("--pool-size", type=int, default=UPSTREAM_POOL_SIZE)
+    parser.add_argument("--queue-size", type=int, default=SESSION_QUEUE_SIZE)
+    args = parser.parse_args(argv)
+
+    backend = None
+    if args.mock:
+        from modules.backends import MockBackend
+        backend = MockBackend()
+    base_engine = ChatEngine(backend=backend)
+    try:
+        asyncio.run(serve(args.host, args.port, base_engine,
+                          pool_size=args.pool_size, queue_size=args.queue_size))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        base_engine.close()
+
+
+if __name__ == "__main__":
+    main()
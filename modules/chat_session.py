@@ -0,0 +1,122 @@
+# modules/chat_session.py
+import re
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, List, Tuple
+
+SESSION_WINDOW_TURNS = 6  # Giliran terakhir yang dikirim utuh ke model
+SUMMARY_MAX_CHARS = 1500  # Batas panjang ringkasan bergulir
+SUMMARY_USER_CHARS = 120
+SUMMARY_MIO_CHARS = 200
+PREAMBLE_ACK = "Baik, aku mengerti. Aku siap membantu sebagai Mio."
+
+SENTENCE_END_REGEX = re.compile(r"(?<=[.!?])\s")
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def summarize_turn(user_msg: str, mio_msg: str) -> str:
+    """Compact one evicted turn into a single line without calling the model"""
+    first_sentence = SENTENCE_END_REGEX.split(" ".join(mio_msg.split()), maxsplit=1)[0]
+    return (
+        f"- User: {_clip(user_msg, SUMMARY_USER_CHARS)} → "
+        f"Mio: {_clip(first_sentence, SUMMARY_MIO_CHARS)}"
+    )
+
+
+class SlidingWindowSession:
+    """Live chat with a bounded window of turns and a rolling summary of older ones
+
+    Every request carries the system prompt, the rolling summary and at most
+    `window_turns` full turns, so the payload stays roughly constant no
+    matter how long the chat runs.
+    """
+
+    def __init__(self, model, system_prompt: str, window_turns: int = SESSION_WINDOW_TURNS,
+                 summary_max_chars: int = SUMMARY_MAX_CHARS,
+                 summarizer: Callable[[str, str], str] = summarize_turn):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.window_turns = window_turns
+        self.summary_max_chars = summary_max_chars
+        self.summarizer = summarizer
+        self.turns: Deque[Tuple[str, str]] = deque()
+        self._summary_lines: Deque[str] = deque()
+        self._summary_chars = 0
+        self.turn_count = 0
+        self.last_payload_chars = 0
+
+    # --- State ----------------------------------------------------------
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self._summary_lines)
+
+    def _fold(self, user_msg: str, mio_msg: str):
+        line = self.summarizer(user_msg, mio_msg)
+        self._summary_lines.append(line)
+        self._summary_chars += len(line) + 1
+        # Ringkasan juga dibatasi: baris paling lama dibuang lebih dulu
+        while self._summary_chars > self.summary_max_chars and len(self._summary_lines) > 1:
+            dropped = self._summary_lines.popleft()
+            self._summary_chars -= len(dropped) + 1
+
+    def record(self, user_msg: str, mio_msg: str):
+        """Add a finished turn, folding the oldest one into the summary if needed"""
+        self.turns.append((user_msg, mio_msg))
+        self.turn_count += 1
+        while len(self.turns) > self.window_turns:
+            self._fold(*self.turns.popleft())
+
+    # --- Requests -------------------------------------------------------
+
+    def _preamble(self) -> str:
+        # system_prompt kosong jika persona sudah dipasang sebagai system instruction model
+        parts = [self.system_prompt] if self.system_prompt else []
+        if self._summary_lines:
+            parts.append(f"Ringkasan percakapan sebelumnya di sesi ini:\n{self.summary}")
+        return "\n\n".join(parts)
+
+    def estimate_payload_chars(self, user_input: str) -> int:
+        """Size of the next request without building it (for quota accounting)"""
+        turns = sum(len(user_msg) + len(mio_msg) for user_msg, mio_msg in self.turns)
+        preamble = self._preamble()
+        return (len(preamble) + len(PREAMBLE_ACK) if preamble else 0) + turns + len(user_input)
+
+    def build_contents(self, user_input: str) -> List[Dict]:
+        """Build the request payload for the next user message"""
+        contents = []
+        preamble = self._preamble()
+        if preamble:
+            contents.append({"role": "user", "parts": [preamble]})
+            contents.append({"role": "model", "parts": [PREAMBLE_ACK]})
+        for user_msg, mio_msg in self.turns:
+            contents.append({"role": "user", "parts": [user_msg]})
+            contents.append({"role": "model", "parts": [mio_msg]})
+        contents.append({"role": "user", "parts": [user_input]})
+
+        self.last_payload_chars = sum(len(part) for item in contents for part in item["parts"])
+        return contents
+
+    def send(self, user_input: str, model=None) -> str:
+        """Send a message and return the full reply; `model` overrides the session model"""
+        model = model or self.model
+        response = model.generate_content(self.build_contents(user_input))
+        reply = response.text.strip()
+        self.record(user_input, reply)
+        return reply
+
+    def stream(self, user_input: str, model=None) -> Iterator[str]:
+        """Send a message and yield reply chunks; the turn is recorded at the end"""
+        model = model or self.model
+        response = model.generate_content(self.build_contents(user_input), stream=True)
+        parts = []
+        for chunk in response:
+            text = chunk.text
+            if not text:
+                continue
+            parts.append(text)
+            yield text
+        self.record(user_input, "".join(parts).strip())
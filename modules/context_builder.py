@@ -0,0 +1,148 @@
+# modules/context_builder.py
+import math
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+CONTEXT_TOKEN_BUDGET = 2000  # Token maksimum untuk konteks riwayat di system prompt
+CHARS_PER_TOKEN = 4  # Perkiraan kasar untuk teks Indonesia/Inggris
+TURN_OVERHEAD_TOKENS = 4  # "User: " / "Mio: " dan baris baru
+RECENCY_WEIGHT = 1.0
+RELEVANCE_WEIGHT = 1.5
+SUMMARY_BUDGET_SHARE = 0.3  # Porsi budget maksimum untuk ringkasan percakapan lama
+RETRIEVAL_BUDGET_SHARE = 0.4  # Porsi budget maksimum untuk giliran lama hasil pencarian
+
+WORD_REGEX = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate, no network call"""
+    if not text:
+        return 0
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _words(text: str) -> set:
+    return {word for word in WORD_REGEX.findall(text.lower()) if len(word) > 2}
+
+
+class TokenCounter:
+    """Count tokens with the local chars/token estimate
+
+    The context budget only needs to be roughly right, so counting never
+    calls the model's count_tokens: packing and saving a turn must not
+    wait on a network request.
+    """
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text)
+
+
+class ContextBuilder:
+    """Pack the most relevant recent turns into a fixed token budget"""
+
+    def __init__(self, counter: TokenCounter, budget: int = CONTEXT_TOKEN_BUDGET):
+        self.counter = counter
+        self.budget = budget
+
+    def turn_tokens(self, entry: Dict) -> int:
+        # Jumlah token yang tersimpan bersama entry tidak perlu dihitung ulang
+        stored = entry.get("tokens")
+        if isinstance(stored, int):
+            return stored + TURN_OVERHEAD_TOKENS
+        return (
+            self.counter.count(entry.get("user", ""))
+            + self.counter.count(entry.get("mio", ""))
+            + TURN_OVERHEAD_TOKENS
+        )
+
+    def _pack_summaries(self, summaries: List[Dict]) -> Tuple[List[Dict], int]:
+        # Ringkasan terbaru didahulukan, tetap dalam porsi budget-nya sendiri
+        limit = int(self.budget * SUMMARY_BUDGET_SHARE)
+        used = 0
+        selected = []
+        for summary in reversed(summaries):
+            tokens = summary.get("tokens")
+            if not isinstance(tokens, int):
+                tokens = self.counter.count(summary.get("summary", ""))
+            if used + tokens > limit:
+                break
+            used += tokens
+            selected.append(summary)
+        return list(reversed(selected)), used
+
+    def _pack_retrieved(self, retrieved: List[Dict]) -> Tuple[List[Dict], int]:
+        # Hasil pencarian sudah urut dari yang paling relevan
+        limit = int(self.budget * RETRIEVAL_BUDGET_SHARE)
+        used = 0
+        selected = []
+        for entry in retrieved:
+            tokens = self.turn_tokens(entry)
+            if used + tokens > limit:
+                continue
+            used += tokens
+            selected.append(entry)
+        return sorted(selected, key=lambda entry: entry.get("timestamp", "")), used
+
+    def build(self, entries: List[Dict], query: Optional[str] = None,
+              summaries: Optional[List[Dict]] = None,
+              retrieved: Optional[List[Dict]] = None) -> Tuple[str, Dict]:
+        """Return the context text and a report of how much budget it used
+        
+        `retrieved` are older turns found by the retrieval index; they get
+        their own share of the budget and their own section.
+        """
+        started = time.perf_counter()
+        query_words = _words(query) if query else set()
+        total = len(entries)
+        selected_summaries, summary_tokens = self._pack_summaries(summaries or [])
+        selected_retrieved, retrieved_tokens = self._pack_retrieved(retrieved or [])
+
+        scored = []
+        for index, entry in enumerate(entries):
+            recency = (index + 1) / total
+            relevance = 0.0
+            if query_words:
+                entry_words = _words(f"{entry.get('user', '')} {entry.get('mio', '')}")
+                relevance = len(query_words & entry_words) / len(query_words)
+            score = RECENCY_WEIGHT * recency + RELEVANCE_WEIGHT * relevance
+            scored.append((score, index, entry))
+
+        used = summary_tokens + retrieved_tokens
+        selected = []
+        for score, index, entry in sorted(scored, key=lambda item: item[0], reverse=True):
+            tokens = self.turn_tokens(entry)
+            if used + tokens > self.budget:
+                continue
+            used += tokens
+            selected.append((index, entry))
+
+        context_parts = []
+        if selected_summaries:
+            context_parts.append("Ringkasan percakapan lama:")
+            context_parts.extend(summary.get("summary", "") for summary in selected_summaries)
+            context_parts.append("")
+
+        if selected_retrieved:
+            context_parts.append("Percakapan lama yang relevan:")
+            for entry in selected_retrieved:
+                context_parts.append(f"[{entry.get('timestamp', '')[:10]}] User: {entry.get('user', '')}")
+                context_parts.append(f"Mio: {entry.get('mio', '')}")
+            context_parts.append("")
+            context_parts.append("Percakapan terakhir:")
+
+        # Urutkan lagi secara kronologis supaya percakapan tetap runtut
+        for _, entry in sorted(selected, key=lambda item: item[0]):
+            context_parts.append(f"User: {entry.get('user', '')}")
+            context_parts.append(f"Mio: {entry.get('mio', '')}")
+
+        report = {
+            "budget": self.budget,
+            "used": used,
+            "turns_considered": total,
+            "turns_included": len(selected),
+            "summaries_included": len(selected_summaries),
+            "retrieved_included": len(selected_retrieved),
+            "build_ms": (time.perf_counter() - started) * 1000,
+        }
+        return "\n".join(context_parts), report
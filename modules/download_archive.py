@@ -0,0 +1,117 @@
+# modules/download_archive.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+DOWNLOAD_ARCHIVE_DB = Path("data/download_archive.db")
+
+logger = logging.getLogger(__name__)
+
+ArchiveKey = Tuple[str, str, str, str]  # (extractor, video id, format, kualitas)
+
+
+def final_path_from_hook(d: Dict) -> Optional[str]:
+    """Final file path from a yt-dlp postprocessor hook call, or None
+
+    MoveFiles is always the last post-processing step; its hook gets the
+    info dict as it was before the move, so the destination is rebuilt
+    the same way MoveFilesAfterDownloadPP does.
+    """
+    if d.get('status') != 'finished' or d.get('postprocessor') != 'MoveFiles':
+        return None
+    info = d.get('info_dict') or {}
+    filepath = info.get('filepath')
+    if not filepath:
+        return None
+    return os.path.join(info.get('__finaldir') or os.path.dirname(filepath), os.path.basename(filepath))
+
+
+class DownloadArchive:
+    """Persistent (extractor, video id, format, quality) → file path index
+
+    All rows are mirrored in a dict, so checking whether a URL was already
+    downloaded is a dict lookup plus one stat of the stored path.
+    """
+
+    def __init__(self, path: Path = DOWNLOAD_ARCHIVE_DB):
+        self.path = Path(path)
+        self.stats = {"hits": 0, "stale": 0, "added": 0}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            "extractor TEXT NOT NULL, video_id TEXT NOT NULL, format TEXT NOT NULL, "
+            "quality TEXT NOT NULL, path TEXT NOT NULL, title TEXT, downloaded REAL NOT NULL, "
+            "PRIMARY KEY (extractor, video_id, format, quality))"
+        )
+        self._conn.commit()
+        self._index: Dict[ArchiveKey, str] = {
+            tuple(row[:4]): row[4]
+            for row in self._conn.execute("SELECT extractor, video_id, format, quality, path FROM archive")
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, video_key: Tuple[str, str], format_type: str, quality: str) -> Optional[str]:
+        """Path of an earlier download that still exists on disk, else None"""
+        key = (*video_key, format_type, quality)
+        path = self._index.get(key)
+        if path is None:
+            return None
+        if os.path.exists(path):
+            self.stats["hits"] += 1
+            return path
+        # File dihapus/dipindah di luar bot: lupakan supaya diunduh ulang
+        self.stats["stale"] += 1
+        self._remove([key])
+        return None
+
+    def add(self, video_keys: Iterable[Tuple[str, str]], format_type: str, quality: str,
+            path: str, title: Optional[str] = None):
+        """Record a finished download under every key that identifies it"""
+        now = time.time()
+        rows = [(*video_key, format_type, quality, path, title, now) for video_key in set(video_keys) if video_key]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archive (extractor, video_id, format, quality, path, title, downloaded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            for row in rows:
+                self._index[row[:4]] = path
+        self.stats["added"] += 1
+
+    def _remove(self, keys: Iterable[ArchiveKey]):
+        keys = list(keys)
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM archive WHERE extractor = ? AND video_id = ? AND format = ? AND quality = ?", keys
+            )
+            self._conn.commit()
+            for key in keys:
+                self._index.pop(key, None)
+
+    def verify(self) -> Dict:
+        """Reconcile the index with the disk: drop entries whose file is gone"""
+        entries = list(self._index.items())
+        missing = {key for key, path in entries if not os.path.exists(path)}
+        if missing:
+            self._remove(missing)
+        return {
+            "checked": len(entries),
+            "missing": len(missing),
+            "kept": len(entries) - len(missing),
+            "files": len({path for key, path in entries if key not in missing}),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,176 @@
+# modules/download_journal.py
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DOWNLOAD_JOURNAL_DB = Path("data/download_journal.db")
+
+# Status tiap URL: queued → extracting → downloading → post-processing → done/failed
+QUEUED = "queued"
+EXTRACTING = "extracting"
+DOWNLOADING = "downloading"
+POSTPROCESSING = "post-processing"
+DONE = "done"
+FAILED = "failed"
+JOB_STATES = (QUEUED, EXTRACTING, DOWNLOADING, POSTPROCESSING, DONE, FAILED)
+
+# Jenis batch: daftar URL dari file, atau playlist/channel yang diekspansi bertahap
+LIST_BATCH = "list"
+PLAYLIST_BATCH = "playlist"
+BATCH_COLUMNS = ("id", "source", "format", "platform", "created", "finished", "kind", "options", "expanded")
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadJournal:
+    """Persistent batch/job state so an interrupted batch can resume where it stopped
+
+    Every state change is committed immediately (WAL, synchronous=NORMAL),
+    so after Ctrl-C, a crash or a reboot, every job that is not `done` is
+    still pending and a resume starts with exactly those.
+    """
+
+    def __init__(self, path: Path = DOWNLOAD_JOURNAL_DB):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, format TEXT NOT NULL, "
+            "platform TEXT, created REAL NOT NULL, finished REAL);"
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, batch_id INTEGER NOT NULL REFERENCES batches(id), "
+            "position INTEGER NOT NULL, url TEXT NOT NULL, state TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, path TEXT, updated REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id, state, position);"
+        )
+        self._add_missing_columns()
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        # Journal lama dibuat sebelum batch playlist ada
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(batches)")}
+        if "kind" not in columns:
+            self._conn.execute(f"ALTER TABLE batches ADD COLUMN kind TEXT NOT NULL DEFAULT '{LIST_BATCH}'")
+        if "options" not in columns:
+            self._conn.execute("ALTER TABLE batches ADD COLUMN options TEXT")
+        if "expanded" not in columns:
+            self._conn.execute("ALTER TABLE batches ADD COLUMN expanded INTEGER NOT NULL DEFAULT 1")
+
+    def create_batch(self, source: str, format_type: str, platform: Optional[str], urls: Iterable[str],
+                     kind: str = LIST_BATCH, options: Optional[str] = None, expanded: bool = True) -> int:
+        """New batch with its jobs; a playlist batch starts unexpanded and gets jobs via add_job"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO batches (source, format, platform, created, kind, options, expanded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, format_type, platform, now, kind, options, int(expanded))
+            )
+            batch_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO jobs (batch_id, position, url, state, updated) VALUES (?, ?, ?, ?, ?)",
+                [(batch_id, position, url, QUEUED, now) for position, url in enumerate(urls)]
+            )
+            self._conn.commit()
+        return batch_id
+
+    def add_job(self, batch_id: int, position: int, url: str) -> int:
+        """Append a job discovered while a playlist is being expanded"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (batch_id, position, url, state, updated) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, position, url, QUEUED, time.time())
+            )
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def mark_expanded(self, batch_id: int):
+        """Every entry of a playlist batch is now in the journal"""
+        with self._lock:
+            self._conn.execute("UPDATE batches SET expanded = 1 WHERE id = ?", (batch_id,))
+            self._conn.commit()
+
+    def known_urls(self, batch_id: int) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM jobs WHERE batch_id = ?", (batch_id,)).fetchall()
+        return {url for url, in rows}
+
+    def batch(self, batch_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(BATCH_COLUMNS)} FROM batches WHERE id = ?", (batch_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        batch = dict(zip(BATCH_COLUMNS, row))
+        batch["expanded"] = bool(batch["expanded"])
+        return batch
+
+    def find_unfinished(self, source: Optional[str] = None, format_type: Optional[str] = None) -> Optional[Dict]:
+        """Most recent batch that was interrupted, optionally for one source file and format"""
+        query = "SELECT id FROM batches WHERE finished IS NULL"
+        params: List = []
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        if format_type is not None:
+            query += " AND format = ?"
+            params.append(format_type)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        return self.batch(row[0]) if row else None
+
+    def pending_jobs(self, batch_id: int) -> List[Tuple[int, str]]:
+        """(job id, url) of every job not yet done, in file order"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, url FROM jobs WHERE batch_id = ? AND state != ? ORDER BY position",
+                (batch_id, DONE)
+            ).fetchall()
+
+    def set_state(self, job_id: int, state: str, error: Optional[str] = None, path: Optional[str] = None):
+        """Record a state change; entering `extracting` counts as a new attempt
+
+        The error is kept until the job is done, so a retry in progress
+        still shows why the previous attempt failed.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + ?, "
+                "error = CASE ? WHEN ? THEN ? WHEN ? THEN NULL ELSE error END, "
+                "path = COALESCE(?, path), updated = ? WHERE id = ?",
+                (state, 1 if state == EXTRACTING else 0, state, FAILED, error, DONE, path, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def finish_batch(self, batch_id: int):
+        with self._lock:
+            self._conn.execute("UPDATE batches SET finished = ? WHERE id = ?", (time.time(), batch_id))
+            self._conn.commit()
+
+    def counts(self, batch_id: int) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state", (batch_id,)
+            ).fetchall()
+        return {**{state: 0 for state in JOB_STATES}, **dict(rows)}
+
+    def failed_jobs(self, batch_id: int) -> List[Dict]:
+        """Failed jobs in file order with their attempt count and last error"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, attempts, error FROM jobs WHERE batch_id = ? AND state = ? ORDER BY position",
+                (batch_id, FAILED)
+            ).fetchall()
+        return [{"url": url, "attempts": attempts, "error": error} for url, attempts, error in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,124 @@
+# modules/download_pool.py
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+DOWNLOAD_WORKERS = 3
+HOST_CONCURRENCY = {"youtube": 3, "bstation": 1}  # Bstation lebih cepat membatasi/blokir IP
+DEFAULT_HOST_CONCURRENCY = 2
+MAX_PENDING_PER_WORKER = 4  # Item yang boleh menunggu per worker (untuk sumber yang lazy)
+HOST_DOMAINS = {
+    "youtube": ("youtube.com", "youtu.be"),
+    "bstation": ("bilibili.tv", "bilibili.com"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def host_key(url: str) -> str:
+    """Concurrency group of a URL: 'youtube', 'bstation' or the bare host name"""
+    netloc = urlparse(url if "://" in url else f"https://{url}").netloc.lower().split(":")[0]
+    for key, domains in HOST_DOMAINS.items():
+        if any(netloc == domain or netloc.endswith(f".{domain}") for domain in domains):
+            return key
+    return netloc or "other"
+
+
+class DownloadPool:
+    """Thread pool with a global worker limit and a concurrency cap per host
+
+    Items are pulled from `items` only while fewer than
+    `workers * MAX_PENDING_PER_WORKER` are waiting, so a lazy generator is
+    consumed as downloads finish instead of all at once. `stop()` stops
+    dispatching new items (abort mode); `cancel()` additionally sets
+    `cancel_event`, which running downloads poll to give up early.
+    """
+
+    def __init__(self, workers: int = DOWNLOAD_WORKERS, host_limits: Optional[Dict[str, int]] = None,
+                 default_host_limit: int = DEFAULT_HOST_CONCURRENCY,
+                 key: Callable[[Any], str] = host_key):
+        self.workers = max(1, int(workers))
+        self.host_limits = {**HOST_CONCURRENCY, **(host_limits or {})}
+        self.default_host_limit = max(1, int(default_host_limit))
+        self.key = key
+        self.max_pending = self.workers * MAX_PENDING_PER_WORKER
+        self.cancel_event = threading.Event()
+        self._stopped = threading.Event()
+
+    def limit_for(self, host: str) -> int:
+        return max(1, int(self.host_limits.get(host, self.default_host_limit)))
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def stop(self):
+        self._stopped.set()
+
+    def cancel(self):
+        self._stopped.set()
+        self.cancel_event.set()
+
+    def run(self, items: Iterable[Any], func: Callable[[Any], Any],
+            on_start: Optional[Callable[[int, Any], None]] = None,
+            on_done: Optional[Callable[[int, Any, Any, Optional[BaseException]], None]] = None) -> int:
+        """Call `func(item)` for every item; returns how many were started
+
+        `on_done(index, item, result, error)` runs on the calling thread
+        in completion order; an exception from `func` is passed as `error`.
+        """
+        self._stopped.clear()
+        self.cancel_event.clear()
+        source = enumerate(items)
+        exhausted = False
+        waiting: "OrderedDict[str, Deque[Tuple[int, Any]]]" = OrderedDict()
+        waiting_count = 0
+        running: Dict[Future, Tuple[int, Any, str]] = {}
+        per_host: Counter = Counter()
+        started = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mio-download") as executor:
+            try:
+                while True:
+                    # Tarik item baru selama antrean tunggu belum penuh
+                    while not exhausted and not self.stopped and waiting_count < self.max_pending:
+                        try:
+                            index, item = next(source)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        waiting.setdefault(self.key(item), deque()).append((index, item))
+                        waiting_count += 1
+
+                    if not self.stopped:
+                        for host, queue in waiting.items():
+                            while queue and len(running) < self.workers and per_host[host] < self.limit_for(host):
+                                index, item = queue.popleft()
+                                waiting_count -= 1
+                                if on_start:
+                                    on_start(index, item)
+                                running[executor.submit(func, item)] = (index, item, host)
+                                per_host[host] += 1
+                                started += 1
+
+                    if not running:
+                        if exhausted or self.stopped:
+                            break
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, item, host = running.pop(future)
+                        per_host[host] -= 1
+                        error = future.exception()
+                        result = None if error else future.result()
+                        if on_done:
+                            on_done(index, item, result, error)
+            except BaseException:
+                # Ctrl-C / error di callback: jangan mulai yang baru, hentikan yang sedang jalan
+                self.cancel()
+                raise
+        return started
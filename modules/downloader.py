@@ -20,4 +20,7 @@ def run_downloader_interface(platform: str = "youtube"):
     downloader._selected_platform = platform
 
     # Langsung jalanin mode interaktif
-    downloader.interactive_mode()
+    try:
+        downloader.interactive_mode()
+    finally:
+        downloader.close()
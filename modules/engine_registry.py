@@ -0,0 +1,113 @@
+# modules/engine_registry.py
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+ENGINE_IDLE_EXPIRY = 30 * 60  # detik tanpa dipakai sebelum engine ditutup
+EXPIRY_CHECK_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    def __init__(self, engine):
+        self.engine = engine
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class EngineRegistry:
+    """Keep initialized ChatEngines (model + live session) alive between uses
+
+    `acquire` returns the existing engine for a key or builds one with the
+    factory; `release` marks it idle. Engines idle for longer than
+    `idle_expiry` are closed by a daemon thread, and everything left is
+    closed at interpreter exit.
+    """
+
+    def __init__(self, factory: Callable[[], object], idle_expiry: float = ENGINE_IDLE_EXPIRY,
+                 check_interval: float = EXPIRY_CHECK_INTERVAL):
+        self.factory = factory
+        self.idle_expiry = idle_expiry
+        self.check_interval = check_interval
+        self._slots: Dict[str, _Slot] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        atexit.register(self.close_all)
+
+    def acquire(self, key: str = "default"):
+        """Return a live engine for `key`, creating it if needed"""
+        self.expire_idle()
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                started = time.perf_counter()
+                slot = _Slot(self.factory())
+                self._slots[key] = slot
+                logger.info(f"Engine '{key}' created in {time.perf_counter() - started:.2f}s")
+            else:
+                logger.info(f"Engine '{key}' reused")
+            slot.in_use += 1
+            slot.last_used = time.monotonic()
+            self._start_reaper()
+            return slot.engine
+
+    def release(self, key: str = "default"):
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot:
+                slot.in_use = max(0, slot.in_use - 1)
+                slot.last_used = time.monotonic()
+
+    def has(self, key: str = "default") -> bool:
+        with self._lock:
+            return key in self._slots
+
+    def expire_idle(self) -> int:
+        """Close engines that have not been used for `idle_expiry` seconds"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                (key, slot) for key, slot in self._slots.items()
+                if not slot.in_use and now - slot.last_used > self.idle_expiry
+            ]
+            for key, _ in expired:
+                del self._slots[key]
+        # Menutup engine (flush riwayat, stop worker) di luar lock
+        for key, slot in expired:
+            logger.info(f"Engine '{key}' idle for {now - slot.last_used:.0f}s, closing")
+            self._close(slot)
+        return len(expired)
+
+    def close_all(self):
+        self._stop_event.set()
+        with self._lock:
+            slots = list(self._slots.values())
+            self._slots.clear()
+        for slot in slots:
+            self._close(slot)
+
+    @staticmethod
+    def _close(slot: _Slot):
+        try:
+            slot.engine.close()
+        except Exception as e:
+            logger.error(f"Failed to close engine: {e}")
+
+    def _start_reaper(self):
+        # Dipanggil dengan lock dipegang
+        if self._reaper and self._reaper.is_alive():
+            return
+        self._stop_event.clear()
+        self._reaper = threading.Thread(target=self._run_reaper, name="mio-engine-reaper", daemon=True)
+        self._reaper.start()
+
+    def _run_reaper(self):
+        while not self._stop_event.wait(self.check_interval):
+            self.expire_idle()
+            with self._lock:
+                if not self._slots:
+                    return
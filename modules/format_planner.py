@@ -0,0 +1,87 @@
+# modules/format_planner.py
+import logging
+from typing import Dict, List, Optional
+
+from yt_dlp.utils import MEDIA_EXTENSIONS
+
+# Mode audio: strict-mp3 selalu menghasilkan .mp3, fastest menyimpan stream audio apa adanya
+STRICT_MP3 = "strict-mp3"
+FASTEST = "fastest"
+AUDIO_MODES = (STRICT_MP3, FASTEST)
+
+# Apa yang perlu dilakukan ffmpeg setelah unduhan
+KEEP = "keep"  # File sudah dalam kontainer audio tujuan, tanpa ffmpeg
+REMUX = "remux"  # Stream audio disalin ke kontainer lain (-acodec copy), hampir tanpa CPU
+TRANSCODE = "transcode"  # Encode ulang (lossy, berat di CPU)
+ACTION_COST = {KEEP: 0, REMUX: 1, TRANSCODE: 2}
+
+# Codec yang bisa disalin tanpa encode ulang oleh FFmpegExtractAudioPP ('best')
+COPYABLE_CODECS = ("aac", "mp4a", "opus", "vorbis", "mp3", "flac", "alac")
+NEAR_BEST_BITRATE = 0.75  # fastest boleh memilih stream sedikit lebih kecil bila tanpa ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+def codec_family(acodec: Optional[str]) -> Optional[str]:
+    """'mp4a.40.2' → 'mp4a'; None for missing or 'none'"""
+    if not acodec or acodec == "none":
+        return None
+    return acodec.split(".")[0].lower()
+
+
+class AudioPlan:
+    """Which audio stream to download and what post-processing it needs"""
+
+    def __init__(self, fmt: Dict, action: str):
+        self.format_id = fmt.get("format_id")
+        self.ext = fmt.get("ext")
+        self.acodec = codec_family(fmt.get("acodec"))
+        self.abr = fmt.get("abr") or fmt.get("tbr")
+        self.action = action
+
+    @property
+    def postprocess_codec(self) -> str:
+        # preferredcodec untuk FFmpegExtractAudioPP: 'best' menyalin stream bila bisa
+        return "mp3" if self.action == TRANSCODE else "best"
+
+    def describe(self) -> str:
+        bitrate = f" {self.abr:.0f}k" if self.abr else ""
+        return f"{self.format_id} ({self.acodec or '?'}/{self.ext}{bitrate}) → {self.action}"
+
+
+def _action(fmt: Dict, mode: str) -> str:
+    codec = codec_family(fmt.get("acodec"))
+    if mode == STRICT_MP3:
+        if codec == "mp3":
+            return KEEP if fmt.get("ext") == "mp3" else REMUX
+        return TRANSCODE
+    if fmt.get("ext") in MEDIA_EXTENSIONS.common_audio:
+        return KEEP
+    return REMUX if codec in COPYABLE_CODECS else TRANSCODE
+
+
+def plan_audio(formats: List[Dict], mode: str = STRICT_MP3) -> Optional[AudioPlan]:
+    """Pick the audio-only format that needs the least post-processing
+
+    strict-mp3 takes the best-quality stream and only avoids the encode
+    when the source already is MP3. fastest also accepts m4a/opus/... as
+    they are, preferring a stream that needs no ffmpeg at all if its
+    bitrate is within NEAR_BEST_BITRATE of the best one. Returns None when
+    there is no audio-only format to choose from.
+    """
+    audio = [
+        fmt for fmt in formats or []
+        if fmt.get("vcodec") == "none" and codec_family(fmt.get("acodec")) and fmt.get("format_id")
+    ]
+    if not audio:
+        return None
+    bitrate = lambda fmt: fmt.get("abr") or fmt.get("tbr") or 0
+    cost = lambda fmt: ACTION_COST[_action(fmt, mode)]
+    if mode == STRICT_MP3:
+        # Kualitas dulu; pada bitrate yang sama pilih yang paling sedikit diproses
+        chosen = max(audio, key=lambda fmt: (bitrate(fmt), -cost(fmt)))
+    else:
+        best_bitrate = max(bitrate(fmt) for fmt in audio)
+        candidates = [fmt for fmt in audio if bitrate(fmt) >= best_bitrate * NEAR_BEST_BITRATE]
+        chosen = min(candidates, key=lambda fmt: (cost(fmt), -bitrate(fmt)))
+    return AudioPlan(chosen, _action(chosen, mode))
@@ -0,0 +1,197 @@
+# modules/hedging.py
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional
+
+from modules.model_router import ModelRouter, percentile
+from modules.rate_limiter import QuotaLimiter
+
+HEDGE_PERCENTILE = 95  # Hedge dikirim jika first token lebih lambat dari persentil ini
+HEDGE_DEFAULT_DELAY = 2.0  # detik, dipakai sebelum ada statistik latensi
+HEDGE_MIN_DELAY = 0.2
+HEDGE_STATS_WINDOW = 200
+
+logger = logging.getLogger(__name__)
+
+
+def _pump(model, contents, source: str, events: "queue.Queue", cancel: threading.Event,
+          probe: Dict):
+    """Run one streaming request in a thread and forward its chunks"""
+    try:
+        for chunk in model.generate_content(contents, stream=True):
+            # Waktu first token tetap dicatat walau sudah kalah, untuk statistik p99
+            probe.setdefault("first", time.perf_counter())
+            if cancel.is_set():
+                return
+            text = chunk.text
+            if text:
+                events.put((source, "chunk", text))
+        events.put((source, "done", None))
+    except Exception as e:
+        events.put((source, "error", e))
+
+
+class Hedger:
+    """Send a backup request to a second model when the first one is slow
+
+    The backup fires once the primary has gone longer than its recent
+    `percentile` first-token latency without answering. Whichever model
+    produces a first chunk wins, and the other stream is cancelled (its
+    chunks are dropped and its thread stops at the next chunk).
+    """
+
+    def __init__(self, router: ModelRouter, percentile_value: float = HEDGE_PERCENTILE,
+                 default_delay: float = HEDGE_DEFAULT_DELAY, min_delay: float = HEDGE_MIN_DELAY,
+                 quota: Optional[QuotaLimiter] = None):
+        self.router = router
+        self.quota = quota
+        self.percentile = percentile_value
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        # Satu Hedger dipakai semua sesi server dan thread batch
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fired = 0
+        self.skipped = 0  # Hedge batal karena kuota sedang habis
+        self.hedge_wins = 0
+        # First token yang dirasakan user vs. primary saja
+        self._observed: Deque[float] = deque(maxlen=HEDGE_STATS_WINDOW)
+        self._primary_probes: Deque[Dict] = deque(maxlen=HEDGE_STATS_WINDOW)
+
+    def delay_for(self, model_name: str) -> float:
+        latency = percentile(self.router.stats[model_name].latencies(), self.percentile)
+        if latency is None:
+            return self.default_delay
+        return max(self.min_delay, latency)
+
+    def stream(self, contents: List[Dict], primary: str, secondary: str,
+               quota_tokens: int = 0, result: Optional[Dict] = None) -> Iterator[str]:
+        """Yield reply chunks from whichever model answers first
+        
+        The backup request only fires when the quota has room for
+        `quota_tokens` right now; hedging never waits for budget.
+
+        The caller's `result` dict is filled with the winner, whether the
+        hedge fired, the first-token latency, per-model errors and the
+        models actually called (`attempted`). It is per call, since one
+        Hedger serves every session of the server.
+        """
+        events: "queue.Queue" = queue.Queue()
+        cancel = {primary: threading.Event(), secondary: threading.Event()}
+        started = time.perf_counter()
+        deadline = started + self.delay_for(primary)
+        if result is None:
+            result = {}
+        result.update(winner=None, hedged=False, ttft=None, errors={}, attempted=[])
+        with self._lock:
+            self.requests += 1
+        running = {primary}
+        probes = {primary: {"started": started}, secondary: {"started": started}}
+
+        def launch(model_name: str):
+            model = self.router.model(model_name)
+            result["attempted"].append(model_name)
+            threading.Thread(
+                target=_pump,
+                args=(model, contents, model_name, events, cancel[model_name], probes[model_name]),
+                name=f"mio-hedge-{model_name}", daemon=True
+            ).start()
+
+        def fire_hedge() -> bool:
+            if self.quota and not self.quota.try_acquire(quota_tokens):
+                with self._lock:
+                    self.skipped += 1
+                return False
+            result["hedged"] = True
+            with self._lock:
+                self.fired += 1
+            running.add(secondary)
+            logger.info(f"Hedging {primary} with {secondary} after {time.perf_counter() - started:.2f}s")
+            launch(secondary)
+            return True
+
+        launch(primary)
+        try:
+            while True:
+                timeout = None
+                if result["winner"] is None and not result["hedged"] and deadline is not None:
+                    timeout = max(0.0, deadline - time.perf_counter())
+                try:
+                    source, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if not fire_hedge():
+                        # Tanpa kuota untuk cadangan: tunggu model utama saja
+                        deadline = None
+                    continue
+
+                if result["winner"] is None:
+                    if kind == "error":
+                        result["errors"][source] = payload
+                        running.discard(source)
+                        if not result["hedged"]:
+                            # Primary langsung gagal: hedge berfungsi sebagai failover
+                            if not fire_hedge():
+                                raise payload
+                        elif not running:
+                            raise payload
+                        continue
+
+                    result["winner"] = source
+                    result["ttft"] = time.perf_counter() - started
+                    loser = secondary if source == primary else primary
+                    cancel[loser].set()
+                    with self._lock:
+                        self._observed.append(result["ttft"])
+                        if source == secondary:
+                            self.hedge_wins += 1
+                        if primary not in result["errors"]:
+                            self._primary_probes.append(probes[primary])
+                    if kind == "done":
+                        return
+                    yield payload
+                    continue
+
+                if source != result["winner"]:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            # Pastikan tidak ada thread yang terus mengirim chunk setelah kita selesai
+            for event in cancel.values():
+                event.set()
+
+    def summary(self) -> Dict:
+        """Hedging counters and p99 with vs. without hedging
+
+        Primary-only latency uses the primary's real first token when it
+        eventually arrived; a primary that is still silent counts with the
+        time elapsed so far, which is a lower bound.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            probes = list(self._primary_probes)
+            observed = list(self._observed)
+            requests, fired, skipped, hedge_wins = self.requests, self.fired, self.skipped, self.hedge_wins
+        primary_only = [probe.get("first", now) - probe["started"] for probe in probes]
+        observed_p99 = percentile(observed, 99)
+        primary_p99 = percentile(primary_only, 99)
+        improvement = None
+        if observed_p99 is not None and primary_p99 is not None:
+            improvement = primary_p99 - observed_p99
+        return {
+            "requests": requests,
+            "fired": fired,
+            "skipped": skipped,
+            "fire_rate": fired / requests if requests else 0.0,
+            "hedge_wins": hedge_wins,
+            "p99_observed": observed_p99,
+            "p99_primary_only": primary_p99,
+            "p99_improvement": improvement,
+        }
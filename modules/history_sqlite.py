@@ -0,0 +1,253 @@
+# modules/history_sqlite.py
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from modules.history_store import MATCH_START, MATCH_END, make_snippet
+
+HISTORY_DB = Path("data/history.db")
+SNIPPET_TOKENS = 12
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    user TEXT NOT NULL,
+    mio TEXT NOT NULL,
+    tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_turns_timestamp ON turns(timestamp);
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    tokens INTEGER,
+    created TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_end ON summaries(end);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    user, mio,
+    content='turns', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS turns_ai AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, user, mio) VALUES (new.id, new.user, new.mio);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_ad AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts(turns_fts, rowid, user, mio) VALUES ('delete', old.id, old.user, old.mio);
+END;
+"""
+
+
+def build_fts_query(terms: str) -> str:
+    """Turn free text into a safe FTS5 query (every word as a quoted prefix)"""
+    words = [word.replace('"', '""') for word in terms.split()]
+    return " ".join(f'"{word}"*' for word in words if word)
+
+
+class SQLiteHistoryStore:
+    """Conversation history in SQLite with a timestamp index and FTS5 search"""
+
+    def __init__(self, path: Path = HISTORY_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._add_missing_columns()
+
+        # SQLite tanpa FTS5 tetap bisa dipakai, pencarian turun ke LIKE
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 not available, falling back to LIKE search: {e}")
+            self.has_fts = False
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        # Database lama dibuat sebelum kolom tokens ada
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(turns)")}
+        if "tokens" not in columns:
+            self._conn.execute("ALTER TABLE turns ADD COLUMN tokens INTEGER")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Write ----------------------------------------------------------
+
+    def append(self, entry: Dict):
+        """Insert one conversation turn"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO turns (timestamp, user, mio, tokens) VALUES (?, ?, ?, ?)",
+                (entry.get("timestamp", ""), entry.get("user", ""), entry.get("mio", ""),
+                 entry.get("tokens"))
+            )
+            self._conn.commit()
+
+    def import_entries(self, entries: Iterable[Dict]) -> int:
+        """Bulk insert entries in a single transaction"""
+        rows = [
+            (entry.get("timestamp", ""), entry.get("user", ""), entry.get("mio", ""),
+             entry.get("tokens"))
+            for entry in entries
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO turns (timestamp, user, mio, tokens) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    # --- Read -----------------------------------------------------------
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    def tail(self, limit: int, since: Optional[str] = None) -> List[Dict]:
+        """Return the newest `limit` entries (oldest first), newer than `since`"""
+        if limit <= 0:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, user, mio, tokens FROM turns WHERE timestamp > ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (since or "", limit)
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def iter_entries(self, since: Optional[str] = None) -> Iterator[Dict]:
+        """Iterate all entries from oldest to newest"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, user, mio, tokens FROM turns WHERE timestamp > ? ORDER BY timestamp, id",
+                (since or "",)
+            ).fetchall()
+        for row in rows:
+            yield dict(row)
+
+    def search(self, terms: str, limit: int = 10) -> List[Dict]:
+        """Return ranked matches with highlighted snippets"""
+        query = build_fts_query(terms)
+        if not query:
+            return []
+
+        if not self.has_fts:
+            return self._search_like(terms, limit)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.timestamp, "
+                "snippet(turns_fts, 0, ?, ?, '…', ?) AS user_snippet, "
+                "snippet(turns_fts, 1, ?, ?, '…', ?) AS mio_snippet, "
+                "bm25(turns_fts) AS rank "
+                "FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid "
+                "WHERE turns_fts MATCH ? ORDER BY rank LIMIT ?",
+                (MATCH_START, MATCH_END, SNIPPET_TOKENS,
+                 MATCH_START, MATCH_END, SNIPPET_TOKENS,
+                 query, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _search_like(self, terms: str, limit: int) -> List[Dict]:
+        words = terms.split()
+        clause = " AND ".join("(user LIKE ? OR mio LIKE ?)" for _ in words)
+        params: List = []
+        for word in words:
+            params.extend([f"%{word}%", f"%{word}%"])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT timestamp, user, mio FROM turns WHERE {clause} "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [
+            {
+                "timestamp": row["timestamp"],
+                "user_snippet": make_snippet(row["user"], words),
+                "mio_snippet": make_snippet(row["mio"], words),
+                "rank": 0.0,
+            }
+            for row in rows
+        ]
+
+    # --- Summaries ------------------------------------------------------
+
+    def append_summary(self, summary: Dict):
+        """Store a compacted summary of an older span of turns"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO summaries (start, end, turns, summary, tokens, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (summary["start"], summary["end"], summary["turns"], summary["summary"],
+                 summary.get("tokens"), summary["created"])
+            )
+            self._conn.commit()
+
+    def load_summaries(self, limit: int = 20) -> List[Dict]:
+        """Return the newest `limit` summaries (oldest first)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start, end, turns, summary, tokens, created FROM summaries "
+                "ORDER BY end DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def summarized_until(self) -> Optional[str]:
+        """Timestamp of the last turn covered by a summary"""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(end) FROM summaries").fetchone()
+        return row[0]
+
+    # --- Maintenance ----------------------------------------------------
+
+    def prune(self, max_days: int) -> int:
+        """Delete turns older than `max_days` using the timestamp index"""
+        cutoff_day = (datetime.date.today() - datetime.timedelta(days=max_days)).isoformat()
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM turns WHERE timestamp < ?", (cutoff_day,))
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Pruned {cursor.rowcount} history row(s) older than {cutoff_day}")
+        return cursor.rowcount
+
+    def migrate_from_json(self, json_path: Path) -> int:
+        """Import a legacy conversations.json list once, then rename it"""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+            data = json.loads(raw) if raw.strip() else []
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to read legacy history {json_path}: {e}")
+            return 0
+
+        if not isinstance(data, list):
+            logger.warning(f"Legacy history {json_path} is not a list, skipping migration")
+            return 0
+
+        migrated = self.import_entries(entry for entry in data if isinstance(entry, dict))
+        json_path.replace(json_path.with_name(json_path.name + ".migrated"))
+        logger.info(f"Migrated {migrated} history entries from {json_path}")
+        return migrated
@@ -0,0 +1,311 @@
+# modules/history_store.py
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+HISTORY_DIR = Path("data/history")
+SUMMARY_FILE_NAME = "summaries.jsonl"  # Tidak ikut dihapus saat segmen di-prune
+FSYNC_POLICIES = ("always", "interval", "never")
+DEFAULT_FSYNC_INTERVAL = 5.0  # detik
+READ_BLOCK_SIZE = 8192
+SNIPPET_WIDTH = 80
+
+# Penanda awal/akhir kata yang cocok di snippet hasil pencarian
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+logger = logging.getLogger(__name__)
+
+
+def make_snippet(text: str, words: List[str], width: int = SNIPPET_WIDTH) -> str:
+    """Cut a window of `text` around the first match and mark every match"""
+    if not words:
+        return text[:width]
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+    first = pattern.search(text)
+    if not first:
+        return text[:width] + ("…" if len(text) > width else "")
+
+    start = max(0, first.start() - width // 3)
+    end = min(len(text), start + width)
+    window = pattern.sub(lambda m: f"{MATCH_START}{m.group(0)}{MATCH_END}", text[start:end])
+    return ("…" if start > 0 else "") + window + ("…" if end < len(text) else "")
+
+
+def _read_lines_reversed(path: Path) -> Iterator[bytes]:
+    """Yield the lines of a file from last to first without reading it all"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(READ_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            lines = block.split(b"\n")
+            # Baris pertama mungkin terpotong, simpan untuk blok berikutnya
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+
+class HistoryStore:
+    """Append-only conversation log split into one JSONL segment per day"""
+
+    def __init__(self, directory: Path = HISTORY_DIR, fsync_policy: str = "interval",
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.directory = Path(directory)
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._handle = None
+        self._handle_day: Optional[str] = None
+        self._last_fsync = 0.0
+
+    # --- Segments -------------------------------------------------------
+
+    def _segment_path(self, day: str) -> Path:
+        return self.directory / f"{day}.jsonl"
+
+    def segments(self) -> List[Path]:
+        """Return segment files sorted from oldest to newest"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("????-??-??.jsonl"))
+
+    @staticmethod
+    def _entry_day(entry: Dict) -> str:
+        timestamp = entry.get("timestamp", "")
+        if len(timestamp) >= 10:
+            return timestamp[:10]
+        return datetime.date.today().isoformat()
+
+    def _open_segment(self, day: str):
+        if self._handle is not None and self._handle_day == day:
+            return self._handle
+        self._close_handle()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._segment_path(day)
+        handle = open(path, 'ab')
+        # Tulisan yang terpotong (crash) jangan sampai menempel ke baris baru
+        if handle.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    handle.write(b"\n")
+        self._handle = handle
+        self._handle_day = day
+        return handle
+
+    def _close_handle(self):
+        if self._handle is None:
+            return
+        try:
+            self._handle.flush()
+            if self.fsync_policy != "never":
+                os.fsync(self._handle.fileno())
+            self._handle.close()
+        except OSError as e:
+            logger.warning(f"Failed to close history segment: {e}")
+        self._handle = None
+        self._handle_day = None
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+
+    # --- Write ----------------------------------------------------------
+
+    def append(self, entry: Dict):
+        """Append one entry to its day segment (O(1), no rewrite)"""
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            handle = self._open_segment(self._entry_day(entry))
+            handle.write(line)
+            handle.flush()
+
+            now = time.monotonic()
+            if self.fsync_policy == "always" or (
+                self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval
+            ):
+                os.fsync(handle.fileno())
+                self._last_fsync = now
+
+    # --- Read -----------------------------------------------------------
+
+    def tail(self, limit: int, since: Optional[str] = None) -> List[Dict]:
+        """Return the newest `limit` entries (oldest first), newer than `since`"""
+        if limit <= 0:
+            return []
+        since_day = since[:10] if since else None
+
+        with self._lock:
+            if self._handle is not None:
+                self._handle.flush()
+
+        collected: List[Dict] = []
+        for path in reversed(self.segments()):
+            if since_day and path.stem < since_day:
+                break
+            for raw in _read_lines_reversed(path):
+                try:
+                    entry = json.loads(raw)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt line in {path.name}")
+                    continue
+                if since and entry.get("timestamp", "") <= since:
+                    continue
+                collected.append(entry)
+                if len(collected) >= limit:
+                    return list(reversed(collected))
+        return list(reversed(collected))
+
+    def iter_entries(self, since: Optional[str] = None) -> Iterator[Dict]:
+        """Iterate all entries from oldest to newest"""
+        since_day = since[:10] if since else None
+
+        with self._lock:
+            if self._handle is not None:
+                self._handle.flush()
+
+        for path in self.segments():
+            if since_day and path.stem < since_day:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupt line in {path.name}")
+                        continue
+                    if since and entry.get("timestamp", "") <= since:
+                        continue
+                    yield entry
+
+    def search(self, terms: str, limit: int = 10) -> List[Dict]:
+        """Linear scan fallback for /search; the SQLite backend is much faster"""
+        words = [word.lower() for word in terms.split()]
+        if not words:
+            return []
+
+        matches = []
+        for entry in self.iter_entries():
+            user_text = entry.get("user", "")
+            mio_text = entry.get("mio", "")
+            haystack = f"{user_text}\n{mio_text}".lower()
+            if not all(word in haystack for word in words):
+                continue
+            score = sum(haystack.count(word) for word in words)
+            matches.append({
+                "timestamp": entry.get("timestamp", ""),
+                "user_snippet": make_snippet(user_text, words),
+                "mio_snippet": make_snippet(mio_text, words),
+                "rank": -float(score),
+            })
+
+        # Skor tertinggi dulu, yang terbaru menang kalau skornya sama
+        matches.sort(key=lambda match: match["timestamp"], reverse=True)
+        matches.sort(key=lambda match: match["rank"])
+        return matches[:limit]
+
+    # --- Summaries ------------------------------------------------------
+
+    @property
+    def summary_path(self) -> Path:
+        return self.directory / SUMMARY_FILE_NAME
+
+    def append_summary(self, summary: Dict):
+        """Store a compacted summary of an older span of turns"""
+        line = (json.dumps(summary, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.summary_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                if self.fsync_policy != "never":
+                    os.fsync(f.fileno())
+
+    def load_summaries(self, limit: int = 20) -> List[Dict]:
+        """Return the newest `limit` summaries (oldest first)"""
+        if limit <= 0 or not self.summary_path.exists():
+            return []
+        summaries: List[Dict] = []
+        for raw in _read_lines_reversed(self.summary_path):
+            try:
+                summaries.append(json.loads(raw))
+            except json.JSONDecodeError:
+                continue
+            if len(summaries) >= limit:
+                break
+        return list(reversed(summaries))
+
+    def summarized_until(self) -> Optional[str]:
+        """Timestamp of the last turn covered by a summary"""
+        latest = self.load_summaries(limit=1)
+        return latest[0].get("end") if latest else None
+
+    # --- Maintenance ----------------------------------------------------
+
+    def prune(self, max_days: int) -> int:
+        """Delete whole segments older than `max_days`; return how many were removed"""
+        cutoff_day = (datetime.date.today() - datetime.timedelta(days=max_days)).isoformat()
+        removed = 0
+        with self._lock:
+            for path in self.segments():
+                if path.stem >= cutoff_day:
+                    break
+                if path.stem == self._handle_day:
+                    self._close_handle()
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Failed to remove history segment {path.name}: {e}")
+        if removed:
+            logger.info(f"Pruned {removed} history segment(s) older than {cutoff_day}")
+        return removed
+
+    def migrate_from_json(self, json_path: Path) -> int:
+        """Import a legacy conversations.json list once, then rename it"""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+            data = json.loads(raw) if raw.strip() else []
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to read legacy history {json_path}: {e}")
+            return 0
+
+        if not isinstance(data, list):
+            logger.warning(f"Legacy history {json_path} is not a list, skipping migration")
+            return 0
+
+        entries = sorted(
+            (entry for entry in data if isinstance(entry, dict)),
+            key=lambda entry: entry.get("timestamp", "")
+        )
+        for entry in entries:
+            self.append(entry)
+        self.close()
+
+        json_path.replace(json_path.with_name(json_path.name + ".migrated"))
+        logger.info(f"Migrated {len(entries)} history entries from {json_path}")
+        return len(entries)
@@ -3,7 +3,7 @@ from rich.console import Console
 from rich.prompt import Prompt
 from rich.panel import Panel
 from modules.downloader import run_downloader_interface
-from modules.chat_engine import start_chat_loop
+from modules.chat_engine import start_chat_loop, engine_registry
 from mio.personality import farewell_message
 
 console = Console()
@@ -29,5 +29,6 @@ def main_menu():
         elif pilihan == "3":
             run_downloader_interface(platform="bstation")
         elif pilihan == "4":
+            engine_registry.close_all()
             console.print(f"[italic magenta]{farewell_message()}[/italic magenta]")
             break
@@ -0,0 +1,114 @@
+# modules/metadata_cache.py
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+METADATA_CACHE_DB = Path("data/metadata_cache.db")
+METADATA_CACHE_TTL = 3600  # detik; URL stream YouTube kedaluwarsa setelah beberapa jam
+CACHEABLE_TYPES = ("video",)  # Playlist berisi entri yang cepat basi, tidak di-cache
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _extractor_classes():
+    # Impor di sini agar modul ini bisa dipakai tanpa memuat ~1800 extractor
+    from yt_dlp.extractor import gen_extractor_classes
+    return [ie for ie in gen_extractor_classes() if ie.ie_key() != "Generic"]
+
+
+@lru_cache(maxsize=4096)
+def url_key(url: str) -> Tuple[str, str]:
+    """(extractor, video id) for a URL without any network call
+
+    Uses the same URL patterns yt-dlp matches extractors with, so
+    youtu.be/<id> and youtube.com/watch?v=<id> share one key. URLs no
+    specific extractor recognizes fall back to a hash of the URL.
+    """
+    for ie in _extractor_classes():
+        if ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            if video_id:
+                return ie.ie_key(), video_id
+            break
+    return "url", hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def info_key(info: Dict) -> Optional[Tuple[str, str]]:
+    """(extractor, video id) of an extracted info dict"""
+    if info.get("extractor_key") and info.get("id"):
+        return info["extractor_key"], str(info["id"])
+    return None
+
+
+class MetadataCache:
+    """Extracted yt-dlp info dicts in SQLite, keyed by extractor + video id with a TTL"""
+
+    def __init__(self, path: Path = METADATA_CACHE_DB, ttl: float = METADATA_CACHE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "extractor TEXT NOT NULL, video_id TEXT NOT NULL, info TEXT NOT NULL, "
+            "fetched REAL NOT NULL, PRIMARY KEY (extractor, video_id))"
+        )
+        self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict]:
+        """Cached info for `key` if it is younger than the TTL"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, fetched FROM metadata WHERE extractor = ? AND video_id = ?", key
+            ).fetchone()
+        if row and time.time() - row[1] <= self.ttl:
+            self.stats["hits"] += 1
+            return json.loads(row[0])
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, info: Dict, *keys: Tuple[str, str]):
+        """Store a sanitized info dict under its own key and any extra keys (e.g. the URL key)"""
+        if not self.enabled or info.get("_type", "video") not in CACHEABLE_TYPES:
+            return
+        all_keys = {key for key in (info_key(info), *keys) if key}
+        payload = json.dumps(info, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata (extractor, video_id, info, fetched) VALUES (?, ?, ?, ?)",
+                [(extractor, video_id, payload, now) for extractor, video_id in all_keys]
+            )
+            self._conn.execute("DELETE FROM metadata WHERE fetched < ?", (now - self.ttl,))
+            self._conn.commit()
+        self.stats["stores"] += 1
+
+    def invalidate(self, *keys: Tuple[str, str]):
+        """Drop entries whose stream URLs turned out to be stale"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM metadata WHERE extractor = ? AND video_id = ?", [key for key in keys if key]
+            )
+            self._conn.commit()
+        self.stats["invalidations"] += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,108 @@
+# modules/model_cache.py
+import datetime
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+MODEL_CACHE_FILE = Path("data/model_cache.json")
+MODEL_CACHE_TTL_HOURS = 24
+MAX_MODEL_FAILURES = 3  # Setelah gagal sebanyak ini, model di-probe ulang
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """Remember which Gemini model answered last time so startup can skip probing"""
+
+    def __init__(self, path: Path = MODEL_CACHE_FILE,
+                 ttl_hours: float = MODEL_CACHE_TTL_HOURS,
+                 max_failures: int = MAX_MODEL_FAILURES):
+        self.path = Path(path)
+        self.ttl = datetime.timedelta(hours=ttl_hours)
+        self.max_failures = max_failures
+        self._state: Dict = self._read()
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict:
+        try:
+            if not self.path.exists():
+                return {}
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Failed to read model cache: {e}")
+            return {}
+
+    def _write(self):
+        try:
+            # Beberapa sesi server bisa menulis bersamaan lewat file .tmp yang sama
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix(".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._state, f, indent=2)
+                tmp_path.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write model cache: {e}")
+
+    def load(self) -> Optional[str]:
+        """Return the cached model name if it is still fresh and healthy"""
+        model_name = self._state.get("model")
+        if not model_name:
+            return None
+
+        try:
+            resolved_at = datetime.datetime.fromisoformat(self._state.get("resolved_at", ""))
+        except ValueError:
+            return None
+
+        if datetime.datetime.now() - resolved_at > self.ttl:
+            logger.info(f"Cached model {model_name} expired")
+            return None
+        if self._state.get("failures", 0) >= self.max_failures:
+            logger.info(f"Cached model {model_name} has too many failures")
+            return None
+        return model_name
+
+    def store(self, model_name: str, validated: bool = False):
+        """Persist a freshly resolved model"""
+        now = datetime.datetime.now().isoformat()
+        self._state = {
+            "model": model_name,
+            "resolved_at": now,
+            "validated_at": now if validated else None,
+            "failures": 0,
+        }
+        self._write()
+
+    def mark_ok(self, model_name: str):
+        """Record a successful real request; only touches disk when state changes"""
+        if self._state.get("model") != model_name:
+            self.store(model_name, validated=True)
+            return
+        if self._state.get("validated_at") and not self._state.get("failures"):
+            return
+        self._state["validated_at"] = datetime.datetime.now().isoformat()
+        self._state["failures"] = 0
+        self._write()
+
+    def record_failure(self, model_name: str) -> int:
+        """Increase the failure counter for the cached model and return it"""
+        if self._state.get("model") != model_name:
+            return self.max_failures
+        self._state["failures"] = self._state.get("failures", 0) + 1
+        self._write()
+        return self._state["failures"]
+
+    def invalidate(self):
+        """Forget the cached model so the next startup probes again"""
+        self._state = {}
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove model cache: {e}")
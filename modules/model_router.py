@@ -0,0 +1,159 @@
+# modules/model_router.py
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+LATENCY_WINDOW = 50  # Jumlah request terakhir per model untuk statistik
+FAILURE_THRESHOLD = 3  # Gagal berturut-turut sebelum circuit dibuka
+BASE_BACKOFF = 2.0  # detik
+MAX_BACKOFF = 300.0
+ERROR_PENALTY = 4.0  # Seberapa berat error rate menurunkan skor model
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (pct in 0..100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ModelStats:
+    """Rolling latency/error window and circuit-breaker state for one model"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+        self.total_requests = 0
+        self.last_error: Optional[str] = None
+
+    def latencies(self) -> List[float]:
+        return [latency for latency, ok in self.samples if ok]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return percentile(self.latencies(), 50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return percentile(self.latencies(), 95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def state(self, now: float, threshold: int) -> str:
+        if self.consecutive_failures < threshold:
+            return "closed"
+        return "open" if now < self.retry_at else "half-open"
+
+
+class ModelRouter:
+    """Pick the healthiest/fastest model per request, with backoff per model"""
+
+    def __init__(self, model_names: List[str], build_model: Callable[[str], object],
+                 window: int = LATENCY_WINDOW, failure_threshold: int = FAILURE_THRESHOLD,
+                 base_backoff: float = BASE_BACKOFF, max_backoff: float = MAX_BACKOFF):
+        self.model_names = list(model_names)
+        self.build_model = build_model
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.stats: Dict[str, ModelStats] = {name: ModelStats(window) for name in self.model_names}
+        self._models: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def prefer(self, model_name: str):
+        """Move a known-good model (e.g. from the model cache) to the front"""
+        if model_name in self.model_names:
+            self.model_names.remove(model_name)
+        else:
+            self.stats[model_name] = ModelStats(LATENCY_WINDOW)
+        self.model_names.insert(0, model_name)
+
+    def model(self, model_name: str):
+        """Return a (cached) model instance for `model_name`"""
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = self.build_model(model_name)
+            return self._models[model_name]
+
+    def set_model(self, model_name: str, model):
+        with self._lock:
+            self._models[model_name] = model
+
+    def reset_models(self):
+        """Drop built instances so they are rebuilt (e.g. after the prompt changed)"""
+        with self._lock:
+            self._models.clear()
+
+    def _score(self, model_name: str, priority: int) -> Tuple:
+        stats = self.stats[model_name]
+        p50 = stats.p50
+        if p50 is None:
+            # Model yang belum pernah diukur: urutan prioritas setelah model yang sehat
+            return (1, priority)
+        return (0, p50 * (1 + ERROR_PENALTY * stats.error_rate), priority)
+
+    def candidates(self) -> List[str]:
+        """Models to try for the next request, best first"""
+        now = time.monotonic()
+        with self._lock:
+            available = [
+                (self._score(name, index), name)
+                for index, name in enumerate(self.model_names)
+                if now >= self.stats[name].retry_at
+            ]
+            if not available:
+                # Semua sedang backoff: coba yang paling cepat pulih daripada langsung gagal
+                soonest = min(self.model_names, key=lambda name: self.stats[name].retry_at)
+                return [soonest]
+        return [name for _, name in sorted(available)]
+
+    def record_success(self, model_name: str, latency: float):
+        """Record latency to first token (or to the full reply when not streaming)"""
+        with self._lock:
+            stats = self.stats[model_name]
+            stats.samples.append((latency, True))
+            stats.total_requests += 1
+            stats.consecutive_failures = 0
+            stats.retry_at = 0.0
+
+    def record_failure(self, model_name: str, error: Exception):
+        with self._lock:
+            stats = self.stats[model_name]
+            stats.samples.append((0.0, False))
+            stats.total_requests += 1
+            stats.consecutive_failures += 1
+            stats.last_error = str(error)
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (stats.consecutive_failures - 1))
+            stats.retry_at = time.monotonic() + backoff
+            if stats.consecutive_failures == self.failure_threshold:
+                logger.warning(f"Circuit opened for {model_name} after {stats.consecutive_failures} failures")
+            logger.info(f"Model {model_name} backing off for {backoff:.1f}s: {error}")
+
+    def snapshot(self) -> List[Dict]:
+        """Per-model stats for display"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model": name,
+                    "p50": self.stats[name].p50,
+                    "p95": self.stats[name].p95,
+                    "error_rate": self.stats[name].error_rate,
+                    "requests": self.stats[name].total_requests,
+                    "state": self.stats[name].state(now, self.failure_threshold),
+                    "retry_in": max(0.0, self.stats[name].retry_at - now),
+                }
+                for name in self.model_names
+            ]
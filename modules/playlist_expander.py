@@ -0,0 +1,161 @@
+# modules/playlist_expander.py
+import logging
+import queue
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PLAYLIST_PREFETCH = 32  # Entri yang boleh menunggu di antrean sebelum ekstraksi berhenti sejenak
+MAX_PLAYLIST_NESTING = 2  # Channel → tab → playlist
+NESTED_PLAYLIST_EXTRACTORS = ("YoutubeTab", "YoutubePlaylist")
+RANGE_REGEX = re.compile(r"^\s*(\d*)\s*(?:(-)\s*(\d*))?\s*$")
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+def parse_items(spec: Optional[str]) -> Optional[List[Tuple[int, Optional[int]]]]:
+    """'1-10,15,20-' → [(1, 10), (15, 15), (20, None)]; 1-based and inclusive"""
+    if not spec or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        match = RANGE_REGEX.match(part)
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"Rentang item tidak valid: '{part.strip()}'")
+        start = int(match.group(1) or 1)
+        if match.group(2):
+            end = int(match.group(3)) if match.group(3) else None
+        else:
+            end = start
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Rentang item tidak valid: '{part.strip()}'")
+        ranges.append((start, end))
+    return ranges
+
+
+class PlaylistSelection:
+    """Which playlist entries to keep: index ranges, a title regex and a maximum count"""
+
+    def __init__(self, items: Optional[str] = None, match: Optional[str] = None,
+                 max_items: Optional[int] = None):
+        self.ranges = parse_items(items)
+        self.title_regex = re.compile(match, re.IGNORECASE) if match else None
+        self.max_items = max_items
+        # Jika semua rentang tertutup, enumerasi bisa berhenti setelah indeks terakhir
+        self.last_index = (
+            max(end for _, end in self.ranges)
+            if self.ranges and all(end is not None for _, end in self.ranges) else None
+        )
+
+    def wants_index(self, index: int) -> bool:
+        if not self.ranges:
+            return True
+        return any(start <= index and (end is None or index <= end) for start, end in self.ranges)
+
+    def matches(self, entry: Dict) -> bool:
+        if self.title_regex and not self.title_regex.search(entry.get('title') or ''):
+            return False
+        return True
+
+    def select(self, entries: Iterable[Dict]) -> Iterator[Tuple[int, Dict]]:
+        """(1-based playlist index, entry) for the selected entries, stopping as early as possible"""
+        kept = 0
+        for index, entry in enumerate(entries, 1):
+            if self.last_index is not None and index > self.last_index:
+                return
+            if not self.wants_index(index) or not self.matches(entry):
+                continue
+            yield index, entry
+            kept += 1
+            if self.max_items and kept >= self.max_items:
+                return
+
+
+def iter_flat_entries(ydl, url: str, depth: int = 0) -> Iterator[Dict]:
+    """Video entries of a playlist/channel without resolving each video
+
+    extract_info(process=False) returns the extractor's own result, whose
+    `entries` is a generator that fetches further pages only when iterated,
+    so the first entries arrive before a 2,000-video channel is enumerated.
+    """
+    info = ydl.extract_info(url, download=False, process=False)
+    # Hasil berupa redirect ke extractor lain (mis. URL pendek)
+    for _ in range(3):
+        if not info or info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    if not info:
+        return
+    if info.get('_type') != 'playlist':
+        yield info
+        return
+    yield from _iter_entries(ydl, info.get('entries') or [], depth)
+
+
+def _iter_entries(ydl, entries: Iterable[Dict], depth: int) -> Iterator[Dict]:
+    for entry in entries:
+        if not entry:
+            continue
+        if depth < MAX_PLAYLIST_NESTING and entry.get('_type') == 'playlist':
+            yield from _iter_entries(ydl, entry.get('entries') or [], depth + 1)
+        elif depth < MAX_PLAYLIST_NESTING and entry.get('ie_key') in NESTED_PLAYLIST_EXTRACTORS:
+            # Tab channel (Videos, Shorts, ...) atau playlist di dalam channel
+            yield from iter_flat_entries(ydl, entry['url'], depth + 1)
+        else:
+            yield entry
+
+
+def entry_url(entry: Dict) -> Optional[str]:
+    return entry.get('webpage_url') or entry.get('url')
+
+
+def entry_key(entry: Dict) -> Optional[Tuple[str, str]]:
+    """(extractor, video id) of a flat entry, matching metadata_cache.url_key"""
+    extractor = entry.get('ie_key') or entry.get('extractor_key')
+    if extractor and entry.get('id'):
+        return extractor, str(entry['id'])
+    return None
+
+
+def prefetch(iterable: Iterable, maxsize: int = PLAYLIST_PREFETCH) -> Iterator:
+    """Produce `iterable` on a background thread into a bounded queue
+
+    The producer blocks when `maxsize` items are waiting, so enumeration
+    stays just ahead of the consumer. An exception in the producer is
+    re-raised in the consumer; closing the generator stops the producer.
+    """
+    items: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=produce, name="mio-playlist", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,115 @@
+# modules/postprocess_pool.py
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+POSTPROCESS_WORKERS = os.cpu_count() or 2  # Satu proses ffmpeg per core
+STAGING_DIRNAME = ".staging"  # Subfolder output tempat unduhan menunggu ffmpeg
+
+# Tahap yang dicatat per unduhan; postprocess-wait = antre menunggu core bebas
+EXTRACT = "extract"
+DOWNLOAD = "download"
+POSTPROCESS_WAIT = "postprocess-wait"
+POSTPROCESS = "postprocess"
+STAGES = (EXTRACT, DOWNLOAD, POSTPROCESS_WAIT, POSTPROCESS)
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimings:
+    """Thread-safe durations per pipeline stage, to see which stage limits a batch"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self.started = time.monotonic()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._durations[stage].append(seconds)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, time.monotonic() - start)
+
+    def summary(self, workers: Optional[Dict[str, int]] = None) -> Dict[str, Dict]:
+        """count/total/mean/max per stage, plus `busy` (share of the stage's worker time used)
+
+        `workers` maps a stage to how many of them can run at once; a
+        stage close to 100% busy is the bottleneck of the batch.
+        """
+        wall = max(time.monotonic() - self.started, 1e-9)
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self._durations.items()}
+        result = {}
+        for stage in (*STAGES, *sorted(set(durations) - set(STAGES))):
+            values = durations.get(stage)
+            if not values:
+                continue
+            total = sum(values)
+            stage_workers = (workers or {}).get(stage)
+            result[stage] = {
+                "count": len(values),
+                "total": total,
+                "mean": total / len(values),
+                "max": max(values),
+                "busy": total / (wall * stage_workers) if stage_workers else None,
+            }
+        return result
+
+
+def extract_audio(path: str, codec: str, quality: Optional[str], info: Optional[Dict] = None) -> str:
+    """Convert a staged download with yt-dlp's FFmpegExtractAudioPP; returns the new file path"""
+    # Impor di sini: modul ini dimuat juga saat ffmpeg tidak dipakai
+    from yt_dlp.postprocessor import FFmpegExtractAudioPP
+
+    # yt-dlp hanya menerima angka ("320"), bukan "320k"
+    quality = str(quality).rstrip('kK') if quality else None
+    postprocessor = FFmpegExtractAudioPP(preferredcodec=codec, preferredquality=quality)
+    info = {**(info or {}), 'filepath': path, 'ext': os.path.splitext(path)[1][1:]}
+    files_to_delete, info = postprocessor.run(info)
+    for old_file in files_to_delete:
+        if os.path.exists(old_file) and old_file != info['filepath']:
+            os.remove(old_file)
+    return info['filepath']
+
+
+class PostprocessPool:
+    """Run CPU-bound post-processing (ffmpeg) off the download threads
+
+    A download hands its staged file to the pool and frees its network
+    slot, so transcoding one file overlaps with downloading the next.
+    Threads are enough here: each one waits on an ffmpeg child process.
+    """
+
+    def __init__(self, workers: int = POSTPROCESS_WORKERS, timings: Optional[StageTimings] = None):
+        self.workers = max(1, workers)
+        self.timings = timings or StageTimings()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mio-postprocess")
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        queued = time.monotonic()
+
+        def run():
+            self.timings.record(POSTPROCESS_WAIT, time.monotonic() - queued)
+            with self.timings.measure(POSTPROCESS):
+                return func(*args, **kwargs)
+
+        return self._executor.submit(run)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
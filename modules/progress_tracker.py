@@ -0,0 +1,293 @@
+# modules/progress_tracker.py
+import datetime
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from rich.console import Console
+from rich.filesize import decimal
+from rich.markup import escape
+from rich.progress import BarColumn, Progress, SpinnerColumn, TaskID, TextColumn, TimeElapsedColumn
+
+PROGRESS_REFRESH_HZ = 4  # Tampilan diperbarui 4x per detik, berapa pun jumlah callback yt-dlp
+PROGRESS_EXPORT_INTERVAL = 5.0  # Detik antar penulisan file JSON/Prometheus
+METRIC_PREFIX = "mio_download"
+
+# Status per unduhan
+DOWNLOADING = "downloading"
+PROCESSING = "processing"  # File selesai diunduh, yt-dlp sedang merge/post-process
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+class _Download:
+    def __init__(self, download_id: int, name: str, url: Optional[str]):
+        self.id = download_id
+        self.name = name
+        self.url = url
+        self.status = DOWNLOADING
+        self.filename: Optional[str] = None
+        self.base_bytes = 0  # Byte file sebelumnya (video+audio diunduh sebagai dua file)
+        self.downloaded = 0
+        self.total: Optional[int] = None
+        self.speed: Optional[float] = None
+        self.eta: Optional[float] = None
+        self.started = time.time()
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id, "name": self.name, "url": self.url, "status": self.status,
+            "downloaded_bytes": self.downloaded, "total_bytes": self.total,
+            "speed": self.speed, "eta": self.eta, "elapsed": time.time() - self.started,
+        }
+
+
+class ProgressTracker:
+    """Thread-safe progress of every running download, fed by yt-dlp progress hooks
+
+    `update` only copies a few numbers under a lock, so it is cheap enough
+    to run on every yt-dlp callback; rendering and exporting read
+    snapshots at their own, fixed rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._downloads: Dict[int, _Download] = {}
+        self._finished_bytes = 0  # Byte dari unduhan yang sudah selesai (counter Prometheus)
+        self._finished = {DONE: 0, FAILED: 0}
+
+    def start(self, name: str, url: Optional[str] = None) -> int:
+        download_id = next(self._ids)
+        with self._lock:
+            self._downloads[download_id] = _Download(download_id, name, url)
+        return download_id
+
+    def update(self, download_id: int, d: Dict):
+        """Apply one yt-dlp progress hook dict"""
+        with self._lock:
+            download = self._downloads.get(download_id)
+            if download is None:
+                return
+            filename = d.get('filename')
+            if filename != download.filename:
+                # File berikutnya dari unduhan yang sama: lanjutkan hitungan dari file sebelumnya
+                if download.filename is not None:
+                    download.base_bytes = download.downloaded
+                download.filename = filename
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            download.downloaded = download.base_bytes + (d.get('downloaded_bytes') or 0)
+            download.total = download.base_bytes + int(total) if total else None
+            download.speed = d.get('speed')
+            download.eta = d.get('eta')
+            if d.get('status') == 'finished':
+                download.status = PROCESSING
+                download.speed = download.eta = None
+            elif d.get('status') == 'downloading':
+                download.status = DOWNLOADING
+
+    def finish(self, download_id: int, ok: bool = True):
+        with self._lock:
+            download = self._downloads.pop(download_id, None)
+            if download is None:
+                return
+            self._finished_bytes += download.downloaded
+            self._finished[DONE if ok else FAILED] += 1
+
+    def snapshot(self) -> Dict:
+        """Aggregate throughput/ETA plus per-download stats, taken under one lock"""
+        with self._lock:
+            downloads = [download.as_dict() for download in self._downloads.values()]
+            finished_bytes = self._finished_bytes
+            finished = dict(self._finished)
+        speed = sum(download["speed"] or 0 for download in downloads)
+        remaining = sum(
+            download["total_bytes"] - download["downloaded_bytes"]
+            for download in downloads if download["total_bytes"] and download["status"] == DOWNLOADING
+        )
+        return {
+            "timestamp": time.time(),
+            "active": len(downloads),
+            "done": finished[DONE],
+            "failed": finished[FAILED],
+            "bytes_downloaded": finished_bytes + sum(download["downloaded_bytes"] for download in downloads),
+            "speed": speed,
+            "eta": remaining / speed if speed else None,
+            "downloads": downloads,
+        }
+
+
+def _write_atomic(path: Path, text: str):
+    # Ditulis ke file sementara lalu diganti, supaya pembaca tidak melihat file setengah jadi
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.write_text(text, encoding='utf-8')
+    os.replace(temp_path, path)
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def to_prometheus(snapshot: Dict) -> str:
+    """Snapshot in the Prometheus text exposition format (for node_exporter's textfile collector)"""
+    lines = [
+        f"# HELP {METRIC_PREFIX}s_active Downloads currently running.",
+        f"# TYPE {METRIC_PREFIX}s_active gauge",
+        f"{METRIC_PREFIX}s_active {snapshot['active']}",
+        f"# HELP {METRIC_PREFIX}s_finished_total Downloads finished since start, by result.",
+        f"# TYPE {METRIC_PREFIX}s_finished_total counter",
+        f'{METRIC_PREFIX}s_finished_total{{result="done"}} {snapshot["done"]}',
+        f'{METRIC_PREFIX}s_finished_total{{result="failed"}} {snapshot["failed"]}',
+        f"# HELP {METRIC_PREFIX}_bytes_total Bytes downloaded since start.",
+        f"# TYPE {METRIC_PREFIX}_bytes_total counter",
+        f"{METRIC_PREFIX}_bytes_total {snapshot['bytes_downloaded']}",
+        f"# HELP {METRIC_PREFIX}_speed_bytes Aggregate download speed in bytes per second.",
+        f"# TYPE {METRIC_PREFIX}_speed_bytes gauge",
+        f"{METRIC_PREFIX}_speed_bytes {snapshot['speed']:.0f}",
+        f"# HELP {METRIC_PREFIX}_eta_seconds Estimated seconds until running downloads finish.",
+        f"# TYPE {METRIC_PREFIX}_eta_seconds gauge",
+        f"{METRIC_PREFIX}_eta_seconds {snapshot['eta'] if snapshot['eta'] is not None else 'NaN'}",
+        f"# HELP {METRIC_PREFIX}_progress_ratio Completed fraction of each running download.",
+        f"# TYPE {METRIC_PREFIX}_progress_ratio gauge",
+    ]
+    for download in snapshot['downloads']:
+        if download['total_bytes']:
+            ratio = download['downloaded_bytes'] / download['total_bytes']
+            lines.append(f'{METRIC_PREFIX}_progress_ratio{{id="{download["id"]}",name="{_label(download["name"])}"}} {ratio:.4f}')
+    return "\n".join(lines) + "\n"
+
+
+def write_json(path: Path, snapshot: Dict):
+    _write_atomic(path, json.dumps(snapshot, ensure_ascii=False, indent=2))
+
+
+def write_prometheus(path: Path, snapshot: Dict):
+    _write_atomic(path, to_prometheus(snapshot))
+
+
+def _format_eta(seconds: Optional[float]) -> str:
+    return str(datetime.timedelta(seconds=int(seconds))) if seconds is not None else "-:--:--"
+
+
+class ProgressRenderer:
+    """Rich view of a ProgressTracker, refreshed at a fixed rate on its own thread
+
+    One row per running download plus counter rows added with
+    `add_counter` (e.g. the batch total, which also shows the aggregate
+    speed and ETA). Optionally writes the snapshot as JSON and/or a
+    Prometheus textfile every `export_interval` seconds.
+    """
+
+    def __init__(self, tracker: ProgressTracker, console: Optional[Console] = None,
+                 refresh_hz: float = PROGRESS_REFRESH_HZ, json_path: Optional[str] = None,
+                 prometheus_path: Optional[str] = None, export_interval: float = PROGRESS_EXPORT_INTERVAL):
+        self.tracker = tracker
+        self.interval = 1.0 / max(refresh_hz, 0.5)
+        self.json_path = Path(json_path) if json_path else None
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        self.export_interval = export_interval
+        self.progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.fields[info]}"),
+            TimeElapsedColumn(),
+            console=console,
+            refresh_per_second=refresh_hz,
+        )
+        self._rows: Dict[int, TaskID] = {}  # id unduhan → baris rich
+        self._counters: Dict[TaskID, bool] = {}  # baris counter → tampilkan kecepatan agregat
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_export = 0.0
+
+    def add_counter(self, description: str, total: Optional[float] = None, aggregate: bool = False) -> TaskID:
+        """Row counted with progress.advance/update; `aggregate` adds total speed and ETA"""
+        task_id = self.progress.add_task(description, total=total, info="")
+        self._counters[task_id] = aggregate
+        return task_id
+
+    def __enter__(self) -> "ProgressRenderer":
+        self.progress.start()
+        self._thread = threading.Thread(target=self._run, name="mio-progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sync(export=True)
+        self.progress.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.debug(f"Progress refresh failed: {e}")
+
+    def sync(self, export: bool = False):
+        """Copy one tracker snapshot into the rich rows (and export it when due)"""
+        snapshot = self.tracker.snapshot()
+        active = set()
+        for download in snapshot['downloads']:
+            active.add(download['id'])
+            task_id = self._rows.get(download['id'])
+            if task_id is None:
+                task_id = self._rows[download['id']] = self.progress.add_task("", total=None, info="")
+            self.progress.update(task_id, **self._download_row(download))
+        for download_id in set(self._rows) - active:
+            self.progress.remove_task(self._rows.pop(download_id))
+
+        tasks = {task.id: task for task in self.progress.tasks}
+        for task_id, aggregate in self._counters.items():
+            task = tasks.get(task_id)
+            if task is None:
+                continue
+            info = f"{task.completed:.0f}/{task.total:.0f}" if task.total is not None else f"{task.completed:.0f}"
+            if aggregate:
+                info += f" • {decimal(int(snapshot['speed']))}/s • ETA {_format_eta(snapshot['eta'])}"
+            self.progress.update(task_id, info=info)
+
+        if export or time.monotonic() - self._last_export >= self.export_interval:
+            self._last_export = time.monotonic()
+            self._export(snapshot)
+
+    @staticmethod
+    def _download_row(download: Dict) -> Dict:
+        name = escape(download['name'] or '')
+        if download['status'] == PROCESSING:
+            description = f"✓ Processing: [bold green]{name}[/bold green]"
+        else:
+            description = f"Downloading: [bold green]{name}[/bold green]"
+        size = decimal(download['downloaded_bytes'])
+        if download['total_bytes']:
+            size += f"/{decimal(download['total_bytes'])}"
+        info = size
+        if download['speed']:
+            info += f" • {decimal(int(download['speed']))}/s • ETA {_format_eta(download['eta'])}"
+        return {
+            "description": description,
+            "completed": download['downloaded_bytes'],
+            "total": download['total_bytes'],
+            "info": info,
+        }
+
+    def _export(self, snapshot: Dict):
+        try:
+            if self.json_path:
+                write_json(self.json_path, snapshot)
+            if self.prometheus_path:
+                write_prometheus(self.prometheus_path, snapshot)
+        except OSError as e:
+            logger.warning(f"Failed to export download progress: {e}")
@@ -0,0 +1,211 @@
+# modules/rate_limiter.py
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+QUOTA_DB = Path("data/quota.db")
+QUOTA_MAX_WAIT = 120.0  # detik; setelah ini request tetap dikirim daripada gagal
+QUOTA_PENALTY_SECONDS = 30.0  # Jeda bersama setelah API menolak karena kuota
+
+logger = logging.getLogger(__name__)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """True for 429 / ResourceExhausted style errors from the API"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit"))
+
+
+class QuotaLimiter:
+    """Requests/min and tokens/min token buckets shared by every process on this machine
+
+    Bucket levels live in a small SQLite file and are updated inside
+    `BEGIN IMMEDIATE` transactions, so the chat, batch jobs and the server
+    draw from the same budget. When a bucket is empty the caller sleeps
+    until it refills instead of getting an error.
+    """
+
+    def __init__(self, path: Path = QUOTA_DB, name: str = "default",
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_wait: float = QUOTA_MAX_WAIT):
+        self.path = Path(path)
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.stats = {"requests": 0, "waits": 0, "wait_seconds": 0.0, "overdue": 0, "penalties": 0}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # isolation_level=None: transaksi diatur manual dengan BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, "
+                "updated REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0)"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+
+    def _capacity(self) -> tuple:
+        return (self.requests_per_minute or float("inf"), self.tokens_per_minute or float("inf"))
+
+    def _load(self, now: float) -> Dict:
+        """Read and refill this bucket; must run inside a transaction"""
+        max_requests, max_tokens = self._capacity()
+        row = self._conn.execute(
+            "SELECT requests, tokens, updated, blocked_until FROM buckets WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row is None:
+            return {"requests": max_requests, "tokens": max_tokens, "blocked_until": 0.0}
+        elapsed = max(0.0, now - row[2])
+        return {
+            "requests": min(max_requests, row[0] + elapsed * max_requests / 60),
+            "tokens": min(max_tokens, row[1] + elapsed * max_tokens / 60),
+            "blocked_until": row[3],
+        }
+
+    def _save(self, state: Dict, now: float):
+        # inf tidak bisa disimpan di SQLite REAL secara portabel; simpan kapasitas besar
+        self._conn.execute(
+            "INSERT OR REPLACE INTO buckets (name, requests, tokens, updated, blocked_until) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.name, min(state["requests"], 1e12), min(state["tokens"], 1e12), now, state["blocked_until"])
+        )
+
+    def _transaction(self, func):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(time.time())
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Take one request and `tokens` tokens, sleeping until they are available
+
+        Returns the seconds spent waiting. A request larger than the whole
+        per-minute token budget is clamped so it can still go through.
+        """
+        if not self.enabled:
+            return 0.0
+        tokens = min(tokens, self._capacity()[1])
+        started = time.monotonic()
+        slept = False
+
+        def take(now: float) -> float:
+            state = self._load(now)
+            wait = max(0.0, state["blocked_until"] - now)
+            if state["requests"] < 1 and self.requests_per_minute:
+                wait = max(wait, (1 - state["requests"]) * 60 / self.requests_per_minute)
+            if state["tokens"] < tokens and self.tokens_per_minute:
+                wait = max(wait, (tokens - state["tokens"]) * 60 / self.tokens_per_minute)
+            if wait <= 0:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                self._save(state, now)
+            return wait
+
+        while True:
+            wait = self._transaction(take)
+            waited = time.monotonic() - started
+            if wait <= 0:
+                break
+            if waited + wait > self.max_wait:
+                # Lebih baik mencoba dan mungkin kena 429 daripada menggantung selamanya
+                self.stats["overdue"] += 1
+                logger.warning(f"Quota wait for {self.name} exceeded {self.max_wait:.0f}s, sending anyway")
+                break
+            time.sleep(wait)
+            slept = True
+
+        waited = time.monotonic() - started if slept else 0.0
+        self.stats["requests"] += 1
+        if slept:
+            self.stats["waits"] += 1
+            self.stats["wait_seconds"] += waited
+            logger.info(f"Quota {self.name}: waited {waited:.2f}s for {tokens} tokens")
+        return waited
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take budget only if it is available right now (for optional requests)"""
+        if not self.enabled:
+            return True
+
+        def take(now: float) -> bool:
+            state = self._load(now)
+            if state["blocked_until"] > now or state["requests"] < 1 or state["tokens"] < tokens:
+                return False
+            state["requests"] -= 1
+            state["tokens"] -= tokens
+            self._save(state, now)
+            return True
+
+        if self._transaction(take):
+            self.stats["requests"] += 1
+            return True
+        return False
+
+    def settle(self, reserved: int, actual: int):
+        """Correct the token bucket once the real size of a request is known"""
+        if not self.enabled or not self.tokens_per_minute or actual == reserved:
+            return
+
+        def adjust(now: float):
+            state = self._load(now)
+            state["tokens"] = min(self._capacity()[1], state["tokens"] + reserved - actual)
+            self._save(state, now)
+
+        self._transaction(adjust)
+
+    def penalize(self, seconds: float = QUOTA_PENALTY_SECONDS):
+        """Pause every process after the API reported that the quota ran out"""
+        if not self.enabled:
+            return
+
+        def block(now: float):
+            state = self._load(now)
+            state["requests"] = min(state["requests"], 0.0)
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            self._save(state, now)
+
+        self._transaction(block)
+        self.stats["penalties"] += 1
+        logger.warning(f"Quota {self.name} exhausted upstream, pausing requests for {seconds:.0f}s")
+
+    def usage(self) -> Dict:
+        """Current budget usage across all processes plus this process' counters"""
+        result = {
+            **self.stats,
+            "enabled": self.enabled,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+        }
+        if not self.enabled:
+            return result
+        state = self._transaction(self._load)
+        max_requests, max_tokens = self._capacity()
+        now = time.time()
+        result.update(
+            requests_used=max_requests - state["requests"] if self.requests_per_minute else None,
+            tokens_used=max_tokens - state["tokens"] if self.tokens_per_minute else None,
+            blocked_for=max(0.0, state["blocked_until"] - now),
+        )
+        return result
+
+    def close(self):
+        if self._conn:
+            with self._lock:
+                self._conn.close()
@@ -0,0 +1,159 @@
+# modules/response_cache.py
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+RESPONSE_CACHE_DB = Path("data/response_cache.db")
+MEMORY_CACHE_SIZE = 256  # Jumlah jawaban di LRU memori
+DISK_CACHE_MAX_BYTES = 20 * 1024 * 1024
+RESPONSE_CACHE_TTL_HOURS = 24 * 7
+
+logger = logging.getLogger(__name__)
+
+TRAILING_PUNCTUATION_REGEX = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    prompt = " ".join(prompt.lower().split())
+    return TRAILING_PUNCTUATION_REGEX.sub("", prompt)
+
+
+def make_cache_key(prompt: str, system_prompt: str, model_name: str, generation_config: Dict) -> str:
+    """Key a reply by normalized prompt, persona hash, model and generation config"""
+    payload = json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "system": hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+        "model": model_name,
+        "config": generation_config,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of a persistent SQLite store with TTL and size cap"""
+
+    def __init__(self, path: Path = RESPONSE_CACHE_DB, memory_size: int = MEMORY_CACHE_SIZE,
+                 max_disk_bytes: int = DISK_CACHE_MAX_BYTES,
+                 ttl_hours: float = RESPONSE_CACHE_TTL_HOURS):
+        self.path = Path(path)
+        self.memory_size = memory_size
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl_hours * 3600
+        self.enabled = True
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, "
+            "last_access REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+        self._conn.commit()
+
+    def _remember(self, key: str, response: str, created: float):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached reply or None; counts hits and misses"""
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and now - cached[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return cached[0]
+            if cached:
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, response: str):
+        """Store a reply in memory and on disk, evicting old entries past the size cap"""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._remember(key, response, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, now, now, size)
+            )
+            self.stats["stores"] += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        expired = self._conn.execute(
+            "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+        ).rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        evicted = 0
+        while total > self.max_disk_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if not row:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._memory.pop(row[0], None)
+            total -= row[1]
+            evicted += 1
+        self.stats["evictions"] += expired + evicted
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def summary(self) -> Dict:
+        """Counters plus current sizes, for the /cache command"""
+        with self._lock:
+            entries, disk_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "disk_entries": entries,
+            "disk_bytes": disk_bytes,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
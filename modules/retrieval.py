@@ -0,0 +1,165 @@
+# modules/retrieval.py
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+try:
+    import numpy as np
+except ImportError:  # NumPy opsional; tanpa NumPy skor dihitung dengan dict biasa
+    np = None
+
+RETRIEVAL_TOP_K = 4
+POSTINGS_SCAN_LIMIT = 2000  # Posting terbaru per kata yang dinilai saat query
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_WORD_LENGTH = 2
+
+logger = logging.getLogger(__name__)
+
+WORD_REGEX = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "yang dan di ke dari itu ini apa ada untuk dengan atau juga saya aku kamu anda kita "
+    "tidak bisa akan sudah lagi pada dalam jadi kalau karena tapi seperti ya nya "
+    "the a an is are to of and in on for it this that what how why".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        word for word in WORD_REGEX.findall(text.lower())
+        if len(word) >= MIN_WORD_LENGTH and word not in STOPWORDS
+    ]
+
+
+class RetrievalIndex:
+    """In-memory BM25 inverted index over conversation turns
+
+    Each word keeps compact arrays of (turn id, weight); the BM25 length
+    normalization is applied when a turn is added, with the average length
+    at that moment, so queries only sum precomputed weights. Very common
+    words only score their newest `POSTINGS_SCAN_LIMIT` turns, which keeps
+    queries in the low milliseconds at 100k turns.
+    """
+
+    def __init__(self, scan_limit: int = POSTINGS_SCAN_LIMIT):
+        self.scan_limit = scan_limit
+        self.entries: List[Dict] = []
+        self._ids: Dict[str, "array"] = {}
+        self._weights: Dict[str, "array"] = {}
+        self._seen: Set[str] = set()
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+        self.build_seconds: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _entry_key(entry: Dict) -> str:
+        return f"{entry.get('timestamp', '')}|{entry.get('user', '')[:64]}"
+
+    def add(self, entry: Dict) -> bool:
+        """Index one turn; duplicates (same timestamp and message) are ignored"""
+        words = tokenize(f"{entry.get('user', '')} {entry.get('mio', '')}")
+        if not words:
+            return False
+        key = self._entry_key(entry)
+        counts = Counter(words)
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            doc_id = len(self.entries)
+            self.entries.append(entry)
+            self._total_length += len(words)
+            average = self._total_length / len(self.entries)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(words) / average)
+            for word, tf in counts.items():
+                if word not in self._ids:
+                    self._ids[word] = array('i')
+                    self._weights[word] = array('f')
+                self._ids[word].append(doc_id)
+                self._weights[word].append(tf * (BM25_K1 + 1) / (tf + norm))
+        return True
+
+    def build(self, entries: Iterable[Dict]) -> int:
+        """Index existing history and mark the index ready"""
+        started = time.perf_counter()
+        added = 0
+        try:
+            for entry in entries:
+                added += self.add(entry)
+        finally:
+            self.build_seconds = time.perf_counter() - started
+            self.ready.set()
+        logger.info(f"Retrieval index: {added} turns indexed in {self.build_seconds:.2f}s")
+        return added
+
+    def build_async(self, entries_factory: Callable[[], Iterable[Dict]]) -> threading.Thread:
+        """Build in a daemon thread so startup does not wait for old history"""
+        def run():
+            try:
+                self.build(entries_factory())
+            except Exception as e:
+                logger.error(f"Retrieval index build failed: {e}")
+
+        thread = threading.Thread(target=run, name="mio-retrieval", daemon=True)
+        thread.start()
+        return thread
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K,
+               exclude: Optional[Set[str]] = None) -> List[Dict]:
+        """Top-k turns for `query`, best first; [] while the index is still building"""
+        if not self.ready.is_set():
+            return []
+        terms = set(tokenize(query))
+        exclude = exclude or set()
+        with self._lock:
+            total = len(self.entries)
+            postings = []
+            for term in terms:
+                ids = self._ids.get(term)
+                if not ids:
+                    continue
+                df = len(ids)
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                start = max(0, df - self.scan_limit)
+                postings.append((idf, ids, self._weights[term], start))
+            if not postings:
+                return []
+
+            if np is not None:
+                scores = np.zeros(total, dtype=np.float32)
+                for idf, ids, weights, start in postings:
+                    # Salin potongannya: array yang sedang di-share buffernya tidak bisa ditambah
+                    id_view = np.frombuffer(ids[start:], dtype=np.int32)
+                    weight_view = np.frombuffer(weights[start:], dtype=np.float32)
+                    # Satu turn muncul sekali per kata, jadi indeks tidak berulang
+                    scores[id_view] += idf * weight_view
+                candidates = min(total, k + len(exclude))
+                top = np.argpartition(-scores, candidates - 1)[:candidates]
+                ranked = sorted(((float(scores[i]), int(i)) for i in top if scores[i] > 0), reverse=True)
+            else:
+                score_map: Dict[int, float] = {}
+                for idf, ids, weights, start in postings:
+                    get = score_map.get
+                    for doc_id, weight in zip(ids[start:], weights[start:]):
+                        score_map[doc_id] = get(doc_id, 0.0) + idf * weight
+                ranked = heapq.nlargest(k + len(exclude), ((score, doc_id) for doc_id, score in score_map.items()))
+
+            results = []
+            for score, doc_id in ranked:
+                entry = self.entries[doc_id]
+                if entry.get("timestamp") in exclude:
+                    continue
+                results.append({**entry, "score": score})
+                if len(results) >= k:
+                    break
+        return results
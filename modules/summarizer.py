@@ -0,0 +1,164 @@
+# modules/summarizer.py
+import datetime
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional
+
+from modules.context_builder import estimate_tokens
+from modules.rate_limiter import QuotaLimiter
+
+IDLE_SECONDS = 60  # User dianggap idle setelah sekian detik tanpa aktivitas
+SPAN_TURNS = 20  # Jumlah giliran yang diringkas sekaligus
+KEEP_RECENT_TURNS = 10  # Giliran terbaru yang selalu dibiarkan mentah
+MAX_CALLS_PER_HOUR = 10
+POLL_INTERVAL = 5.0
+REQUEST_TIMEOUT = 60
+SUMMARY_OUTPUT_TOKENS = 300  # Perkiraan token ringkasan untuk reservasi kuota
+
+SUMMARY_PROMPT = (
+    "Ringkas potongan percakapan antara User dan Mio berikut menjadi maksimal "
+    "5 poin singkat dalam bahasa Indonesia. Fokus pada topik, pertanyaan penting, "
+    "jawaban kunci, dan preferensi user. Jangan menambahkan informasi baru.\n\n"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCompactor:
+    """Background thread that folds older raw turns into stored summaries
+
+    The worker only runs while the chat is idle and never holds the input
+    loop. Each summary call takes budget from the shared `quota` without
+    waiting for it, so compaction never eats into the budget interactive
+    turns are queued for; `max_calls_per_hour` is an extra cap on top.
+    """
+
+    def __init__(self, store, model_getter: Callable, idle_seconds: float = IDLE_SECONDS,
+                 span_turns: int = SPAN_TURNS, keep_recent_turns: int = KEEP_RECENT_TURNS,
+                 max_calls_per_hour: int = MAX_CALLS_PER_HOUR,
+                 poll_interval: float = POLL_INTERVAL, quota: Optional[QuotaLimiter] = None):
+        self.store = store
+        self.model_getter = model_getter
+        self.quota = quota
+        self.idle_seconds = idle_seconds
+        self.span_turns = span_turns
+        self.keep_recent_turns = keep_recent_turns
+        self.max_calls_per_hour = max_calls_per_hour
+        self.poll_interval = poll_interval
+
+        self._last_activity = time.monotonic()
+        self._drained = False  # Tidak ada yang perlu diringkas sejak aktivitas terakhir
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self._calls: Deque[float] = deque()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.summaries_written = 0
+        self.quota_skips = 0
+
+    # --- Lifecycle ------------------------------------------------------
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="mio-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    # --- Activity tracking ----------------------------------------------
+
+    def touch(self):
+        """Mark user activity; compaction waits until the chat is idle again"""
+        self._last_activity = time.monotonic()
+        self._drained = False
+
+    @contextmanager
+    def busy(self):
+        """Keep the worker quiet while a chat request is in flight"""
+        with self._busy_lock:
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._busy_lock:
+                self._busy -= 1
+            self.touch()
+
+    def is_idle(self) -> bool:
+        return self._busy == 0 and time.monotonic() - self._last_activity >= self.idle_seconds
+
+    def _can_call(self) -> bool:
+        cutoff = time.monotonic() - 3600
+        while self._calls and self._calls[0] < cutoff:
+            self._calls.popleft()
+        return len(self._calls) < self.max_calls_per_hour
+
+    # --- Work -----------------------------------------------------------
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            if self._drained or not self.is_idle() or not self._can_call():
+                continue
+            try:
+                skips = self.quota_skips
+                # Dilewati karena kuota bukan berarti sudah habis yang perlu diringkas
+                if not self.compact_once() and self.quota_skips == skips:
+                    self._drained = True
+            except Exception as e:
+                logger.warning(f"History compaction failed: {e}")
+
+    def pending_span(self) -> List[Dict]:
+        """Return the oldest unsummarized span, or [] if there is not enough yet"""
+        entries = list(self.store.iter_entries(since=self.store.summarized_until()))
+        eligible = entries[:max(0, len(entries) - self.keep_recent_turns)]
+        if len(eligible) < self.span_turns:
+            return []
+        return eligible[:self.span_turns]
+
+    def compact_once(self) -> bool:
+        """Summarize one span of old turns; True if a summary was stored
+
+        Returns False without calling the model (and counts a quota skip)
+        when the shared quota has no room for the request right now.
+        """
+        span = self.pending_span()
+        model = self.model_getter()
+        if not span or model is None:
+            return False
+
+        transcript = "\n".join(
+            f"User: {entry.get('user', '')}\nMio: {entry.get('mio', '')}" for entry in span
+        )
+        prompt = SUMMARY_PROMPT + transcript
+        reserved = estimate_tokens(prompt) + SUMMARY_OUTPUT_TOKENS
+        if self.quota and not self.quota.try_acquire(reserved):
+            self.quota_skips += 1
+            logger.debug("Skipping history compaction: shared quota is busy")
+            return False
+        self._calls.append(time.monotonic())
+        response = model.generate_content(prompt, request_options={"timeout": REQUEST_TIMEOUT})
+        text = response.text.strip()
+        if self.quota:
+            self.quota.settle(reserved, estimate_tokens(prompt) + estimate_tokens(text))
+        if not text:
+            return False
+
+        self.store.append_summary({
+            "start": span[0].get("timestamp", ""),
+            "end": span[-1].get("timestamp", ""),
+            "turns": len(span),
+            "summary": text,
+            "tokens": estimate_tokens(text),
+            "created": datetime.datetime.now().isoformat(),
+        })
+        self.summaries_written += 1
+        logger.info(f"Compacted {len(span)} turns up to {span[-1].get('timestamp', '')}")
+        return True
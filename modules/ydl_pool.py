@@ -0,0 +1,88 @@
+# modules/ydl_pool.py
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import yt_dlp
+
+# Opsi yang diganti per unduhan; tidak ikut menentukan instance mana yang dipakai ulang
+PER_DOWNLOAD_OPTIONS = ("outtmpl", "progress_hooks", "postprocessor_hooks")
+
+logger = logging.getLogger(__name__)
+
+
+class PooledYDL:
+    """A YoutubeDL plus the hook of whichever download currently holds it"""
+
+    def __init__(self, options: Dict):
+        self.progress_hook: Optional[Callable[[Dict], None]] = None
+        self.postprocessor_hook: Optional[Callable[[Dict], None]] = None
+        options = {key: value for key, value in options.items() if key not in PER_DOWNLOAD_OPTIONS}
+        self.ydl = yt_dlp.YoutubeDL({
+            **options,
+            'progress_hooks': [self._on_progress],
+            'postprocessor_hooks': [self._on_postprocess],
+        })
+
+    def _on_progress(self, d: Dict):
+        if self.progress_hook:
+            self.progress_hook(d)
+
+    def _on_postprocess(self, d: Dict):
+        if self.postprocessor_hook:
+            self.postprocessor_hook(d)
+
+    def set_outtmpl(self, outtmpl: str):
+        # yt-dlp membaca params['outtmpl'] setiap kali nama file dibuat
+        self.ydl.params['outtmpl'] = {'default': outtmpl}
+
+
+def options_signature(options: Dict) -> str:
+    return json.dumps(
+        {key: value for key, value in options.items() if key not in PER_DOWNLOAD_OPTIONS},
+        sort_keys=True, default=repr
+    )
+
+
+class YDLPool:
+    """Reuse YoutubeDL instances (cookies, HTTP connections, extractor state) across downloads
+
+    Instances are grouped by their options, minus the per-download ones,
+    and each one is lent to a single thread at a time.
+    """
+
+    def __init__(self):
+        self._idle: Dict[str, List[PooledYDL]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0}
+
+    @contextmanager
+    def acquire(self, options: Dict) -> Iterator[PooledYDL]:
+        signature = options_signature(options)
+        with self._lock:
+            pooled = self._idle[signature].pop() if self._idle[signature] else None
+        if pooled is None:
+            pooled = PooledYDL(options)
+            self.stats["created"] += 1
+        else:
+            self.stats["reused"] += 1
+        try:
+            yield pooled
+        finally:
+            pooled.progress_hook = None
+            pooled.postprocessor_hook = None
+            with self._lock:
+                self._idle[signature].append(pooled)
+
+    def close(self):
+        with self._lock:
+            pooled_all = [pooled for idle in self._idle.values() for pooled in idle]
+            self._idle.clear()
+        for pooled in pooled_all:
+            try:
+                pooled.ydl.close()
+            except Exception as e:
+                logger.debug(f"Failed to close YoutubeDL: {e}")
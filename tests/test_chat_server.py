@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from modules.backends import MockBackend
+from modules.chat_engine import ChatEngine
+from modules.chat_server import ChatServer
+
+HOST = "127.0.0.1"
+
+
+async def request(port: int, method: str, path: str, payload=None, raw_body: bytes = None,
+                  headers: str = ""):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    body = raw_body if raw_body is not None else (json.dumps(payload).encode() if payload is not None else b"")
+    if "content-length" not in headers.lower():
+        headers += f"Content-Length: {len(body)}\r\n"
+    writer.write(f"{method} {path} HTTP/1.1\r\n{headers}\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content) if content else None
+
+
+def run_server(tmp_path, test, **options):
+    async def main():
+        base = ChatEngine(backend=MockBackend(first_token_latency=0.3), data_dir=tmp_path)
+        server = ChatServer(base, sessions_dir=tmp_path / "sessions", **options)
+        listener = await server.start(HOST, 0)
+        try:
+            await test(server, listener.sockets[0].getsockname()[1])
+        finally:
+            await server.close()
+            base.close()
+
+    asyncio.run(main())
+
+
+def test_create_session_and_send_message(tmp_path):
+    async def test(server, port):
+        status, body = await request(port, "POST", "/sessions", {"session_id": "alice"})
+        assert (status, body) == (201, {"session_id": "alice"})
+        status, body = await request(port, "POST", "/sessions/alice/messages",
+                                     {"message": "apa itu phishing", "use_cache": False})
+        assert status == 200
+        assert body["reply"]
+        assert server.pending == 0
+
+    run_server(tmp_path, test)
+
+
+def test_full_session_queue_returns_429(tmp_path):
+    async def test(server, port):
+        await request(port, "POST", "/sessions", {"session_id": "bob"})
+        session = server.sessions["bob"]
+        message = {"message": "halo", "use_cache": False}
+        first = asyncio.ensure_future(request(port, "POST", "/sessions/bob/messages", message))
+        while not session.busy:
+            await asyncio.sleep(0.01)
+        # Pesan pertama sedang dijawab, pesan kedua mengisi antrean (ukuran 1)
+        second = asyncio.ensure_future(request(port, "POST", "/sessions/bob/messages", message))
+        while session.queue.empty():
+            await asyncio.sleep(0.01)
+        status, body = await request(port, "POST", "/sessions/bob/messages", message)
+        assert status == 429
+        assert "error" in body
+        assert [(await first)[0], (await second)[0]] == [200, 200]
+        assert server.stats["rejected_full"] == 1
+        assert server.pending == 0
+
+    run_server(tmp_path, test, queue_size=1)
+
+
+def test_unknown_session_returns_404(tmp_path):
+    async def test(server, port):
+        status, _ = await request(port, "GET", "/sessions/nobody/history")
+        assert status == 404
+        status, _ = await request(port, "DELETE", "/sessions/nobody")
+        assert status == 404
+        assert not (tmp_path / "sessions" / "nobody").exists()
+        assert server.sessions == {}
+
+    run_server(tmp_path, test)
+
+
+def test_malformed_content_length_returns_400(tmp_path):
+    async def test(server, port):
+        status, body = await request(port, "POST", "/sessions", raw_body=b"{}",
+                                     headers="Content-Length: abc\r\n")
+        assert status == 400
+        assert "Content-Length" in body["error"]
+
+    run_server(tmp_path, test)
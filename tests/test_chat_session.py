@@ -0,0 +1,75 @@
+from modules.chat_session import (
+    PREAMBLE_ACK, SESSION_WINDOW_TURNS, SUMMARY_MAX_CHARS, SlidingWindowSession
+)
+
+TURNS = SESSION_WINDOW_TURNS * 20
+SYSTEM_PROMPT = "Kamu adalah Mio."
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """Answers every message with a fixed-size reply and records the payload it got"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def generate_content(self, contents, stream=False):
+        self.payloads.append(sum(len(part) for item in contents for part in item["parts"]))
+        reply = f"Jawaban nomor {len(self.payloads)}. " + "Detail tambahan tentang keamanan. " * 10
+        if stream:
+            return iter([_Response(reply[:50]), _Response(reply[50:])])
+        return _Response(reply)
+
+
+def _message(turn: int) -> str:
+    return f"Pertanyaan ke-{turn} tentang firewall dan enkripsi? " + "konteks " * 20
+
+
+def _max_payload(session: SlidingWindowSession, user_input: str) -> int:
+    header = len("Ringkasan percakapan sebelumnya di sesi ini:\n") + len("\n\n")
+    turns = sum(len(user_msg) + len(mio_msg) for user_msg, mio_msg in session.turns)
+    return len(SYSTEM_PROMPT) + header + SUMMARY_MAX_CHARS + len(PREAMBLE_ACK) + turns + len(user_input)
+
+
+def _run(stream: bool):
+    model = StubModel()
+    session = SlidingWindowSession(model, SYSTEM_PROMPT)
+    for turn in range(1, TURNS + 1):
+        message = _message(turn)
+        if stream:
+            "".join(session.stream(message))
+        else:
+            session.send(message)
+        assert len(session.turns) <= SESSION_WINDOW_TURNS
+        assert len(session.summary) <= SUMMARY_MAX_CHARS
+        assert session.last_payload_chars <= _max_payload(session, message)
+    return model, session
+
+
+def test_payload_plateaus_over_long_chat():
+    model, session = _run(stream=False)
+    assert session.turn_count == TURNS
+    # Setelah ringkasan penuh, ukuran payload tidak lagi bertambah
+    settled = model.payloads[TURNS // 2:]
+    assert max(settled) - min(settled) <= 0.05 * max(settled)
+    assert max(model.payloads) <= 2 * settled[-1]
+
+
+def test_streaming_keeps_the_same_bounds():
+    model, session = _run(stream=True)
+    assert session.turn_count == TURNS
+    assert len(session.turns) == SESSION_WINDOW_TURNS
+    settled = model.payloads[TURNS // 2:]
+    assert max(settled) - min(settled) <= 0.05 * max(settled)
+
+
+def test_summary_keeps_newest_lines():
+    _, session = _run(stream=False)
+    lines = session.summary.splitlines()
+    assert lines
+    # Giliran terbaru yang sudah keluar dari window ada di baris terakhir ringkasan
+    assert lines[-1].startswith(f"- User: Pertanyaan ke-{TURNS - SESSION_WINDOW_TURNS} ")